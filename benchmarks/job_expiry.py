@@ -0,0 +1,88 @@
+"""Benchmark retention bookkeeping for a burst of finished jobs.
+
+Usage: python -m benchmarks.job_expiry [--jobs 100000] [--retention 2.0]
+
+Pushes `--jobs` jobs through a TranscriptionQueue with a no-op backend and
+reports wall time, peak live asyncio tasks and peak traced memory until
+every job has been evicted. The per-task baseline reproduces the previous
+implementation, which started one sleeping cleanup task per finished job.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from server.queue import TranscriptionJob, TranscriptionQueue
+
+
+class _TaskPerJobQueue(TranscriptionQueue):
+    """The previous expiry scheme: one task sleeping out the retention per job."""
+
+    def __init__(self, max_size: int, retention: float) -> None:
+        super().__init__(
+            max_size=max_size, max_concurrent_jobs=64, job_retention_seconds=retention
+        )
+        self._retention = retention
+        self._sleepers: set[asyncio.Task[None]] = set()
+
+    def _schedule_expiry(self, job_id: str) -> None:
+        task = asyncio.create_task(self._sleep_then_forget(job_id))
+        self._sleepers.add(task)
+        task.add_done_callback(self._sleepers.discard)
+
+    async def _sleep_then_forget(self, job_id: str) -> None:
+        await asyncio.sleep(self._retention)
+        self._forget_job(job_id)
+
+
+async def _run_one(queue: TranscriptionQueue, num_jobs: int) -> tuple[float, float, int, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    queue.start_worker()
+    jobs = [TranscriptionJob(token_fingerprint=f"token{i % 100:03d}") for i in range(num_jobs)]
+    for job in jobs:
+        queue.enqueue(job)
+    peak_tasks = 0
+    for job in jobs:
+        await job.chunk_stream.wait_closed()
+        peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+    completed = time.perf_counter() - start
+    while any(queue.get_job(job.job_id) is not None for job in jobs):
+        peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+        await asyncio.sleep(0.05)
+    evicted = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await queue.stop()
+    return completed, evicted, peak_tasks, peak_memory
+
+
+async def _run(num_jobs: int, retention: float) -> None:
+    print(f"{num_jobs} job completions, {retention:.1f}s retention")
+    for label, queue in (
+        (
+            "single expiry task",
+            TranscriptionQueue(
+                max_size=num_jobs, max_concurrent_jobs=64, job_retention_seconds=retention
+            ),
+        ),
+        ("task per job (baseline)", _TaskPerJobQueue(num_jobs, retention)),
+    ):
+        completed, evicted, peak_tasks, peak_memory = await _run_one(queue, num_jobs)
+        print(
+            f"  {label:24s} completed {completed:6.2f} s, evicted {evicted:6.2f} s, "
+            f"peak {peak_tasks:6d} tasks, {peak_memory / 1e6:6.1f} MB traced"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Finished-job expiry benchmark")
+    parser.add_argument("--jobs", type=int, default=100_000, help="Number of job completions")
+    parser.add_argument("--retention", type=float, default=2.0, help="Job retention in seconds")
+    args = parser.parse_args()
+    asyncio.run(_run(args.jobs, args.retention))
+
+
+if __name__ == "__main__":
+    main()
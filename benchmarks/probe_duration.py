@@ -0,0 +1,91 @@
+"""Benchmark per-upload duration probing: container headers vs ffprobe.
+
+Usage: python -m benchmarks.probe_duration [FILE ...] [--repeat 20]
+
+Times probe_duration, which reads the duration from the container headers
+when it can, against the previous ffprobe-only path for each file.
+Defaults to the audio files in sample/ (the WAVs described in
+sample/README.md are not checked in); with none there, it generates PCM
+WAV clips of 5 s, 60 s and 10 min.
+"""
+
+import argparse
+import asyncio
+import shutil
+import struct
+import time
+from pathlib import Path
+
+from server.audio import _MIME_MAP, FfmpegPool, _ffprobe_duration
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import duration_from_headers
+
+_SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample"
+_GENERATED_SECONDS = (5, 60, 600)
+
+
+def _wav(seconds: int, sample_rate: int = 16000) -> bytes:
+    data_size = seconds * sample_rate * 2
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+        sample_rate, sample_rate * 2, 2, 16, b"data", data_size,
+    )
+    return header + b"\x00" * data_size
+
+
+def _inputs(paths: list[str]) -> list[tuple[str, bytes]]:
+    if paths:
+        return [(Path(p).name, Path(p).read_bytes()) for p in paths]
+    found = sorted(p for p in _SAMPLE_DIR.iterdir() if p.suffix.lower() in _MIME_MAP)
+    if found:
+        return [(p.name, p.read_bytes()) for p in found]
+    print(f"No audio in {_SAMPLE_DIR}; using generated WAV clips")
+    return [(f"generated {s} s wav", _wav(s)) for s in _GENERATED_SECONDS]
+
+
+def _time_headers(data: bytes, repeat: int) -> tuple[float, float | None]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        duration = duration_from_headers(data)
+    return (time.perf_counter() - start) * 1000 / repeat, duration
+
+
+async def _time_ffprobe(data: bytes, repeat: int) -> tuple[float, float]:
+    ffmpeg = FfmpegPool(max_processes=1, timeout_seconds=600.0)
+    audio = AudioBuffer.in_memory(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        duration = await _ffprobe_duration(audio, ffmpeg)
+    return (time.perf_counter() - start) * 1000 / repeat, duration
+
+
+async def _run(paths: list[str], repeat: int) -> None:
+    has_ffprobe = shutil.which("ffprobe") is not None
+    print(f"{'file':28s} {'MB':>7s} {'headers':>10s} {'ffprobe':>10s}  duration")
+    for name, data in _inputs(paths):
+        header_ms, header_duration = _time_headers(data, repeat)
+        ffprobe_ms: float | None = None
+        ffprobe_duration: float | None = None
+        if has_ffprobe:
+            ffprobe_ms, ffprobe_duration = await _time_ffprobe(data, repeat)
+        header_text = f"{header_ms:8.3f}ms" if header_duration is not None else "  fallback"
+        ffprobe_text = f"{ffprobe_ms:8.3f}ms" if ffprobe_ms is not None else "       n/a"
+        durations = " / ".join(
+            f"{d:.2f} s" for d in (header_duration, ffprobe_duration) if d is not None
+        )
+        print(f"{name[:28]:28s} {len(data) / 1e6:7.1f} {header_text} {ffprobe_text}  {durations}")
+    if not has_ffprobe:
+        print("ffprobe not installed; only the header path was timed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Duration probe benchmark")
+    parser.add_argument("files", nargs="*", help="Audio files (default: sample/)")
+    parser.add_argument("--repeat", type=int, default=20, help="Probes per file")
+    args = parser.parse_args()
+    asyncio.run(_run(args.files, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark queue status latency with a deep queue.
+
+Usage: python -m benchmarks.queue_status [--jobs 10000] [--tokens 500]
+
+Fills a TranscriptionQueue with queued jobs spread over many tokens and times
+`get_queue_info` (the /v1/queue/status handler) and `get_position_and_eta`
+(the initial SSE queue event). The linear-scan baseline reproduces the
+previous implementation, which walked every job for each of the caller's jobs.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Callable
+
+from server.models import JobStatus
+from server.queue import TranscriptionJob, TranscriptionQueue
+
+
+def _linear_queue_info(jobs: list[TranscriptionJob], token_fingerprint: str) -> list[int]:
+    positions: list[int] = []
+    for job in jobs:
+        if job.token_fingerprint != token_fingerprint:
+            continue
+        position = 0
+        for other in jobs:
+            if other.status == JobStatus.QUEUED:
+                position += 1
+                if other.job_id == job.job_id:
+                    positions.append(position)
+                    break
+    return positions
+
+
+def _time_per_call(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+async def _run(num_jobs: int, num_tokens: int, repeat: int) -> None:
+    queue = TranscriptionQueue(max_size=num_jobs)
+    jobs = [
+        TranscriptionJob(token_fingerprint=f"token{i % num_tokens:05d}")
+        for i in range(num_jobs)
+    ]
+    for job in jobs:
+        queue.enqueue(job)
+
+    caller = jobs[-1].token_fingerprint
+    tail_job = jobs[-1].job_id
+    jobs_per_token = num_jobs // num_tokens
+
+    print(f"{num_jobs} queued jobs, {num_tokens} tokens ({jobs_per_token} jobs per token)")
+    indexed = _time_per_call(lambda: queue.get_queue_info(caller), repeat)
+    print(f"  get_queue_info (indexed):      {indexed * 1e6:10.1f} us")
+    position = _time_per_call(lambda: queue.get_position_and_eta(tail_job), repeat)
+    print(f"  get_position_and_eta (tail):   {position * 1e6:10.1f} us")
+    linear = _time_per_call(lambda: _linear_queue_info(jobs, caller), max(1, repeat // 100))
+    print(f"  queue info (linear baseline):  {linear * 1e6:10.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Queue status latency benchmark")
+    parser.add_argument("--jobs", type=int, default=10_000, help="Number of queued jobs")
+    parser.add_argument("--tokens", type=int, default=500, help="Number of distinct tokens")
+    parser.add_argument("--repeat", type=int, default=1000, help="Calls per measurement")
+    args = parser.parse_args()
+    asyncio.run(_run(args.jobs, args.tokens, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark parsing vLLM's token stream: line-based stdlib JSON vs byte-level SSE.
+
+Usage: python -m benchmarks.sse_parse [FILE] [--repeat 20]
+
+FILE is a raw SSE response body recorded from vLLM's chat completions
+endpoint, e.g. with `curl -N ... > stream.sse`. By default the sample
+transcript sample/letter_factory_leap_frog.json is replayed as vLLM
+streams it: one chat.completion.chunk event per token-sized piece, each
+arriving as its own network read. The previous path (httpx aiter_lines,
+json.loads and dict lookups) is timed against sse_data plus delta_content
+with every JSON decoder installed, and the cost is reported per token.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+
+import httpx
+
+from server.sse import JsonDecoder, available_decoders, delta_content, sse_data
+
+_SAMPLE = Path(__file__).resolve().parent.parent / "sample" / "letter_factory_leap_frog.json"
+# Roughly how a BPE tokenizer splits text: a word with its leading space, or punctuation.
+_TOKEN = re.compile(r"\s*\w+|\s*[^\w\s]+|\s+")
+
+
+def _replayed_stream() -> list[bytes]:
+    output = json.dumps(json.loads(_SAMPLE.read_text()), ensure_ascii=False)
+    frame = {
+        "id": "chatcmpl-0f9a2c6e4b1d4c3f8e7a6b5c4d3e2f1a",
+        "object": "chat.completion.chunk",
+        "created": 1760000000,
+        "model": "vibevoice",
+    }
+
+    def event(delta: dict[str, str], finish_reason: str | None = None) -> bytes:
+        choice = {"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}
+        # Compact, like vLLM's pydantic serialisation.
+        chunk = json.dumps(
+            {**frame, "choices": [choice]}, ensure_ascii=False, separators=(",", ":")
+        )
+        return f"data: {chunk}\n\n".encode()
+
+    events = [event({"role": "assistant", "content": ""})]
+    events += [event({"content": token}) for token in _TOKEN.findall(output)]
+    events += [event({}, "stop"), b"data: [DONE]\n\n"]
+    return events
+
+
+def _recorded_stream(path: str) -> list[bytes]:
+    # Replayed one event per read, as vLLM flushes them.
+    body = Path(path).read_bytes().replace(b"\r\n", b"\n")
+    return [event + b"\n\n" for event in body.split(b"\n\n") if event.strip()]
+
+
+def _response(events: list[bytes]) -> httpx.Response:
+    async def body() -> AsyncIterator[bytes]:
+        for event in events:
+            yield event
+
+    return httpx.Response(200, content=body())
+
+
+async def _lines_and_json(events: list[bytes]) -> int:
+    tokens = 0
+    async for line in _response(events).aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        data_str = line[len("data: ") :]
+        if data_str.strip() == "[DONE]":
+            break
+        try:
+            data = json.loads(data_str)
+        except json.JSONDecodeError:
+            continue
+        if "choices" not in data or not data["choices"]:
+            continue
+        choice = data["choices"][0]
+        if "delta" not in choice or "content" not in choice["delta"]:
+            continue
+        if choice["delta"]["content"]:
+            tokens += 1
+    return tokens
+
+
+def _bytes_and(decoder: JsonDecoder) -> Callable[[list[bytes]], Awaitable[int]]:
+    async def parse(events: list[bytes]) -> int:
+        tokens = 0
+        async for data in sse_data(_response(events).aiter_bytes()):
+            if data.strip() == b"[DONE]":
+                break
+            if delta_content(data, decoder):
+                tokens += 1
+        return tokens
+
+    return parse
+
+
+async def _run(path: str | None, repeat: int) -> None:
+    events = _recorded_stream(path) if path else _replayed_stream()
+    parsers: list[tuple[str, Callable[[list[bytes]], Awaitable[int]]]] = [
+        ("aiter_lines + json", _lines_and_json),
+        *((f"sse_data + {d.name}", _bytes_and(d)) for d in available_decoders()),
+    ]
+    print(f"{len(events)} events, {sum(map(len, events)) / 1e6:.2f} MB")
+    print(f"{'parser':22s} {'tokens':>7s} {'us/token':>9s}")
+    for name, parse in parsers:
+        tokens = await parse(events)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await parse(events)
+        per_token = (time.perf_counter() - start) / repeat / max(tokens, 1) * 1e6
+        print(f"{name:22s} {tokens:7d} {per_token:9.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="vLLM SSE parsing benchmark")
+    parser.add_argument("file", nargs="?", help="Recorded vLLM SSE body (default: replay)")
+    parser.add_argument("--repeat", type=int, default=20, help="Parses per parser")
+    args = parser.parse_args()
+    asyncio.run(_run(args.file, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
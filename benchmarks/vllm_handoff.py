@@ -0,0 +1,135 @@
+"""Benchmark handing a job's audio to vLLM: inline data URL vs file:// copy.
+
+Usage: python -m benchmarks.vllm_handoff [--minutes 60] [--media-dir /tmp]
+
+Spools a generated 24 kHz mono 16-bit PCM WAV of `--minutes`, then sends
+one request for it to a sink transport that discards the body, as
+process_vibevoice_job would. This is done once with the base64 data URL
+streamed into the request body and once with the audio exported to
+`--media-dir` and referenced by file:// URL. Each mode runs in a fresh
+process and reports the time to build and send the request, the bytes
+sent, and how far the process's peak RSS rose above its level before the
+request. vLLM's own cost of parsing a data URL, which the handoff also
+saves, is not measured.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import struct
+import tempfile
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+
+from server.audio_buffer import AudioBuffer, AudioBufferWriter
+from server.vllm_client import stream_transcription
+
+_SAMPLE_RATE = 24000
+_WRITE_CHUNK_BYTES = 4 * 1024 * 1024
+# (request seconds, request body bytes, peak RSS rise in MB)
+_Result = tuple[float, int, float]
+
+
+class _SinkTransport(httpx.AsyncBaseTransport):
+    """Reads and drops the request body, then answers with an empty completion."""
+
+    def __init__(self) -> None:
+        self.body_bytes = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        assert isinstance(request.stream, httpx.AsyncByteStream), (
+            f"Expected a streamed request body, got: {type(request.stream).__name__}"
+        )
+        async for chunk in request.stream:
+            self.body_bytes += len(chunk)
+        return httpx.Response(200, content=b"data: [DONE]\n\n")
+
+
+async def _spooled_wav(minutes: float, spool_dir: str) -> AudioBuffer:
+    data_size = int(minutes * 60 * _SAMPLE_RATE) * 2
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+        _SAMPLE_RATE, _SAMPLE_RATE * 2, 2, 16, b"data", data_size,
+    )
+    writer = AudioBufferWriter(spool_dir)
+    await writer.write(header)
+    silence = bytes(_WRITE_CHUNK_BYTES)
+    for start in range(0, data_size, _WRITE_CHUNK_BYTES):
+        await writer.write(silence[: data_size - start])
+    return await writer.finish()
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _send(minutes: float, media_dir: str | None) -> _Result:
+    with tempfile.TemporaryDirectory() as spool_dir:
+        audio = await _spooled_wav(minutes, spool_dir)
+        transport = _SinkTransport()
+        async with httpx.AsyncClient(transport=transport, base_url="http://vllm") as client:
+            baseline = _peak_rss_mb()
+            start = time.perf_counter()
+            export = None if media_dir is None else await audio.export(media_dir, ".wav")
+            chunks: AsyncIterator[str] = stream_transcription(
+                http_client=client,
+                vllm_base_url="http://vllm",
+                model_name="vibevoice",
+                audio=audio,
+                audio_mime="audio/wav",
+                audio_duration=minutes * 60,
+                hotwords=None,
+                temperature=0.0,
+                top_p=1.0,
+                max_tokens=1,
+                stall_timeout=60.0,
+                audio_url=None if export is None else export.url,
+            )
+            async for _ in chunks:
+                pass
+            elapsed = time.perf_counter() - start
+            rise = _peak_rss_mb() - baseline
+            if export is not None:
+                export.remove()
+        audio.wipe()
+        await asyncio.sleep(0)
+    return elapsed, transport.body_bytes, rise
+
+
+def _run_mode(
+    minutes: float, media_dir: str | None, results: multiprocessing.Queue[_Result]
+) -> None:
+    results.put(asyncio.run(_send(minutes, media_dir)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="vLLM audio handoff benchmark")
+    parser.add_argument("--minutes", type=float, default=60.0, help="Audio length")
+    parser.add_argument(
+        "--media-dir", default=tempfile.gettempdir(), help="Where file:// copies are written"
+    )
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.minutes:g} min 24 kHz PCM WAV, spooled")
+    for label, media_dir in (("data URL", None), ("file:// handoff", args.media_dir)):
+        results: multiprocessing.Queue[_Result] = context.Queue()
+        process = context.Process(target=_run_mode, args=(args.minutes, media_dir, results))
+        process.start()
+        elapsed, body_bytes, rise = results.get()
+        process.join()
+        print(
+            f"  {label:16s} request {elapsed * 1000:9.1f} ms, "
+            f"body {body_bytes / 1e6:8.1f} MB, peak RSS +{rise:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,11 @@ async def _transcribe(
     audio_path: str,
     hotwords: str | None,
     output: str | None,
+    priority: str | None,
 ) -> None:
     output_file = open(output, "w") if output else None  # noqa: SIM115
     try:
-        async for event in client.transcribe(audio_path, hotwords):
+        async for event in client.transcribe(audio_path, hotwords, priority=priority):
             if event.event_type == EventType.QUEUE:
                 print(
                     f"[Queue] Position: {event.position}, ETA: {event.estimated_wait_seconds:.0f}s",
@@ -83,6 +84,11 @@ def main() -> None:
     transcribe_parser.add_argument("file", help="Path to audio file")
     transcribe_parser.add_argument("--hotwords", help="Comma-separated hotwords")
     transcribe_parser.add_argument("--output", help="Output file path")
+    transcribe_parser.add_argument(
+        "--priority",
+        choices=["interactive", "normal", "batch"],
+        help="Scheduling class (default: the highest the token allows)",
+    )
 
     subparsers.add_parser("status", help="Check queue status")
 
@@ -114,6 +120,8 @@ def main() -> None:
         if not Path(args.file).exists():
             print(f"File not found: {args.file}", file=sys.stderr)
             sys.exit(1)
-        asyncio.run(_transcribe(client, args.file, args.hotwords, args.output))
+        asyncio.run(
+            _transcribe(client, args.file, args.hotwords, args.output, args.priority)
+        )
     elif args.command == "status":
         asyncio.run(_status(client))
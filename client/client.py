@@ -1,13 +1,184 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
 from pathlib import Path
 
 import httpx
 
 from client.models import EventType, TranscriptionEvent
 
+# Consecutive reconnect attempts after a dropped stream, backing off exponentially from 1 s.
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF_SECONDS = 1.0
+
+
+@dataclass
+class _StreamState:
+    job_id: str | None = None
+    # SSE id of the last event received, sent back as Last-Event-ID on reconnect
+    last_event_id: int = 0
+    finished: bool = False
+    failed: bool = False
+
+
+async def _parse_events(
+    response: httpx.Response, state: _StreamState
+) -> AsyncIterator[TranscriptionEvent]:
+    current_event = "data"
+    current_id: int | None = None
+
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            current_event = line[len("event: "):]
+            continue
+
+        if line.startswith("id: "):
+            current_id = int(line[len("id: "):])
+            continue
+
+        if not line.startswith("data: "):
+            continue
+
+        data_str = line[len("data: "):]
+
+        try:
+            payload = json.loads(data_str)
+        except json.JSONDecodeError:
+            continue
+
+        if current_id is not None:
+            state.last_event_id = current_id
+
+        if current_event == "queue":
+            state.job_id = payload["job_id"]
+            yield TranscriptionEvent(
+                event_type=EventType.QUEUE,
+                job_id=payload["job_id"],
+                position=payload["position"],
+                estimated_wait_seconds=payload["estimated_wait_seconds"],
+            )
+        elif current_event == "data":
+            yield TranscriptionEvent(
+                event_type=EventType.DATA,
+                text=payload["text"],
+            )
+        elif current_event == "segment":
+            yield TranscriptionEvent(
+                event_type=EventType.SEGMENT,
+                start=payload["start"],
+                end=payload["end"],
+                speaker=payload["speaker"],
+                content=payload["content"],
+            )
+        elif current_event == "error":
+            state.finished = True
+            state.failed = True
+            yield TranscriptionEvent(
+                event_type=EventType.ERROR,
+                error=payload["error"],
+            )
+        elif current_event == "done":
+            state.finished = True
+            yield TranscriptionEvent(
+                event_type=EventType.DONE,
+                job_id=payload["job_id"],
+            )
+
+        # Reset to default after processing data line
+        current_event = "data"
+        current_id = None
+
+
+async def _parse_batch_events(
+    response: httpx.Response, states: list[_StreamState]
+) -> AsyncIterator[TranscriptionEvent]:
+    """Parse a batch stream, tracking each file's job in `states` (filled from the batch event)."""
+    current_event = "data"
+
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            current_event = line[len("event: "):]
+            continue
+
+        if not line.startswith("data: "):
+            continue
+
+        try:
+            payload = json.loads(line[len("data: "):])
+        except json.JSONDecodeError:
+            continue
+
+        if current_event == "batch":
+            states[:] = [_StreamState(job_id=f["job_id"]) for f in payload["files"]]
+            yield TranscriptionEvent(
+                event_type=EventType.BATCH,
+                files=[f["name"] for f in payload["files"]],
+            )
+        elif current_event == "queue":
+            yield TranscriptionEvent(
+                event_type=EventType.QUEUE,
+                file_index=payload["file"],
+                job_id=payload["job_id"],
+                position=payload["position"],
+                estimated_wait_seconds=payload["estimated_wait_seconds"],
+            )
+        elif current_event == "data":
+            states[payload["file"]].last_event_id = payload["chunk_id"]
+            yield TranscriptionEvent(
+                event_type=EventType.DATA,
+                file_index=payload["file"],
+                text=payload["text"],
+            )
+        elif current_event == "segment":
+            yield TranscriptionEvent(
+                event_type=EventType.SEGMENT,
+                file_index=payload["file"],
+                start=payload["start"],
+                end=payload["end"],
+                speaker=payload["speaker"],
+                content=payload["content"],
+            )
+        elif current_event == "file-error":
+            state = states[payload["file"]]
+            state.finished = True
+            state.failed = True
+            yield TranscriptionEvent(
+                event_type=EventType.ERROR,
+                file_index=payload["file"],
+                job_id=payload["job_id"],
+                error=payload["error"],
+            )
+        elif current_event == "file-done":
+            states[payload["file"]].finished = True
+            yield TranscriptionEvent(
+                event_type=EventType.DONE,
+                file_index=payload["file"],
+                job_id=payload["job_id"],
+            )
+        elif current_event in ("progress", "done"):
+            yield TranscriptionEvent(
+                event_type=EventType.PROGRESS if current_event == "progress" else EventType.DONE,
+                completed=payload["completed"],
+                failed=payload["failed"],
+                total=payload["total"],
+            )
+
+        current_event = "data"
+
+
+def _batch_progress(event_type: EventType, states: list[_StreamState]) -> TranscriptionEvent:
+    failed = sum(state.failed for state in states)
+    return TranscriptionEvent(
+        event_type=event_type,
+        completed=sum(state.finished for state in states) - failed,
+        failed=failed,
+        total=len(states),
+    )
+
 
 class VibevoiceClient:
     def __init__(
@@ -27,68 +198,164 @@ class VibevoiceClient:
         self,
         audio_path: str | Path,
         hotwords: str | None,
+        priority: str | None = None,
     ) -> AsyncIterator[TranscriptionEvent]:
-        """Upload audio and stream transcription events."""
+        """Upload audio and stream transcription events.
+
+        `priority` is "interactive", "normal" or "batch"; None uses the highest
+        class the token allows.
+
+        If the connection drops mid-stream, the stream is resumed from the
+        last received event via GET /v1/jobs/{job_id}/events, so a flaky link
+        does not cost a re-upload and re-transcription.
+        """
         path = Path(audio_path)
+        state = _StreamState()
 
         timeout = httpx.Timeout(connect=10.0, read=600.0, write=60.0, pool=10.0)
         async with httpx.AsyncClient(timeout=timeout, verify=self._verify) as client:
-            with open(path, "rb") as f:
-                files = {"audio": (path.name, f, "application/octet-stream")}
-                data = {}
-                if hotwords:
-                    data["hotwords"] = hotwords
+            try:
+                with open(path, "rb") as f:
+                    files = {"audio": (path.name, f, "application/octet-stream")}
+                    data = {}
+                    if hotwords:
+                        data["hotwords"] = hotwords
+
+                    params = {"priority": priority} if priority else None
+                    async with client.stream(
+                        "POST",
+                        f"{self._base_url}/v1/transcribe",
+                        headers=self._headers(),
+                        params=params,
+                        files=files,
+                        data=data,
+                    ) as response:
+                        response.raise_for_status()
+                        state.job_id = response.headers.get("X-Job-Id")
+                        async for event in _parse_events(response, state):
+                            yield event
+                        return
+            except httpx.TransportError:
+                if state.job_id is None or state.finished:
+                    raise
+
+            async for event in self._resume(client, state):
+                yield event
+
+    async def transcribe_batch(
+        self,
+        audio_paths: Sequence[str | Path],
+        hotwords: str | None,
+        priority: str | None = None,
+    ) -> AsyncIterator[TranscriptionEvent]:
+        """Upload many files, or one zip/tar archive of them, and stream all their events.
+
+        The first event (BATCH) lists the file names; per-file events carry
+        the file's index in `file_index`. A PROGRESS event with the batch
+        totals follows each file's DONE or ERROR, and a final DONE without a
+        `file_index` ends the batch.
+
+        If the connection drops, every unfinished file's job is resumed
+        separately, and their events are interleaved as they arrive.
+        """
+        paths = [Path(p) for p in audio_paths]
+        assert paths, "Expected at least one audio file"
+        states: list[_StreamState] = []
+
+        timeout = httpx.Timeout(connect=10.0, read=600.0, write=600.0, pool=10.0)
+        async with httpx.AsyncClient(timeout=timeout, verify=self._verify) as client:
+            try:
+                with contextlib.ExitStack() as stack:
+                    files = []
+                    for path in paths:
+                        f = stack.enter_context(open(path, "rb"))
+                        files.append(("audio", (path.name, f, "application/octet-stream")))
+                    data = {}
+                    if hotwords:
+                        data["hotwords"] = hotwords
+
+                    params = {"priority": priority} if priority else None
+                    async with client.stream(
+                        "POST",
+                        f"{self._base_url}/v1/transcribe/batch",
+                        headers=self._headers(),
+                        params=params,
+                        files=files,
+                        data=data,
+                    ) as response:
+                        response.raise_for_status()
+                        async for event in _parse_batch_events(response, states):
+                            yield event
+                        return
+            except httpx.TransportError:
+                if not states:
+                    raise
 
+            async for event in self._resume_batch(client, states):
+                yield event
+
+    async def _resume_batch(
+        self, client: httpx.AsyncClient, states: list[_StreamState]
+    ) -> AsyncIterator[TranscriptionEvent]:
+        merged: asyncio.Queue[TranscriptionEvent | None] = asyncio.Queue()
+
+        async def resume_file(index: int, state: _StreamState) -> None:
+            try:
+                async for event in self._resume(client, state):
+                    await merged.put(event.model_copy(update={"file_index": index}))
+            finally:
+                await merged.put(None)
+
+        # All at once: a job nobody resumes within the server's grace period is cancelled.
+        tasks = [
+            asyncio.create_task(resume_file(index, state))
+            for index, state in enumerate(states)
+            if not state.finished
+        ]
+        try:
+            running = len(tasks)
+            while running:
+                event = await merged.get()
+                if event is None:
+                    running -= 1
+                    continue
+                yield event
+                if event.event_type in (EventType.DONE, EventType.ERROR):
+                    yield _batch_progress(EventType.PROGRESS, states)
+            # Surface a file whose stream could not be resumed.
+            for task in tasks:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        yield _batch_progress(EventType.DONE, states)
+
+    async def _resume(
+        self, client: httpx.AsyncClient, state: _StreamState
+    ) -> AsyncIterator[TranscriptionEvent]:
+        assert state.job_id is not None, "Cannot resume a stream without a job id"
+        failures = 0
+        while True:
+            await asyncio.sleep(RECONNECT_BACKOFF_SECONDS * 2**failures)
+            resumed_from = state.last_event_id
+            try:
                 async with client.stream(
-                    "POST",
-                    f"{self._base_url}/v1/transcribe",
-                    headers=self._headers(),
-                    files=files,
-                    data=data,
+                    "GET",
+                    f"{self._base_url}/v1/jobs/{state.job_id}/events",
+                    headers={**self._headers(), "Last-Event-ID": str(resumed_from)},
                 ) as response:
                     response.raise_for_status()
-                    current_event = "data"
-
-                    async for line in response.aiter_lines():
-                        if line.startswith("event: "):
-                            current_event = line[len("event: "):]
-                            continue
-
-                        if not line.startswith("data: "):
-                            continue
-
-                        data_str = line[len("data: "):]
-
-                        try:
-                            payload = json.loads(data_str)
-                        except json.JSONDecodeError:
-                            continue
-
-                        if current_event == "queue":
-                            yield TranscriptionEvent(
-                                event_type=EventType.QUEUE,
-                                job_id=payload["job_id"],
-                                position=payload["position"],
-                                estimated_wait_seconds=payload["estimated_wait_seconds"],
-                            )
-                        elif current_event == "data":
-                            yield TranscriptionEvent(
-                                event_type=EventType.DATA,
-                                text=payload["text"],
-                            )
-                        elif current_event == "error":
-                            yield TranscriptionEvent(
-                                event_type=EventType.ERROR,
-                                error=payload["error"],
-                            )
-                        elif current_event == "done":
-                            yield TranscriptionEvent(
-                                event_type=EventType.DONE,
-                                job_id=payload["job_id"],
-                            )
-
-                        # Reset to default after processing data line
-                        current_event = "data"
+                    async for event in _parse_events(response, state):
+                        yield event
+                    return
+            except httpx.TransportError:
+                if state.finished:
+                    raise
+                # Only consecutive fruitless attempts count towards giving up.
+                failures = 0 if state.last_event_id != resumed_from else failures + 1
+                if failures >= RECONNECT_ATTEMPTS:
+                    raise
 
     async def queue_status(self) -> dict[str, object]:
         """Get queue status for your token."""
@@ -6,8 +6,13 @@ from pydantic import BaseModel
 class EventType(StrEnum):
     QUEUE = "queue"
     DATA = "data"
+    # A segment of the transcript, parsed once the data events have completed it
+    SEGMENT = "segment"
     ERROR = "error"
     DONE = "done"
+    # Batch streams only: the files of the batch, and totals after each file ends
+    BATCH = "batch"
+    PROGRESS = "progress"
 
 
 class TranscriptionEvent(BaseModel):
@@ -17,3 +22,13 @@ class TranscriptionEvent(BaseModel):
     position: int | None = None
     estimated_wait_seconds: float | None = None
     error: str | None = None
+    start: float | None = None
+    end: float | None = None
+    speaker: int | str | None = None
+    content: str | None = None
+    # Batch streams only: index of the file an event belongs to (None for the whole batch)
+    file_index: int | None = None
+    files: list[str] | None = None
+    completed: int | None = None
+    failed: int | None = None
+    total: int | None = None
@@ -15,6 +15,12 @@ def main() -> None:
         "--keys-dir", required=True, help="Directory for key files"
     )
     parser.add_argument("--subject", required=True, help="Token subject/username")
+    parser.add_argument(
+        "--max-priority",
+        choices=["interactive", "normal", "batch"],
+        default=None,
+        help="Highest scheduling class the token may request (default: normal)",
+    )
     args = parser.parse_args()
 
     keys_dir = Path(args.keys_dir)
@@ -45,8 +51,11 @@ def main() -> None:
         )
         print(f"Using existing key pair from {keys_dir}/")
 
+    claims = {"sub": args.subject, "jti": uuid.uuid4().hex}
+    if args.max_priority:
+        claims["priority"] = args.max_priority
     token = jwt.encode(
-        {"sub": args.subject, "jti": uuid.uuid4().hex},
+        claims,
         private_key,
         algorithm="ES256",
     )
@@ -55,6 +64,8 @@ def main() -> None:
     token_path.write_text(token + "\n")
 
     print(f"Subject:     {args.subject}")
+    if args.max_priority:
+        print(f"Priority:    up to {args.max_priority}")
     print(f"Token:       {token}")
     print(f"Saved to:    {token_path}")
     print(f"Public key:  {public_key_path}")
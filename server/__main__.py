@@ -1,8 +1,11 @@
 import argparse
+import os
 
 import uvicorn
 
 from server.app import create_app
+from server.audio_split import MIN_WINDOW_SECONDS
+from server.broker import serve_with_workers
 from server.config import Settings
 
 
@@ -14,6 +17,32 @@ def _parse_bool(value: str) -> bool:
     raise argparse.ArgumentTypeError(f"Expected true/false, got: {value}")
 
 
+def _parse_subject_weights(value: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        subject, sep, weight_str = item.partition("=")
+        if not sep or not subject.strip():
+            raise argparse.ArgumentTypeError(f"Expected subject=weight, got: {item!r}")
+        try:
+            weight = float(weight_str)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"Expected numeric weight for {subject.strip()!r}, got: {weight_str!r}"
+            ) from None
+        if weight <= 0:
+            raise argparse.ArgumentTypeError(
+                f"Expected positive weight for {subject.strip()!r}, got: {weight}"
+            )
+        weights[subject.strip()] = weight
+    return weights
+
+
+def _parse_url_list(value: str) -> list[str]:
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         prog="vvv-server",
@@ -27,12 +56,138 @@ def main() -> None:
     )
     parser.add_argument("--host", required=True, help="Server bind address")
     parser.add_argument("--port", type=int, required=True, help="Server bind port")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "HTTP worker processes sharing the port. Above 1, a coordinator process runs "
+            "the queue and the workers reach it over a Unix socket (default: 1)"
+        ),
+    )
+    parser.add_argument(
+        "--broker-socket",
+        default="",
+        help=(
+            "Unix socket path of the queue coordinator when --workers > 1 "
+            "(default: in a new private temp directory)"
+        ),
+    )
     parser.add_argument(
         "--max-audio-bytes", type=int, required=True, help="Maximum audio upload size in bytes"
     )
+    parser.add_argument(
+        "--audio-spool-dir",
+        default="",
+        help=(
+            "Hold queued audio in anonymous, already-unlinked temp files in this directory "
+            "instead of in memory (default: in memory)"
+        ),
+    )
     parser.add_argument(
         "--max-queue-size", type=int, required=True, help="Maximum number of queued jobs"
     )
+    parser.add_argument(
+        "--max-queued-audio-seconds",
+        type=float,
+        default=0.0,
+        help="Maximum total duration of queued audio in seconds; 0 for no limit (default: 0)",
+    )
+    parser.add_argument(
+        "--max-queued-audio-bytes",
+        type=int,
+        default=0,
+        help="Maximum total size of queued audio in bytes; 0 for no limit (default: 0)",
+    )
+    parser.add_argument(
+        "--max-concurrent-jobs",
+        type=int,
+        default=1,
+        help="Maximum number of jobs dispatched to the ASR backend at once (default: 1)",
+    )
+    parser.add_argument(
+        "--max-media-processes",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 2),
+        help=(
+            "Maximum ffmpeg/ffprobe processes per server process; further calls queue "
+            "(default: half the CPU cores)"
+        ),
+    )
+    parser.add_argument(
+        "--media-process-timeout-seconds",
+        type=float,
+        default=600.0,
+        help="Kill an ffmpeg/ffprobe process running longer than this (default: 600)",
+    )
+    parser.add_argument(
+        "--trim-silence",
+        type=_parse_bool,
+        default=False,
+        help=(
+            "Cut pauses longer than about 1.6 s out of the audio before transcribing it; "
+            "segment times still refer to the original file (true/false, default: false)"
+        ),
+    )
+    parser.add_argument(
+        "--subject-weights",
+        type=_parse_subject_weights,
+        default={},
+        help=(
+            "Fair-share weights per token subject, e.g. 'alice=2,batch-bot=0.25'. "
+            "Unlisted subjects get weight 1 (default: all equal)"
+        ),
+    )
+    parser.add_argument(
+        "--priority-lane-seconds",
+        type=float,
+        default=600.0,
+        help=(
+            "Head start, in fair-share seconds of audio, of each priority class over the "
+            "next lower one (interactive > normal > batch) (default: 600)"
+        ),
+    )
+    parser.add_argument(
+        "--eta-model-file",
+        default="",
+        help=(
+            "Path where the ETA model's fitted coefficients are persisted across restarts "
+            "(default: not persisted)"
+        ),
+    )
+    parser.add_argument(
+        "--job-retention-seconds",
+        type=float,
+        default=30.0,
+        help=(
+            "How long finished jobs stay resumable via GET /v1/jobs/{job_id}/events "
+            "(default: 30)"
+        ),
+    )
+    parser.add_argument(
+        "--result-cache-bytes",
+        type=int,
+        default=0,
+        help=(
+            "Memory for an encrypted in-memory cache of finished transcripts, answering "
+            "resubmitted audio without transcribing it again; 0 disables it (default: 0)"
+        ),
+    )
+    parser.add_argument(
+        "--result-cache-ttl-seconds",
+        type=float,
+        default=3600.0,
+        help="How long a transcript stays in the result cache (default: 3600)",
+    )
+    parser.add_argument(
+        "--stream-resume-grace-seconds",
+        type=float,
+        default=15.0,
+        help=(
+            "How long a job whose client disconnected keeps running, waiting for the "
+            "client to resume, before it is cancelled (default: 15)"
+        ),
+    )
     parser.add_argument(
         "--jwt-public-key-file", required=True, help="Path to ES256 public key PEM file"
     )
@@ -46,7 +201,15 @@ def main() -> None:
         help="Reject non-HTTPS requests (true/false)",
     )
     # vLLM / VibeVoice options (required when --asr-backend vibevoice)
-    parser.add_argument("--vllm-base-url", default="", help="vLLM server base URL")
+    parser.add_argument(
+        "--vllm-base-url",
+        type=_parse_url_list,
+        default=[],
+        help=(
+            "vLLM server base URL, or several comma-separated; jobs go to the least-loaded "
+            "healthy one"
+        ),
+    )
     parser.add_argument("--vllm-model-name", default="vibevoice", help="Model name for vLLM")
     parser.add_argument(
         "--vllm-temperature", type=float, default=0.0, help="Generation temperature"
@@ -54,6 +217,71 @@ def main() -> None:
     parser.add_argument(
         "--vllm-top-p", type=float, default=1.0, help="Top-P sampling parameter"
     )
+    parser.add_argument(
+        "--vllm-stall-timeout-seconds",
+        type=float,
+        default=60.0,
+        help=(
+            "Fail a job when vLLM, having started to answer, sends nothing for this long "
+            "(default: 60)"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-max-model-len",
+        type=int,
+        default=48000,
+        help=(
+            "vLLM's --max-model-len; each request's max_tokens is kept within what the "
+            "prompt and audio leave of it (default: 48000)"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-kv-token-budget",
+        type=int,
+        default=48000,
+        help=(
+            "Total estimated KV-cache tokens (audio + output) admitted across in-flight "
+            "jobs; match the vLLM KV cache capacity (default: 48000)"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-priority-scheduling",
+        type=_parse_bool,
+        default=False,
+        help=(
+            "Forward job priority to vLLM's 'priority' request field; requires vLLM started "
+            "with --scheduling-policy priority (true/false, default: false)"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-media-dir",
+        default="",
+        help=(
+            "Hand audio to loopback vLLM backends as file:// URLs of short-lived copies in "
+            "this directory, which vLLM must see at the same path and allow with "
+            "--allowed-local-media-path; remote backends still get data URLs "
+            "(default: data URLs only)"
+        ),
+    )
+    parser.add_argument(
+        "--vllm-window-seconds",
+        type=float,
+        default=0.0,
+        help=(
+            "Split audio longer than this at pauses into windows of about this length, "
+            "transcribed concurrently and stitched back together; needed for audio beyond "
+            "the model's context (default: 0, never split)"
+        ),
+    )
+    parser.add_argument(
+        "--normalize-audio",
+        type=_parse_bool,
+        default=False,
+        help=(
+            "Downmix and resample uploads to 24 kHz mono before sending them to vLLM, "
+            "when that makes them at least a quarter smaller (true/false, default: false)"
+        ),
+    )
     # Groq Whisper options (required when --asr-backend groq)
     parser.add_argument("--groq-api-key", default="", help="Groq API key")
     parser.add_argument(
@@ -62,8 +290,44 @@ def main() -> None:
 
     args = parser.parse_args()
 
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.max_queued_audio_seconds < 0:
+        parser.error("--max-queued-audio-seconds must not be negative")
+    if args.max_queued_audio_bytes < 0:
+        parser.error("--max-queued-audio-bytes must not be negative")
+    if args.max_concurrent_jobs < 1:
+        parser.error("--max-concurrent-jobs must be at least 1")
+    if args.max_media_processes < 1:
+        parser.error("--max-media-processes must be at least 1")
+    if args.media_process_timeout_seconds <= 0:
+        parser.error("--media-process-timeout-seconds must be positive")
+    if args.vllm_stall_timeout_seconds <= 0:
+        parser.error("--vllm-stall-timeout-seconds must be positive")
+    if args.audio_spool_dir and not os.path.isdir(args.audio_spool_dir):
+        parser.error(f"--audio-spool-dir {args.audio_spool_dir!r} is not a directory")
+    if args.vllm_media_dir and not os.path.isdir(args.vllm_media_dir):
+        parser.error(f"--vllm-media-dir {args.vllm_media_dir!r} is not a directory")
+    if args.priority_lane_seconds < 0:
+        parser.error("--priority-lane-seconds must not be negative")
+    if args.job_retention_seconds < 0:
+        parser.error("--job-retention-seconds must not be negative")
+    if args.result_cache_bytes < 0:
+        parser.error("--result-cache-bytes must not be negative")
+    if args.result_cache_ttl_seconds <= 0:
+        parser.error("--result-cache-ttl-seconds must be positive")
+    if args.stream_resume_grace_seconds < 0:
+        parser.error("--stream-resume-grace-seconds must not be negative")
+    if args.vllm_window_seconds and args.vllm_window_seconds < MIN_WINDOW_SECONDS:
+        parser.error(f"--vllm-window-seconds must be 0 or at least {MIN_WINDOW_SECONDS:g}")
+    if args.vllm_kv_token_budget < 1:
+        parser.error("--vllm-kv-token-budget must be at least 1")
+    if args.vllm_max_model_len < 1:
+        parser.error("--vllm-max-model-len must be at least 1")
     if args.asr_backend == "vibevoice" and not args.vllm_base_url:
         parser.error("--vllm-base-url is required when --asr-backend is vibevoice")
+    if len(set(args.vllm_base_url)) != len(args.vllm_base_url):
+        parser.error("--vllm-base-url lists the same URL twice")
     if args.asr_backend == "groq" and not args.groq_api_key:
         parser.error("--groq-api-key is required when --asr-backend is groq")
 
@@ -71,19 +335,45 @@ def main() -> None:
         asr_backend=args.asr_backend,
         server_host=args.host,
         server_port=args.port,
+        server_workers=args.workers,
+        broker_socket_path=args.broker_socket,
         max_audio_bytes=args.max_audio_bytes,
+        audio_spool_dir=args.audio_spool_dir,
         max_queue_size=args.max_queue_size,
+        max_queued_audio_seconds=args.max_queued_audio_seconds,
+        max_queued_audio_bytes=args.max_queued_audio_bytes,
+        max_concurrent_jobs=args.max_concurrent_jobs,
+        max_media_processes=args.max_media_processes,
+        media_process_timeout_seconds=args.media_process_timeout_seconds,
+        trim_silence=args.trim_silence,
+        subject_weights=args.subject_weights,
+        priority_lane_seconds=args.priority_lane_seconds,
+        eta_model_file=args.eta_model_file,
+        job_retention_seconds=args.job_retention_seconds,
+        result_cache_bytes=args.result_cache_bytes,
+        result_cache_ttl_seconds=args.result_cache_ttl_seconds,
+        stream_resume_grace_seconds=args.stream_resume_grace_seconds,
         jwt_public_key_file=args.jwt_public_key_file,
         revoked_tokens_file=args.revoked_tokens_file,
         require_https=args.require_https,
-        vllm_base_url=args.vllm_base_url,
+        vllm_base_urls=args.vllm_base_url,
         vllm_model_name=args.vllm_model_name,
         vllm_temperature=args.vllm_temperature,
         vllm_top_p=args.vllm_top_p,
+        vllm_stall_timeout_seconds=args.vllm_stall_timeout_seconds,
+        vllm_max_model_len=args.vllm_max_model_len,
+        vllm_kv_token_budget=args.vllm_kv_token_budget,
+        vllm_priority_scheduling=args.vllm_priority_scheduling,
+        vllm_media_dir=os.path.abspath(args.vllm_media_dir) if args.vllm_media_dir else "",
+        vllm_window_seconds=args.vllm_window_seconds,
+        normalize_audio=args.normalize_audio,
         groq_api_key=args.groq_api_key,
         groq_model_name=args.groq_model_name,
     )
 
+    if settings.server_workers > 1:
+        serve_with_workers(settings)
+        return
     app = create_app(settings)
     uvicorn.run(
         app,
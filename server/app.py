@@ -1,17 +1,18 @@
 import json
+import os
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from functools import partial
 from typing import ClassVar
 
 import httpx
 from fastapi import FastAPI
 from starlette.types import ASGIApp, Receive, Scope, Send
 
+from server.audio import FfmpegPool
+from server.broker import SETTINGS_FILE_ENV_VAR, BrokerQueueService
 from server.config import Settings
-from server.queue import TranscriptionQueue
+from server.queue_service import create_local_service
 from server.routes import health, queue_status, transcribe
-from server.transcribe import process_groq_job, process_vibevoice_job
 
 
 class RequireHTTPSMiddleware:
@@ -45,23 +46,26 @@ class RequireHTTPSMiddleware:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    config = app.state.settings
+    config: Settings = app.state.settings
 
     http_client = httpx.AsyncClient()
     app.state.http_client = http_client
+    ffmpeg = FfmpegPool(config.max_media_processes, config.media_process_timeout_seconds)
+    app.state.ffmpeg = ffmpeg
 
-    queue = TranscriptionQueue(max_size=config.max_queue_size)
-    if config.asr_backend == "groq":
-        process_fn = partial(process_groq_job, http_client=http_client, config=config)
+    if config.server_workers > 1:
+        # The coordinator process runs the queue; see server.broker.
+        app.state.queue_service = BrokerQueueService(config.broker_socket_path)
+        yield
     else:
-        process_fn = partial(process_vibevoice_job, http_client=http_client, config=config)
-    queue.set_process_fn(process_fn)
-    queue.start_worker()
-    app.state.queue = queue
+        service = create_local_service(config, http_client, ffmpeg)
+        service.start()
+        app.state.queue = service.queue
+        app.state.queue_service = service
 
-    yield
+        yield
 
-    await queue.stop()
+        await service.stop()
     await http_client.aclose()
 
 
@@ -83,3 +87,9 @@ def create_app(settings: Settings) -> FastAPI:
         app.add_middleware(RequireHTTPSMiddleware)
 
     return app
+
+
+def create_app_from_env() -> FastAPI:
+    """App factory for uvicorn worker processes started by server.broker."""
+    with open(os.environ[SETTINGS_FILE_ENV_VAR]) as file:
+        return create_app(Settings.model_validate_json(file.read()))
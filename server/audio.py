@@ -1,10 +1,16 @@
 import asyncio
 import base64
+import io
 import json
-import os
-import tempfile
+import tarfile
+import time
+import zipfile
+from collections.abc import Callable
 from pathlib import PurePosixPath
 
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import duration_from_headers
+
 _MIME_MAP = {
     ".wav": "audio/wav",
     ".mp3": "audio/mpeg",
@@ -17,6 +23,10 @@ _MIME_MAP = {
     ".wma": "audio/x-ms-wma",
     ".aac": "audio/aac",
 }
+# Extension used when handing audio of a MIME type over by file name.
+_SUFFIX_FOR_MIME = {mime: suffix for suffix, mime in reversed(_MIME_MAP.items())}
+
+_ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
 
 
 def encode_audio_base64(raw_bytes: bytes) -> str:
@@ -39,64 +49,197 @@ def detect_mime_type(filename: str) -> str:
     return _MIME_MAP[suffix]
 
 
-async def compress_to_opus(raw_bytes: bytes) -> bytes:
-    """Compress audio to OGG/Opus via ffmpeg. Keeps file size small for cloud APIs."""
-    with tempfile.NamedTemporaryFile(suffix=".audio") as src:
-        src.write(raw_bytes)
-        src.flush()
-        with tempfile.NamedTemporaryFile(suffix=".ogg", delete=False) as dst:
-            dst_path = dst.name
+def suffix_for_mime(mime_type: str) -> str:
+    """Return a file extension for an audio MIME type, or "" for an unknown one."""
+    return _SUFFIX_FOR_MIME.get(mime_type, "")
 
-        try:
-            process = await asyncio.create_subprocess_exec(
-                "ffmpeg",
-                "-y",
-                "-i", src.name,
-                "-vn",
-                "-ac", "1",
-                "-ar", "16000",
-                "-c:a", "libopus",
-                "-b:a", "64k",
-                dst_path,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            _, stderr_data = await process.communicate()
-            if process.returncode != 0:
-                err = stderr_data.decode("utf-8", errors="replace")
-                raise RuntimeError(f"ffmpeg opus compression failed: {err}")
-
-            with open(dst_path, "rb") as f:
-                return f.read()
-        finally:
-            os.unlink(dst_path)
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(_ARCHIVE_SUFFIXES)
 
 
-async def probe_duration(raw_bytes: bytes) -> float:
-    """Get audio duration in seconds via ffprobe without transcoding.
+def unpack_archive(filename: str, data: bytes, max_total_bytes: int) -> list[tuple[str, bytes]]:
+    """Return (member name, bytes) of every audio file in a zip or tar archive, in archive order.
 
-    Uses a temp file instead of stdin pipe because ffprobe cannot determine
-    duration for some formats (e.g. WAV) when reading from a pipe.
+    Directories, hidden files and members without an audio extension are
+    skipped. Raises ValueError if the archive is unreadable or its audio
+    files unpack to more than `max_total_bytes`, however small the archive.
+    """
+    files: list[tuple[str, bytes]] = []
+    remaining = max_total_bytes
+
+    def take(name: str, read: Callable[[int], bytes]) -> None:
+        nonlocal remaining
+        # Read one byte past the limit rather than trusting the declared size.
+        content = read(remaining + 1)
+        remaining -= len(content)
+        if remaining < 0:
+            raise ValueError(f"Audio in {filename} unpacks to more than {max_total_bytes} bytes")
+        files.append((name, content))
+
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_audio_member(info.filename):
+                        with archive.open(info) as member:
+                            take(info.filename, member.read)
+        else:
+            with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+                for tar_info in tar:
+                    if tar_info.isfile() and _is_audio_member(tar_info.name):
+                        extracted = tar.extractfile(tar_info)
+                        assert extracted is not None, f"No data for tar member {tar_info.name}"
+                        take(tar_info.name, extracted.read)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as exc:
+        raise ValueError(f"Cannot read archive {filename}: {exc}") from None
+    return files
+
+
+def _is_audio_member(name: str) -> bool:
+    path = PurePosixPath(name)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return path.suffix.lower() in _MIME_MAP
+
+
+class FfmpegPool:
+    """Runs ffmpeg and ffprobe with at most `max_processes` of them alive at once.
+
+    Calls beyond the cap wait in FIFO order, so a burst of uploads cannot
+    fork enough decoders to starve the event loop of CPU. Every run has a
+    timeout, and a run that times out or whose caller is cancelled kills
+    its process.
     """
-    with tempfile.NamedTemporaryFile(suffix=".audio") as tmp:
-        tmp.write(raw_bytes)
-        tmp.flush()
 
+    def __init__(self, max_processes: int, timeout_seconds: float) -> None:
+        assert max_processes >= 1, f"Expected at least one process, got: {max_processes}"
+        assert timeout_seconds > 0, f"Expected a positive timeout, got: {timeout_seconds}"
+        self.max_processes = max_processes
+        self.timeout_seconds = timeout_seconds
+        self._slots = asyncio.Semaphore(max_processes)
+        self._running = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._wait_seconds_total = 0.0
+        self._max_wait_seconds = 0.0
+
+    async def run(self, audio: AudioBuffer, command: Callable[[str], list[str]]) -> bytes:
+        """Run `command(input_path)` on the audio and return its stdout.
+
+        The audio is opened as a descriptor only once a slot is free. Raises
+        RuntimeError if the process fails or times out.
+        """
+        queued_at = time.monotonic()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        waited = time.monotonic() - queued_at
+        self._wait_seconds_total += waited
+        self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        self._running += 1
+        try:
+            async with audio.subprocess_fd() as fd:
+                args = command(f"/dev/fd/{fd}")
+                returncode, stdout, stderr = await self._run_one(args, (fd,))
+        finally:
+            self._running -= 1
+            self._slots.release()
+        if returncode != 0:
+            self._failed += 1
+            err = stderr.decode("utf-8", errors="replace")
+            raise RuntimeError(f"{args[0]} failed: {err}")
+        self._completed += 1
+        return stdout
+
+    async def _run_one(
+        self, args: list[str], pass_fds: tuple[int, ...]
+    ) -> tuple[int, bytes, bytes]:
         process = await asyncio.create_subprocess_exec(
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            tmp.name,
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
+            pass_fds=pass_fds,
         )
-        stdout, stderr = await process.communicate()
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                stdout, stderr = await process.communicate()
+        except TimeoutError:
+            self._timed_out += 1
+            raise RuntimeError(
+                f"{args[0]} did not finish within {self.timeout_seconds:g} seconds"
+            ) from None
+        finally:
+            if process.returncode is None:
+                # Timed out or cancelled: never leave a decoder running unobserved.
+                process.kill()
+                await asyncio.shield(process.wait())
+        assert process.returncode is not None, f"{args[0]} exited without a return code"
+        return process.returncode, stdout, stderr
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "max_processes": self.max_processes,
+            "running": self._running,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "wait_seconds_total": round(self._wait_seconds_total, 3),
+            "max_wait_seconds": round(self._max_wait_seconds, 3),
+        }
+
+
+async def compress_to_opus(audio: AudioBuffer, ffmpeg: FfmpegPool) -> bytes:
+    """Compress audio to OGG/Opus via ffmpeg. Keeps file size small for cloud APIs."""
+    return await ffmpeg.run(
+        audio,
+        lambda path: [
+            "ffmpeg",
+            "-nostdin",
+            "-i", path,
+            "-vn",
+            "-ac", "1",
+            "-ar", "16000",
+            "-c:a", "libopus",
+            "-b:a", "64k",
+            # Ogg can be written to a pipe, so the output needs no temp file either.
+            "-f", "ogg",
+            "pipe:1",
+        ],
+    )
+
+
+async def probe_duration(audio: AudioBuffer, ffmpeg: FfmpegPool) -> float:
+    """Get audio duration in seconds, from the container headers if they tell.
+
+    Otherwise runs ffprobe on a descriptor of the audio rather than a stdin
+    pipe, because ffprobe cannot determine the duration of some formats
+    (e.g. ADTS AAC or VBR MP3) without seeking and knowing the file size.
+    """
+    with audio.mapped() as data:
+        duration = duration_from_headers(data)
+    if duration is not None:
+        return duration
+    return await _ffprobe_duration(audio, ffmpeg)
 
-    if process.returncode != 0:
-        error_msg = stderr.decode("utf-8", errors="replace")
-        raise RuntimeError(f"ffprobe failed: {error_msg}")
 
+async def _ffprobe_duration(audio: AudioBuffer, ffmpeg: FfmpegPool) -> float:
+    stdout = await ffmpeg.run(
+        audio,
+        lambda path: [
+            "ffprobe",
+            "-v", "quiet",
+            "-print_format", "json",
+            "-show_format",
+            path,
+        ],
+    )
     info = json.loads(stdout)
     if "format" not in info:
         raise RuntimeError("ffprobe output missing 'format' key")
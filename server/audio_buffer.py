@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import mmap
+import os
+import secrets
+import tempfile
+from collections.abc import AsyncIterator, Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+# Read size when streaming a spooled file; a multiple of 3 so base64 chunks concatenate.
+_READ_CHUNK_BYTES = 3 * 256 * 1024
+# Bytes of an arriving upload collected before each write to its spool file.
+_SPOOL_WRITE_BYTES = 1024 * 1024
+_WIPE_CHUNK = bytes(1024 * 1024)
+# Names of exported copies start with this, so stray ones are easy to spot.
+_EXPORT_PREFIX = "vibevoice-audio-"
+
+
+class AudioBuffer:
+    """A job's uploaded audio, held until the job is dispatched and then wiped.
+
+    In memory mode the raw bytes stay resident. In spool mode they are written
+    to an anonymous temp file that is unlinked on creation, so only the open
+    descriptor refers to it, and nothing is left on disk if the process dies.
+    Either way the base64 form the backend wants is produced chunk by chunk at
+    dispatch time instead of being kept for the whole wait.
+    """
+
+    def __init__(self, data: bytes | None, file: BinaryIO | None, size: int) -> None:
+        self._data = data
+        self._file = file
+        self._size = size
+
+    @classmethod
+    def in_memory(cls, raw_bytes: bytes) -> AudioBuffer:
+        return cls(raw_bytes, None, len(raw_bytes))
+
+    @classmethod
+    async def spool(cls, raw_bytes: bytes, directory: str) -> AudioBuffer:
+        """Write audio to an already-unlinked temp file in `directory`."""
+
+        def write() -> BinaryIO:
+            # On Linux this is O_TMPFILE: the file never has a name at all.
+            file = tempfile.TemporaryFile(dir=directory)  # noqa: SIM115
+            try:
+                file.write(raw_bytes)
+                file.flush()
+            except BaseException:
+                file.close()
+                raise
+            return file
+
+        return cls(None, await asyncio.to_thread(write), len(raw_bytes))
+
+    @classmethod
+    def collect(cls, chunks: Iterable[bytes], spool_dir: str) -> AudioBuffer:
+        """Build a buffer from chunks as they are produced, spooling them if `spool_dir` is set.
+
+        Blocks on the writes and whatever produces the chunks; run it in a thread.
+        """
+        if not spool_dir:
+            return cls.in_memory(b"".join(chunks))
+        # On Linux this is O_TMPFILE: the file never has a name at all.
+        file = tempfile.TemporaryFile(dir=spool_dir)  # noqa: SIM115
+        size = 0
+        try:
+            for chunk in chunks:
+                size += file.write(chunk)
+            file.flush()
+        except BaseException:
+            file.close()
+            raise
+        return cls(None, file, size)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def spooled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def wiped(self) -> bool:
+        return self._data is None and self._file is None
+
+    def base64_size(self) -> int:
+        return 4 * ((self._size + 2) // 3)
+
+    async def read(self) -> bytes:
+        if self._data is not None:
+            return self._data
+        file = self._require_file()
+
+        def read_all() -> bytes:
+            file.seek(0)
+            return file.read()
+
+        return await asyncio.to_thread(read_all)
+
+    @contextlib.contextmanager
+    def mapped(self) -> Iterator[bytes | mmap.mmap]:
+        """The audio as a read-only buffer; a spool file is memory-mapped rather than read."""
+        if self._data is not None or self._size == 0:
+            yield self._data or b""
+            return
+        file = self._require_file()
+        with mmap.mmap(file.fileno(), self._size, access=mmap.ACCESS_READ) as view:
+            yield view
+
+    @contextlib.asynccontextmanager
+    async def subprocess_fd(self) -> AsyncIterator[int]:
+        """A seekable descriptor of the audio for a child process to open as /dev/fd/N.
+
+        A spool file is passed as is. In-memory audio is copied into an
+        anonymous memory file (memfd), so no temp file touches the disk.
+        """
+        if self._data is None:
+            yield self._require_file().fileno()
+            return
+        data = self._data
+
+        def copy() -> int:
+            fd = _anonymous_fd()
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            except BaseException:
+                os.close(fd)
+                raise
+            return fd
+
+        fd = await asyncio.to_thread(copy)
+        try:
+            yield fd
+        finally:
+            os.close(fd)
+
+    async def iter_base64(self) -> AsyncIterator[bytes]:
+        """Yield the audio base64-encoded in chunks, without materialising it whole."""
+        if self._data is not None:
+            for start in range(0, len(self._data), _READ_CHUNK_BYTES):
+                yield base64.b64encode(self._data[start:start + _READ_CHUNK_BYTES])
+            return
+        file = self._require_file()
+        offset = 0
+        carry = b""
+        while offset < self._size:
+            chunk = await asyncio.to_thread(os.pread, file.fileno(), _READ_CHUNK_BYTES, offset)
+            if not chunk:
+                raise RuntimeError(
+                    f"Spooled audio truncated: expected {self._size} bytes, got {offset}"
+                )
+            offset += len(chunk)
+            # A short read must not break the 3-byte alignment base64 chunks rely on.
+            data = carry + chunk
+            aligned = len(data) - len(data) % 3 if offset < self._size else len(data)
+            carry = data[aligned:]
+            yield base64.b64encode(data[:aligned])
+
+    async def export(self, directory: str, suffix: str) -> AudioExport:
+        """Copy the audio to a new file in `directory` that only its owner can read.
+
+        For a reader that takes a path rather than the bytes, such as vLLM
+        loading a file:// URL. The name is random and the caller removes the
+        copy as soon as it has been read.
+        """
+        path = os.path.join(directory, f"{_EXPORT_PREFIX}{secrets.token_hex(16)}{suffix}")
+
+        def write() -> BinaryIO:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+            file = os.fdopen(fd, "r+b")
+            try:
+                if self._data is not None:
+                    file.write(self._data)
+                    file.flush()
+                else:
+                    source = self._require_file().fileno()
+                    offset = 0
+                    while offset < self._size:
+                        sent = os.sendfile(fd, source, offset, self._size - offset)
+                        if sent == 0:
+                            raise RuntimeError(
+                                f"Spooled audio truncated: expected {self._size} bytes, "
+                                f"got {offset}"
+                            )
+                        offset += sent
+            except BaseException:
+                file.close()
+                os.unlink(path)
+                raise
+            return file
+
+        return AudioExport(path, await asyncio.to_thread(write), self._size)
+
+    def wipe(self) -> None:
+        """Drop the audio. A spool file is zeroed, truncated and closed in the background."""
+        self._data = None
+        file, self._file = self._file, None
+        if file is not None:
+            # Overwriting a long recording takes a while; keep it off the event loop.
+            asyncio.get_running_loop().run_in_executor(None, _shred, file, self._size)
+
+    def _require_file(self) -> BinaryIO:
+        assert self._file is not None, "Audio buffer was already wiped"
+        return self._file
+
+
+class AudioExport:
+    """A named copy of an AudioBuffer, made by AudioBuffer.export."""
+
+    def __init__(self, path: str, file: BinaryIO, size: int) -> None:
+        self.path = path
+        self._file: BinaryIO | None = file
+        self._size = size
+
+    @property
+    def url(self) -> str:
+        return Path(os.path.abspath(self.path)).as_uri()
+
+    @property
+    def removed(self) -> bool:
+        return self._file is None
+
+    def remove(self) -> None:
+        """Unlink the copy, then zero, truncate and close it in the background. Idempotent."""
+        file, self._file = self._file, None
+        if file is None:
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        asyncio.get_running_loop().run_in_executor(None, _shred, file, self._size)
+
+
+class AudioBufferWriter:
+    """Builds an AudioBuffer from chunks while an upload is still arriving.
+
+    With a spool directory the chunks are appended to an anonymous temp file
+    in batches of _SPOOL_WRITE_BYTES, off the event loop; without one they
+    are collected in memory.
+    """
+
+    def __init__(self, spool_dir: str) -> None:
+        self._spool_dir = spool_dir
+        self._chunks: list[bytes] = []
+        self._pending = 0
+        self._size = 0
+        self._file: BinaryIO | None = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def write(self, chunk: bytes) -> None:
+        self._chunks.append(chunk)
+        self._pending += len(chunk)
+        self._size += len(chunk)
+        if self._spool_dir and self._pending >= _SPOOL_WRITE_BYTES:
+            await self._flush()
+
+    async def finish(self) -> AudioBuffer:
+        if not self._spool_dir:
+            return AudioBuffer.in_memory(b"".join(self._chunks))
+        await self._flush()
+        assert self._file is not None, "Spool file missing after flush"
+        await asyncio.to_thread(self._file.flush)
+        file, self._file = self._file, None
+        return AudioBuffer(None, file, self._size)
+
+    def discard(self) -> None:
+        """Drop what was received so far, wiping any spool file like AudioBuffer.wipe."""
+        self._chunks = []
+        file, self._file = self._file, None
+        if file is not None:
+            AudioBuffer(None, file, self._size).wipe()
+
+    async def _flush(self) -> None:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self._pending = 0
+        try:
+            self._file = await asyncio.to_thread(self._append, data)
+        except BaseException:
+            # _append closed the file; there is nothing left to wipe.
+            self._file = None
+            raise
+
+    def _append(self, data: bytes) -> BinaryIO:
+        file = self._file
+        if file is None:
+            # On Linux this is O_TMPFILE: the file never has a name at all.
+            file = tempfile.TemporaryFile(dir=self._spool_dir)  # noqa: SIM115
+        try:
+            file.write(data)
+        except BaseException:
+            file.close()
+            raise
+        return file
+
+
+def _anonymous_fd() -> int:
+    if hasattr(os, "memfd_create"):
+        return os.memfd_create("audio", os.MFD_CLOEXEC)
+    # No memfd outside Linux; an unlinked temp file is the next best thing.
+    with tempfile.TemporaryFile() as file:
+        return os.dup(file.fileno())
+
+
+def _shred(file: BinaryIO, size: int) -> None:
+    try:
+        file.seek(0)
+        remaining = size
+        while remaining > 0:
+            remaining -= file.write(_WIPE_CHUNK[:remaining])
+        file.flush()
+        os.fsync(file.fileno())
+        file.truncate(0)
+    finally:
+        file.close()
@@ -0,0 +1,235 @@
+"""Audio duration from container headers, without decoding or a subprocess.
+
+Covers the formats uploads usually arrive in: WAV, FLAC, Ogg (Vorbis and
+Opus), MP3 and MP4/M4A. Anything else, or a file whose headers do not pin
+the duration down (a VBR MP3 without a Xing/VBRI frame, a fragmented MP4,
+a FLAC with an unknown sample count), yields None so the caller can fall
+back to ffprobe.
+"""
+
+import mmap
+import struct
+
+# An upload held in memory, or the memory-mapped spool file it was written to
+AudioBytes = bytes | mmap.mmap
+
+# Index 0 is "free format" and 15 is invalid; both fall back to ffprobe.
+_MP3_BITRATES_KBPS = {
+    # MPEG-1 Layer III
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0),
+    # MPEG-2 and 2.5 Layer III
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0),
+}
+_MP3_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    25: (11025, 12000, 8000),
+}
+# Frames that must agree on bitrate before a headerless MP3 is taken as CBR.
+_MP3_CBR_CHECK_FRAMES = 4
+# WAV format tags whose byte rate is exact: PCM, IEEE float, extensible.
+_WAV_EXACT_FORMATS = (0x0001, 0x0003, 0xFFFE)
+# Opus granule positions always count 48 kHz samples.
+_OPUS_GRANULE_RATE = 48000
+
+
+def duration_from_headers(data: AudioBytes) -> float | None:
+    """Return the duration in seconds of an audio file, or None if its headers cannot tell."""
+    try:
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            return _wav_duration(data)
+        if data[4:8] == b"ftyp":
+            return _mp4_duration(data)
+        if data[:4] == b"OggS":
+            return _ogg_duration(data)
+        start = _skip_id3v2(data)
+        if data[start : start + 4] == b"fLaC":
+            return _flac_duration(data, start + 4)
+        return _mp3_duration(data, start)
+    except (struct.error, IndexError, ZeroDivisionError):
+        # Truncated or corrupt headers: let ffprobe have a go and report the error.
+        return None
+
+
+def _unpack(fmt: str, data: AudioBytes, pos: int) -> tuple[int, ...]:
+    """struct.unpack_from for formats made of integers only."""
+    return tuple(int(value) for value in struct.unpack_from(fmt, data, pos))
+
+
+def _wav_duration(data: AudioBytes) -> float | None:
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos : pos + 4]
+        (size,) = _unpack("<I", data, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            format_tag, _, _, byte_rate = _unpack("<HHII", data, body)
+            if format_tag not in _WAV_EXACT_FORMATS:
+                return None
+        elif chunk_id == b"data":
+            if byte_rate is None:
+                return None
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF; count what is there.
+            available = len(data) - body
+            if size in (0, 0xFFFFFFFF) or size > available:
+                size = available
+            return size / byte_rate
+        # Chunks are padded to an even length.
+        pos = body + size + (size & 1)
+    return None
+
+
+def _flac_duration(data: AudioBytes, pos: int) -> float | None:
+    # The first metadata block is always STREAMINFO.
+    block_type = data[pos] & 0x7F
+    if block_type != 0:
+        return None
+    info = data[pos + 4 : pos + 4 + 34]
+    (packed,) = _unpack(">Q", info, 10)
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if sample_rate == 0 or total_samples == 0:
+        return None
+    return total_samples / sample_rate
+
+
+def _ogg_duration(data: AudioBytes) -> float | None:
+    # The first page holds exactly the codec's identification packet.
+    (serial,) = _unpack("<I", data, 14)
+    segments = data[26]
+    packet = data[27 + segments :]
+    if packet[:7] == b"\x01vorbis":
+        (rate,) = _unpack("<I", packet, 12)
+        pre_skip = 0
+    elif packet[:8] == b"OpusHead":
+        (pre_skip,) = _unpack("<H", packet, 10)
+        rate = _OPUS_GRANULE_RATE
+    else:
+        return None
+    if rate == 0:
+        return None
+
+    # The last page of the stream carries the total sample count as its granule.
+    pos = len(data)
+    while True:
+        pos = data.rfind(b"OggS", 0, pos)
+        if pos < 0:
+            return None
+        if pos + 27 > len(data) or data[pos + 4] != 0:
+            continue
+        granule, page_serial = _unpack("<qI", data, pos + 6)
+        if page_serial == serial and granule >= 0:
+            return max(0, granule - pre_skip) / rate
+
+
+def _mp4_duration(data: AudioBytes) -> float | None:
+    moov = _find_box(data, 0, len(data), b"moov")
+    if moov is None:
+        return None
+    mvhd = _find_box(data, moov[0], moov[1], b"mvhd")
+    if mvhd is None:
+        return None
+    pos = mvhd[0]
+    if data[pos] == 1:
+        timescale, duration = _unpack(">IQ", data, pos + 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = _unpack(">II", data, pos + 12)
+        unknown = 0xFFFFFFFF
+    # Fragmented files leave the movie header empty and put durations in fragments.
+    if timescale == 0 or duration in (0, unknown):
+        return None
+    return duration / timescale
+
+
+def _find_box(data: AudioBytes, start: int, end: int, box_type: bytes) -> tuple[int, int] | None:
+    """Return the (body start, end) of the first `box_type` box between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        (size,) = _unpack(">I", data, pos)
+        found = data[pos + 4 : pos + 8]
+        header = 8
+        if size == 1:
+            (size,) = _unpack(">Q", data, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return None
+        if found == box_type:
+            return pos + header, min(pos + size, end)
+        pos += size
+    return None
+
+
+def _skip_id3v2(data: AudioBytes) -> int:
+    if data[:3] != b"ID3":
+        return 0
+    flags = data[5]
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if flags & 0x10 else 0
+    return 10 + size + footer
+
+
+def _mp3_frame(data: AudioBytes, pos: int) -> tuple[int, int, int, int, int] | None:
+    """Parse the Layer III frame header at pos: (version, bitrate kbps, rate, length, samples)."""
+    if pos + 4 > len(data):
+        return None
+    (header,) = _unpack(">I", data, pos)
+    if header >> 21 != 0x7FF:
+        return None
+    version = {0b11: 1, 0b10: 2, 0b00: 25}.get((header >> 19) & 0b11)
+    layer = (header >> 17) & 0b11
+    if version is None or layer != 0b01:
+        return None
+    bitrate = _MP3_BITRATES_KBPS[1 if version == 1 else 2][(header >> 12) & 0xF]
+    rate_index = (header >> 10) & 0b11
+    if bitrate == 0 or rate_index == 3:
+        return None
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    samples = 1152 if version == 1 else 576
+    length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return version, bitrate, sample_rate, length, samples
+
+
+def _mp3_duration(data: AudioBytes, start: int) -> float | None:
+    frame = _mp3_frame(data, start)
+    if frame is None:
+        return None
+    version, bitrate, sample_rate, _, samples = frame
+    mono = (data[start + 3] >> 6) == 0b11
+
+    # A Xing/Info or VBRI frame in place of the first audio frame counts the frames.
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = start + 4 + side_info
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        (flags,) = _unpack(">I", data, xing + 4)
+        if not flags & 1:
+            return None
+        (frames,) = _unpack(">I", data, xing + 8)
+        return frames * samples / sample_rate
+    vbri = start + 4 + 32
+    if data[vbri : vbri + 4] == b"VBRI":
+        (frames,) = _unpack(">I", data, vbri + 14)
+        return frames * samples / sample_rate
+
+    # No frame count: only a constant bitrate makes the size give the duration.
+    pos = start
+    for _ in range(_MP3_CBR_CHECK_FRAMES):
+        frame = _mp3_frame(data, pos)
+        if frame is None:
+            # The file ended after fewer frames, or the chain is broken.
+            if pos < len(data):
+                return None
+            break
+        if frame[1] != bitrate:
+            return None
+        pos += frame[3]
+    end = len(data)
+    if end - 128 >= start and data[end - 128 : end - 125] == b"TAG":
+        end -= 128
+    return (end - start) * 8 / (bitrate * 1000)
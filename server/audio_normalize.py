@@ -0,0 +1,160 @@
+"""Shrinking audio to 24 kHz mono before it is sent to vLLM.
+
+VibeVoice resamples everything to 24 kHz mono itself, so a 48 kHz stereo
+upload costs four times the base64, JSON parsing and transfer it needs.
+PCM and float WAVs are downmixed and resampled in-process with NumPy and
+written back as 16-bit PCM WAV; anything else goes through ffmpeg to FLAC.
+Files that would not come out clearly smaller are left alone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from collections.abc import Iterator
+from dataclasses import dataclass
+from fractions import Fraction
+
+import numpy as np
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import AudioBytes
+from server.wav import (
+    WAV_HEADER_BYTES,
+    WAVE_FORMAT_PCM,
+    Samples,
+    WavLayout,
+    mono_samples,
+    wav_header,
+    wav_layout,
+)
+
+TARGET_SAMPLE_RATE = 24000
+# Normalize only if the result is expected to be at most this fraction of the original.
+_MAX_SIZE_RATIO = 0.75
+# Output samples computed per resampling step; bounds the working set.
+_BLOCK_SAMPLES = 65536
+# Zero crossings of the sinc on each side of the filter centre, at the cutoff.
+_FILTER_ZERO_CROSSINGS = 8
+# Fraction of the output Nyquist frequency the low-pass filter passes.
+_FILTER_ROLLOFF = 0.95
+# Resampling ratios needing more filter phases than this (e.g. 47999 Hz) go to ffmpeg.
+_MAX_FILTER_PHASES = 1024
+
+
+@dataclass(frozen=True)
+class NormalizedAudio:
+    audio: AudioBuffer
+    mime: str
+
+
+async def normalize_audio(
+    audio: AudioBuffer,
+    mime: str,
+    duration_seconds: float,
+    ffmpeg: FfmpegPool,
+    spool_dir: str,
+) -> NormalizedAudio | None:
+    """Downmix and resample `audio` to at most 24 kHz mono, or None if it is already compact.
+
+    The estimate is what 16-bit PCM at 24 kHz mono would take, which
+    already rules out lossy formats and files at or below the target rate.
+    The result is spooled to `spool_dir` if one is given, like an upload.
+    Raises RuntimeError if ffmpeg fails.
+    """
+    estimate = WAV_HEADER_BYTES + math.ceil(duration_seconds * TARGET_SAMPLE_RATE) * 2
+    if estimate > audio.size * _MAX_SIZE_RATIO:
+        return None
+
+    with audio.mapped() as data:
+        layout = wav_layout(data) if mime == "audio/wav" else None
+    if layout is not None and _resamplable(layout.sample_rate):
+        normalized = await asyncio.to_thread(_resample_wav, audio, layout, spool_dir)
+        return NormalizedAudio(normalized, "audio/wav")
+
+    flac = await ffmpeg.run(
+        audio,
+        lambda path: [
+            "ffmpeg",
+            "-nostdin",
+            "-i", path,
+            "-vn",
+            "-ac", "1",
+            "-ar", str(TARGET_SAMPLE_RATE),
+            "-sample_fmt", "s16",
+            "-c:a", "flac",
+            "-f", "flac",
+            "pipe:1",
+        ],
+    )
+    if len(flac) > audio.size * _MAX_SIZE_RATIO:
+        return None
+    if not spool_dir:
+        return NormalizedAudio(AudioBuffer.in_memory(flac), "audio/flac")
+    return NormalizedAudio(await AudioBuffer.spool(flac, spool_dir), "audio/flac")
+
+
+def _resamplable(sample_rate: int) -> bool:
+    """Whether the NumPy resampler's filter bank stays small for this input rate."""
+    if sample_rate <= TARGET_SAMPLE_RATE:
+        return True
+    return Fraction(sample_rate, TARGET_SAMPLE_RATE).denominator <= _MAX_FILTER_PHASES
+
+
+def _resample_wav(audio: AudioBuffer, layout: WavLayout, spool_dir: str) -> AudioBuffer:
+    out_rate = min(layout.sample_rate, TARGET_SAMPLE_RATE)
+    # Each output sample n sits at input position n * down / up.
+    ratio = Fraction(layout.sample_rate, out_rate)
+    up, down = ratio.denominator, ratio.numerator
+    out_frames = (layout.frames * up + down - 1) // down
+
+    def chunks() -> Iterator[bytes]:
+        yield wav_header(WAVE_FORMAT_PCM, 1, out_rate, 16, out_frames * 2)
+        with audio.mapped() as data:
+            for block in _resampled_blocks(data, layout, up, down, out_frames):
+                yield np.clip(np.rint(block * 32768.0), -32768, 32767).astype("<i2").tobytes()
+
+    return AudioBuffer.collect(chunks(), spool_dir)
+
+
+def _resampled_blocks(
+    data: AudioBytes, layout: WavLayout, up: int, down: int, out_frames: int
+) -> Iterator[Samples]:
+    """Mono output samples in blocks, decoding only the input frames each block needs."""
+    if up == down:
+        for start in range(0, layout.frames, _BLOCK_SAMPLES):
+            yield mono_samples(data, layout, start, min(start + _BLOCK_SAMPLES, layout.frames))
+        return
+
+    weights, half_width = _filter_bank(up, down)
+    offsets = np.arange(1 - half_width, half_width + 1)
+    for start in range(0, out_frames, _BLOCK_SAMPLES):
+        positions = np.arange(start, min(start + _BLOCK_SAMPLES, out_frames), dtype=np.int64)
+        centres = positions * down // up
+        phases = positions * down % up
+        first = int(centres[0]) - half_width + 1
+        last = int(centres[-1]) + half_width + 1
+        # Frames outside the file count as silence.
+        window = np.zeros(last - first, dtype=np.float32)
+        lo, hi = max(first, 0), min(last, layout.frames)
+        if lo < hi:
+            window[lo - first : hi - first] = mono_samples(data, layout, lo, hi)
+        taps = window[(centres - first)[:, None] + offsets[None, :]]
+        yield np.einsum("ij,ij->i", taps, weights[phases]).astype(np.float32)
+
+
+def _filter_bank(up: int, down: int) -> tuple[Samples, int]:
+    """Windowed-sinc low-pass weights, one row per output phase, each summing to 1.
+
+    Row p holds the taps for an output sample p/up of an input frame past
+    its centre frame, for input frames centre-half_width+1 .. centre+half_width.
+    """
+    cutoff = min(1.0, up / down) * _FILTER_ROLLOFF
+    half_width = math.ceil(_FILTER_ZERO_CROSSINGS / cutoff)
+    offsets = np.arange(1 - half_width, half_width + 1, dtype=np.float64)
+    distance = offsets[None, :] - (np.arange(up, dtype=np.float64) / up)[:, None]
+    window = 0.5 * (1.0 + np.cos(np.pi * np.clip(distance / half_width, -1.0, 1.0)))
+    weights = np.sinc(cutoff * distance) * window
+    weights /= weights.sum(axis=1, keepdims=True)
+    return weights.astype(np.float32), half_width
@@ -0,0 +1,140 @@
+"""Splitting long audio into windows at pauses, so they can be transcribed concurrently.
+
+Each boundary goes at the quietest moment in the last fifth of the window
+ending there, so words are rarely cut. Every window after the first also
+starts OVERLAP_SECONDS before its boundary: what the model hears twice
+there lets the window's speaker IDs be matched with the previous one's.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import AudioBytes
+from server.wav import WavLayout, as_wav, frame_levels, wav_excerpt
+
+OVERLAP_SECONDS = 8.0
+# Shorter windows would spend too much of themselves on the overlap.
+MIN_WINDOW_SECONDS = 60.0
+_FRAME_SECONDS = 0.03
+# Levels are averaged over this long when looking for a pause, so a stop consonant is not one.
+_PAUSE_SECONDS = 0.3
+# Share of a window at its end that is searched for the quietest boundary.
+_SEARCH_FRACTION = 0.2
+# A remainder shorter than this share of a window goes into the last window instead.
+_MIN_LAST_FRACTION = 0.25
+
+
+@dataclass(frozen=True)
+class AudioWindow:
+    audio: AudioBuffer
+    mime: str
+    # Where the window starts in the whole audio, in seconds
+    start: float
+    duration: float
+    # Seconds at the window's start that repeat the end of the previous window
+    overlap: float
+
+
+async def split_at_pauses(
+    audio: AudioBuffer,
+    mime: str,
+    duration_seconds: float,
+    window_seconds: float,
+    ffmpeg: FfmpegPool,
+    spool_dir: str,
+) -> list[AudioWindow] | None:
+    """Cut `audio` into windows of about `window_seconds`, or None if it fits in one.
+
+    PCM and float WAVs are cut in their own sample format; anything else is
+    decoded by ffmpeg to 24 kHz mono WAV first. Windows are spooled to
+    `spool_dir` if one is given, like an upload. Raises RuntimeError if
+    ffmpeg fails.
+    """
+    if duration_seconds <= window_seconds * (1 + _MIN_LAST_FRACTION):
+        return None
+    source, layout = await as_wav(audio, mime, ffmpeg)
+    boundaries = await asyncio.to_thread(_boundaries, source, layout, window_seconds)
+    if not boundaries:
+        return None
+
+    overlap = round(OVERLAP_SECONDS * layout.sample_rate)
+    windows: list[AudioWindow] = []
+    try:
+        for start, end in zip([0, *boundaries], [*boundaries, layout.frames], strict=True):
+            first = max(0, start - overlap)
+            excerpt = await asyncio.to_thread(_excerpt, source, layout, first, end, spool_dir)
+            windows.append(
+                AudioWindow(
+                    audio=excerpt,
+                    mime="audio/wav",
+                    start=first / layout.sample_rate,
+                    duration=(end - first) / layout.sample_rate,
+                    overlap=(start - first) / layout.sample_rate,
+                )
+            )
+    except BaseException:
+        for window in windows:
+            window.audio.wipe()
+        raise
+    return windows
+
+
+async def audio_from(
+    audio: AudioBuffer, mime: str, start_seconds: float, ffmpeg: FfmpegPool, spool_dir: str
+) -> AudioWindow:
+    """The part of `audio` from `start_seconds` to its end, as a window without overlap.
+
+    Formats and spooling are as for split_at_pauses. Raises RuntimeError
+    if ffmpeg fails.
+    """
+    source, layout = await as_wav(audio, mime, ffmpeg)
+    first = min(max(0, round(start_seconds * layout.sample_rate)), layout.frames)
+    excerpt = await asyncio.to_thread(_excerpt, source, layout, first, layout.frames, spool_dir)
+    return AudioWindow(
+        audio=excerpt,
+        mime="audio/wav",
+        start=first / layout.sample_rate,
+        duration=(layout.frames - first) / layout.sample_rate,
+        overlap=0.0,
+    )
+
+
+def _boundaries(audio: AudioBuffer, layout: WavLayout, window_seconds: float) -> list[int]:
+    """Sample frames at which to cut, each at the quietest pause near a window's end."""
+    frame = max(1, round(layout.sample_rate * _FRAME_SECONDS))
+    with audio.mapped() as data:
+        levels = _pause_levels(data, layout, frame)
+    window = round(window_seconds / _FRAME_SECONDS)
+    search = max(1, round(window * _SEARCH_FRACTION))
+    boundaries: list[int] = []
+    last = 0
+    while len(levels) - last > window * (1 + _MIN_LAST_FRACTION):
+        low = last + window - search
+        boundary = low + int(np.argmin(levels[low : last + window]))
+        boundaries.append(boundary * frame)
+        last = boundary
+    return boundaries
+
+
+def _pause_levels(data: AudioBytes, layout: WavLayout, frame: int) -> npt.NDArray[np.float64]:
+    levels = frame_levels(data, layout, frame)
+    width = max(1, round(_PAUSE_SECONDS / _FRAME_SECONDS))
+    smoothed: npt.NDArray[np.float64] = np.convolve(
+        levels, np.full(width, 1 / width), mode="same"
+    )
+    return smoothed
+
+
+def _excerpt(
+    audio: AudioBuffer, layout: WavLayout, first: int, end: int, spool_dir: str
+) -> AudioBuffer:
+    with audio.mapped() as data:
+        return AudioBuffer.collect(wav_excerpt(data, layout, [(first, end)]), spool_dir)
+
@@ -0,0 +1,152 @@
+"""Cutting long silences out of audio before it is transcribed.
+
+Every second sent costs prefill tokens on vLLM and billing on Groq, and
+dictation and meeting audio carries a lot of dead air. An energy detector
+over 30 ms frames marks speech relative to the file's own noise floor;
+each run of non-speech longer than a second, beyond a short margin kept on
+either side of the speech, is removed. An OffsetMap records where every
+kept stretch came from, so timestamps in the transcript can be put back
+into original-file time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import AudioBytes
+from server.wav import WavLayout, as_wav, frame_levels, wav_excerpt
+
+_FRAME_SECONDS = 0.03
+# Silence kept before and after each stretch of speech.
+_MARGIN_SECONDS = 0.3
+# Shorter pauses between the margins are natural speech rhythm and stay.
+_MIN_GAP_SECONDS = 1.0
+# Trimming that would save less than this is not worth a new copy of the audio.
+_MIN_TRIMMED_SECONDS = 1.0
+# Level percentiles taken as the noise floor and as speech.
+_FLOOR_PERCENTILE = 10
+_SPEECH_PERCENTILE = 95
+# Below this spread between floor and speech there is no clear silence to find.
+_MIN_DYNAMIC_RANGE_DB = 15.0
+# Where between the floor and speech levels a frame starts counting as speech.
+_THRESHOLD_FRACTION = 0.25
+
+
+@dataclass(frozen=True)
+class OffsetMap:
+    """Where each kept stretch of trimmed audio starts, in trimmed and in original time."""
+
+    trimmed_starts: tuple[float, ...]
+    original_starts: tuple[float, ...]
+    duration: float
+    original_duration: float
+
+    @property
+    def trimmed_seconds(self) -> float:
+        return self.original_duration - self.duration
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """Map a time in the trimmed audio back to the original.
+
+        A time on the boundary between two stretches belongs to the later
+        one, or with `end` to the earlier one, so a segment ending where a
+        cut was made ends before the removed silence rather than after it.
+        """
+        if end:
+            index = bisect.bisect_left(self.trimmed_starts, seconds) - 1
+        else:
+            index = bisect.bisect_right(self.trimmed_starts, seconds) - 1
+        index = max(index, 0)
+        return self.original_starts[index] + seconds - self.trimmed_starts[index]
+
+
+@dataclass(frozen=True)
+class TrimmedAudio:
+    audio: AudioBuffer
+    mime: str
+    offsets: OffsetMap
+
+
+async def trim_silence(
+    audio: AudioBuffer, mime: str, ffmpeg: FfmpegPool, spool_dir: str
+) -> TrimmedAudio | None:
+    """Remove long silences from `audio`, or return None if there are none worth removing.
+
+    PCM and float WAVs are cut in-process, keeping their sample format.
+    Anything else is first decoded by ffmpeg to 24 kHz mono 16-bit WAV,
+    which is what comes out. The result is spooled to `spool_dir` if one
+    is given, like an upload. Raises RuntimeError if ffmpeg fails.
+    """
+    source, layout = await as_wav(audio, mime, ffmpeg)
+    return await asyncio.to_thread(_trim_wav, source, layout, spool_dir)
+
+
+def _trim_wav(audio: AudioBuffer, layout: WavLayout, spool_dir: str) -> TrimmedAudio | None:
+    with audio.mapped() as data:
+        spans = _speech_spans(data, layout)
+    if spans is None:
+        return None
+    kept_frames = sum(end - start for start, end in spans)
+    if (layout.frames - kept_frames) / layout.sample_rate < _MIN_TRIMMED_SECONDS:
+        return None
+
+    def chunks() -> Iterator[bytes]:
+        with audio.mapped() as data:
+            yield from wav_excerpt(data, layout, spans)
+
+    trimmed_starts: list[float] = []
+    position = 0
+    for start, end in spans:
+        trimmed_starts.append(position / layout.sample_rate)
+        position += end - start
+    offsets = OffsetMap(
+        trimmed_starts=tuple(trimmed_starts),
+        original_starts=tuple(start / layout.sample_rate for start, _ in spans),
+        duration=kept_frames / layout.sample_rate,
+        original_duration=layout.duration,
+    )
+    return TrimmedAudio(AudioBuffer.collect(chunks(), spool_dir), "audio/wav", offsets)
+
+
+def _speech_spans(data: AudioBytes, layout: WavLayout) -> list[tuple[int, int]] | None:
+    """Sample frame ranges to keep, or None if the audio shows no clear silence."""
+    frame = max(1, round(layout.sample_rate * _FRAME_SECONDS))
+    levels = frame_levels(data, layout, frame)
+    if len(levels) == 0:
+        return None
+    floor, speech_level = np.percentile(levels, [_FLOOR_PERCENTILE, _SPEECH_PERCENTILE])
+    if speech_level - floor < _MIN_DYNAMIC_RANGE_DB:
+        return None
+    speech = levels > floor + (speech_level - floor) * _THRESHOLD_FRACTION
+    if not speech.any():
+        return None
+
+    # Widen each stretch of speech by the margin on both sides.
+    margin = round(_MARGIN_SECONDS / _FRAME_SECONDS)
+    kept = np.convolve(speech, np.ones(2 * margin + 1, dtype=bool), mode="same") > 0
+    # Boundaries of runs of kept frames: [starts[i], ends[i]).
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], kept.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+
+    min_gap = round(_MIN_GAP_SECONDS / _FRAME_SECONDS)
+    spans: list[tuple[int, int]] = []
+    for start, end in zip(starts.tolist(), ends.tolist(), strict=True):
+        if spans and start - spans[-1][1] < min_gap:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    # A short pause at either end of the file is not worth cutting either.
+    if spans[0][0] < min_gap:
+        spans[0] = (0, spans[0][1])
+    if len(levels) - spans[-1][1] < min_gap:
+        spans[-1] = (spans[-1][0], len(levels))
+    return [
+        (start * frame, min(end * frame, layout.frames)) for start, end in spans
+    ]
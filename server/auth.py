@@ -1,4 +1,5 @@
 import time
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
 from typing import Annotated
@@ -9,6 +10,7 @@ from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from server.config import Settings
+from server.models import JobPriority
 
 _bearer_scheme = HTTPBearer()
 
@@ -46,11 +48,26 @@ def _load_revoked_tokens(filepath: str) -> frozenset[str]:
     return revoked
 
 
+@dataclass(frozen=True)
+class TokenIdentity:
+    subject: str
+    # Highest priority class the token may request ('priority' claim, default normal)
+    max_priority: JobPriority
+
+
 def verify_token(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(_bearer_scheme)],
     settings: Annotated[Settings, Depends(_get_settings)],
 ) -> str:
     """Verify a JWT bearer token using ES256 public key. Returns the 'sub' claim."""
+    return verify_token_identity(credentials, settings).subject
+
+
+def verify_token_identity(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(_bearer_scheme)],
+    settings: Annotated[Settings, Depends(_get_settings)],
+) -> TokenIdentity:
+    """Verify a JWT bearer token like verify_token, also returning its priority ceiling."""
     if not settings.jwt_public_key_file:
         raise HTTPException(status_code=401, detail="No public key configured")
 
@@ -77,8 +94,12 @@ def verify_token(
     if not isinstance(jti, str):
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    priority = payload.get("priority", JobPriority.NORMAL.value)
+    if not isinstance(priority, str) or priority not in {p.value for p in JobPriority}:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
     revoked = _load_revoked_tokens(settings.revoked_tokens_file)
     if jti in revoked:
         raise HTTPException(status_code=401, detail="Token has been revoked")
 
-    return sub
+    return TokenIdentity(subject=sub, max_priority=JobPriority(priority))
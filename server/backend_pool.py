@@ -0,0 +1,172 @@
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds between /health probes of every backend.
+HEALTH_PROBE_INTERVAL_SECONDS = 10.0
+HEALTH_PROBE_TIMEOUT_SECONDS = 5.0
+# Consecutive failed jobs after which a backend's circuit opens.
+CIRCUIT_FAILURE_THRESHOLD = 3
+# How long an open circuit keeps jobs away before one trial job is let through.
+CIRCUIT_OPEN_SECONDS = 30.0
+# Weight given to each job's decode rate; older jobs fade out over ~5 completions.
+RATE_EWMA_ALPHA = 0.2
+# Assumed tokens/sec of a backend that has not finished a job yet.
+DEFAULT_TOKENS_PER_SECOND = 30.0
+
+
+class NoBackendAvailableError(Exception):
+    """Every vLLM backend is unhealthy, circuit-broken or was already tried for this job."""
+
+
+@dataclass
+class VllmBackend:
+    base_url: str
+    # Reached over loopback, so it shares this host's filesystem and can read file:// audio.
+    local: bool = False
+    in_flight: int = 0
+    # EWMA of per-job decode rate; None until a job has finished here.
+    tokens_per_second: float | None = None
+    healthy: bool = True
+    consecutive_failures: int = 0
+    # While set, the circuit is open until this time, then half-open for one trial job.
+    circuit_open_until: float | None = None
+    trial_in_flight: bool = False
+
+    def available(self, now: float) -> bool:
+        if not self.healthy:
+            return False
+        if self.circuit_open_until is None:
+            return True
+        return now >= self.circuit_open_until and not self.trial_in_flight
+
+    def load(self, default_rate: float) -> float:
+        """Predicted seconds of decoding per job queued here, counting the next one."""
+        rate = self.tokens_per_second if self.tokens_per_second is not None else default_rate
+        return (self.in_flight + 1) / rate
+
+
+def is_loopback_url(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class BackendPool:
+    """vLLM endpoints that jobs are spread over, least-loaded healthy one first.
+
+    Load is the backend's in-flight job count divided by its recent per-job
+    decode rate, so a faster GPU takes proportionally more of the work.
+    Health comes from a background probe of each backend's /health. After
+    CIRCUIT_FAILURE_THRESHOLD consecutive job failures a backend's circuit
+    opens; once CIRCUIT_OPEN_SECONDS have passed, a single trial job decides
+    whether it closes again or stays open for another period.
+    """
+
+    def __init__(self, base_urls: list[str], http_client: httpx.AsyncClient) -> None:
+        assert base_urls, "Expected at least one vLLM base URL"
+        assert len(set(base_urls)) == len(base_urls), f"Duplicate vLLM base URLs: {base_urls}"
+        self.backends = [VllmBackend(url, local=is_loopback_url(url)) for url in base_urls]
+        self._http_client = http_client
+        self._probe_task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self._probe_task = asyncio.create_task(self._probe_health())
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._probe_task
+
+    def acquire(self, exclude: frozenset[str] = frozenset()) -> VllmBackend:
+        """Reserve the least-loaded available backend not in `exclude`.
+
+        Raises NoBackendAvailableError if there is none. Every acquire()
+        must be paired with release().
+        """
+        now = time.monotonic()
+        candidates = [
+            b for b in self.backends if b.base_url not in exclude and b.available(now)
+        ]
+        if not candidates:
+            raise NoBackendAvailableError(
+                f"No healthy vLLM backend available (tried: {sorted(exclude)})"
+            )
+        default_rate = self._mean_rate()
+        backend = min(candidates, key=lambda b: b.load(default_rate))
+        backend.in_flight += 1
+        if backend.circuit_open_until is not None:
+            backend.trial_in_flight = True
+        return backend
+
+    def release(
+        self, backend: VllmBackend, ok: bool | None, tokens: int = 0, decode_seconds: float = 0.0
+    ) -> None:
+        """Return a backend after a job.
+
+        `ok=False` counts towards opening its circuit and True closes it; None
+        (the job was cancelled) says nothing about the backend.
+        """
+        backend.in_flight -= 1
+        backend.trial_in_flight = False
+        if ok is None:
+            return
+        if not ok:
+            backend.consecutive_failures += 1
+            if (
+                backend.circuit_open_until is not None
+                or backend.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD
+            ):
+                backend.circuit_open_until = time.monotonic() + CIRCUIT_OPEN_SECONDS
+                logger.warning(
+                    "vLLM backend %s circuit open after %d consecutive failures",
+                    backend.base_url,
+                    backend.consecutive_failures,
+                )
+            return
+        if backend.circuit_open_until is not None:
+            logger.info("vLLM backend %s circuit closed", backend.base_url)
+        backend.consecutive_failures = 0
+        backend.circuit_open_until = None
+        if tokens > 0 and decode_seconds > 0:
+            rate = tokens / decode_seconds
+            if backend.tokens_per_second is None:
+                backend.tokens_per_second = rate
+            else:
+                backend.tokens_per_second += RATE_EWMA_ALPHA * (rate - backend.tokens_per_second)
+
+    def _mean_rate(self) -> float:
+        rates = [b.tokens_per_second for b in self.backends if b.tokens_per_second is not None]
+        return sum(rates) / len(rates) if rates else DEFAULT_TOKENS_PER_SECOND
+
+    async def _probe_health(self) -> None:
+        while True:
+            await asyncio.gather(*(self._probe(backend) for backend in self.backends))
+            await asyncio.sleep(HEALTH_PROBE_INTERVAL_SECONDS)
+
+    async def _probe(self, backend: VllmBackend) -> None:
+        try:
+            resp = await self._http_client.get(
+                f"{backend.base_url}/health", timeout=HEALTH_PROBE_TIMEOUT_SECONDS
+            )
+            healthy = resp.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        if healthy != backend.healthy:
+            logger.warning(
+                "vLLM backend %s is now %s", backend.base_url, "healthy" if healthy else "down"
+            )
+        backend.healthy = healthy
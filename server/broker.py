@@ -0,0 +1,403 @@
+"""Share one TranscriptionQueue between several HTTP worker processes.
+
+With `--workers N` the server runs a coordinator process that owns the
+queue and the ASR backend connection, and N uvicorn worker processes that
+accept clients on the shared port. Workers reach the coordinator through
+BrokerQueueService over a Unix socket, so positions, ETAs and per-token
+status come from the one queue, and each job's chunks stream to whichever
+worker holds the client connection.
+
+Every call uses its own connection. A frame is a 4-byte JSON length, a
+4-byte payload length, the JSON message and the raw payload (the audio of
+a submission). A subscription keeps its connection open and receives one
+frame per chunk, then the outcome; closing the connection detaches the
+reader, exactly like a local client going away.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import struct
+import tempfile
+from collections.abc import AsyncGenerator
+from multiprocessing.synchronize import Event
+from typing import TypeVar
+
+import httpx
+import uvicorn
+from pydantic import TypeAdapter
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.chunk_stream import ChunkReplayGapError
+from server.config import Settings
+from server.models import EtaModelResponse, QueueStatusResponse
+from server.queue import QueueFullError
+from server.queue_service import (
+    JobOutcome,
+    JobStreamItem,
+    JobSubmission,
+    JobView,
+    LocalQueueService,
+    create_local_service,
+)
+
+logger = logging.getLogger(__name__)
+
+# Environment variable naming the file worker processes read the settings from. The
+# settings hold secrets, and the environment is inherited by every child, ffmpeg included.
+SETTINGS_FILE_ENV_VAR = "VVV_SERVER_SETTINGS_FILE"
+_FRAME_HEADER = struct.Struct("!II")
+# How long the parent waits for the coordinator to listen before giving up.
+_COORDINATOR_START_TIMEOUT_SECONDS = 30.0
+
+# A frame's JSON message.
+Message = dict[str, object]
+_MESSAGE = TypeAdapter(Message)
+_SUBMISSION = TypeAdapter(JobSubmission)
+_JOB_VIEW = TypeAdapter(JobView)
+_OUTCOME = TypeAdapter(JobOutcome)
+_Field = TypeVar("_Field", str, int, bool)
+
+
+class BrokerError(Exception):
+    """The coordinator failed a request or went away."""
+
+
+async def _write_frame(
+    writer: asyncio.StreamWriter, message: Message, payload: bytes = b""
+) -> None:
+    encoded = json.dumps(message).encode()
+    writer.write(_FRAME_HEADER.pack(len(encoded), len(payload)))
+    writer.write(encoded)
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[Message, bytes] | None:
+    """Read one frame, or return None if the peer closed the connection between frames."""
+    try:
+        header = await reader.readexactly(_FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as exc:
+        if exc.partial:
+            raise BrokerError("Connection closed mid-frame") from None
+        return None
+    message_size, payload_size = _FRAME_HEADER.unpack(header)
+    try:
+        message = _MESSAGE.validate_json(await reader.readexactly(message_size))
+        payload = await reader.readexactly(payload_size) if payload_size else b""
+    except asyncio.IncompleteReadError:
+        raise BrokerError("Connection closed mid-frame") from None
+    return message, payload
+
+
+def _field(message: Message, key: str, kind: type[_Field]) -> _Field:
+    value = message.get(key)
+    assert isinstance(value, kind), (
+        f"Expected {key!r} of type {kind.__name__} in broker message, got: {value!r}"
+    )
+    return value
+
+
+def _number(message: Message, key: str) -> float:
+    value = message.get(key)
+    assert isinstance(value, int | float) and not isinstance(value, bool), (
+        f"Expected {key!r} to be a number in broker message, got: {value!r}"
+    )
+    return float(value)
+
+
+def _raise_for_error(message: Message) -> None:
+    error = message.get("error")
+    if error is None:
+        return
+    if error == "queue_full":
+        raise QueueFullError(
+            _field(message, "reason", str), _number(message, "retry_after_seconds")
+        )
+    if error == "gap":
+        raise ChunkReplayGapError(_field(message, "detail", str))
+    raise BrokerError(_field(message, "detail", str))
+
+
+class BrokerServer:
+    """Serves a LocalQueueService to worker processes over a Unix socket."""
+
+    def __init__(self, service: LocalQueueService, socket_path: str) -> None:
+        self._service = service
+        self._socket_path = socket_path
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self._socket_path)
+        # Any local user who can connect can submit and inspect jobs.
+        os.chmod(self._socket_path, 0o600)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            frame = await _read_frame(reader)
+            if frame is None:
+                return
+            message, payload = frame
+            if message.get("op") == "subscribe":
+                await self._stream(
+                    reader,
+                    writer,
+                    _field(message, "job_id", str),
+                    _field(message, "after_id", int),
+                )
+                return
+            response: Message
+            try:
+                response = {"result": await self._call(message, payload)}
+            except QueueFullError as exc:
+                response = {
+                    "error": "queue_full",
+                    "reason": exc.reason,
+                    "retry_after_seconds": exc.retry_after_seconds,
+                }
+            await _write_frame(writer, response)
+        except (ConnectionError, BrokerError):
+            # The worker went away; its client will resume or the job times out.
+            pass
+        except Exception as exc:
+            logger.exception("Broker request failed")
+            with contextlib.suppress(ConnectionError):
+                await _write_frame(writer, {"error": "internal", "detail": str(exc)})
+        finally:
+            writer.close()
+
+    async def _call(self, message: Message, payload: bytes) -> object:
+        service = self._service
+        op = message.get("op")
+        if op == "submit":
+            submission = _SUBMISSION.validate_python(message.get("submission"))
+            return await service.submit(submission, AudioBuffer.in_memory(payload))
+        if op == "get_job":
+            view = await service.get_job(_field(message, "job_id", str))
+            return None if view is None else dataclasses.asdict(view)
+        if op == "get_position_and_eta":
+            return await service.get_position_and_eta(_field(message, "job_id", str))
+        if op == "cancel_if_unattended":
+            await service.cancel_if_unattended(
+                _field(message, "job_id", str),
+                _number(message, "grace_seconds"),
+                _field(message, "own_reader_attached", bool),
+            )
+            return None
+        if op == "get_queue_info":
+            info = await service.get_queue_info(_field(message, "token_fingerprint", str))
+            return info.model_dump(mode="json")
+        if op == "describe_eta_model":
+            return (await service.describe_eta_model()).model_dump(mode="json")
+        raise ValueError(f"Unknown broker op: {op!r}")
+
+    async def _stream(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        job_id: str,
+        after_id: int,
+    ) -> None:
+        items = self._service.subscribe(job_id, after_id)
+        # The worker sends nothing more; EOF means its client went away.
+        hangup = asyncio.ensure_future(reader.read())
+        try:
+            while True:
+                next_item = asyncio.ensure_future(anext(items))
+                await asyncio.wait({next_item, hangup}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_item.done():
+                    next_item.cancel()
+                    # The generator must be idle before aclose() below.
+                    await asyncio.wait({next_item})
+                    return
+                try:
+                    item = next_item.result()
+                except StopAsyncIteration:
+                    return
+                except ChunkReplayGapError as exc:
+                    await _write_frame(writer, {"error": "gap", "detail": str(exc)})
+                    return
+                if isinstance(item, JobOutcome):
+                    await _write_frame(writer, {"outcome": dataclasses.asdict(item)})
+                else:
+                    # Waits while the worker's socket buffer is full, so a slow
+                    # client still applies backpressure to the job's producer.
+                    await _write_frame(writer, {"id": item[0], "chunk": item[1]})
+        finally:
+            hangup.cancel()
+            await items.aclose()
+
+
+class BrokerQueueService:
+    """QueueService that forwards every call to the coordinator's BrokerServer."""
+
+    def __init__(self, socket_path: str) -> None:
+        self._socket_path = socket_path
+
+    async def _call(self, message: Message, payload: bytes = b"") -> object:
+        reader, writer = await asyncio.open_unix_connection(self._socket_path)
+        try:
+            await _write_frame(writer, message, payload)
+            frame = await _read_frame(reader)
+        finally:
+            writer.close()
+        if frame is None:
+            raise BrokerError(f"Broker closed the connection during {message.get('op')!r}")
+        response, _ = frame
+        _raise_for_error(response)
+        assert "result" in response, f"Broker response without a result: {response!r}"
+        return response["result"]
+
+    async def submit(self, submission: JobSubmission, audio: AudioBuffer) -> str:
+        try:
+            job_id = await self._call(
+                {"op": "submit", "submission": dataclasses.asdict(submission)},
+                await audio.read(),
+            )
+        finally:
+            audio.wipe()
+        assert isinstance(job_id, str), f"Expected a job id from the broker, got: {job_id!r}"
+        return job_id
+
+    async def get_job(self, job_id: str) -> JobView | None:
+        result = await self._call({"op": "get_job", "job_id": job_id})
+        return None if result is None else _JOB_VIEW.validate_python(result)
+
+    async def get_position_and_eta(self, job_id: str) -> tuple[int | None, float | None]:
+        result = await self._call({"op": "get_position_and_eta", "job_id": job_id})
+        assert isinstance(result, list) and len(result) == 2, (
+            f"Expected [position, eta] from the broker, got: {result!r}"
+        )
+        position, eta = result
+        assert position is None or isinstance(position, int), (
+            f"Expected an int or None position, got: {position!r}"
+        )
+        assert eta is None or isinstance(eta, int | float), (
+            f"Expected a number or None ETA, got: {eta!r}"
+        )
+        return position, None if eta is None else float(eta)
+
+    async def subscribe(self, job_id: str, after_id: int) -> AsyncGenerator[JobStreamItem, None]:
+        reader, writer = await asyncio.open_unix_connection(self._socket_path)
+        try:
+            await _write_frame(writer, {"op": "subscribe", "job_id": job_id, "after_id": after_id})
+            while True:
+                frame = await _read_frame(reader)
+                if frame is None:
+                    raise BrokerError(f"Broker closed the event stream of job {job_id[:8]}")
+                message, _ = frame
+                _raise_for_error(message)
+                outcome = message.get("outcome")
+                if outcome is not None:
+                    yield _OUTCOME.validate_python(outcome)
+                    return
+                yield _field(message, "id", int), _field(message, "chunk", str)
+        finally:
+            writer.close()
+
+    async def cancel_if_unattended(
+        self, job_id: str, grace_seconds: float, own_reader_attached: bool = False
+    ) -> None:
+        await self._call(
+            {
+                "op": "cancel_if_unattended",
+                "job_id": job_id,
+                "grace_seconds": grace_seconds,
+                "own_reader_attached": own_reader_attached,
+            }
+        )
+
+    async def get_queue_info(self, token_fingerprint: str) -> QueueStatusResponse:
+        result = await self._call({"op": "get_queue_info", "token_fingerprint": token_fingerprint})
+        return QueueStatusResponse.model_validate(result)
+
+    async def describe_eta_model(self) -> EtaModelResponse:
+        return EtaModelResponse.model_validate(await self._call({"op": "describe_eta_model"}))
+
+
+async def _serve_coordinator(settings: Settings, ready: Event) -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    loop.add_signal_handler(signal.SIGINT, stopping.set)
+    async with httpx.AsyncClient() as http_client:
+        ffmpeg = FfmpegPool(settings.max_media_processes, settings.media_process_timeout_seconds)
+        service = create_local_service(settings, http_client, ffmpeg)
+        service.start()
+        server = BrokerServer(service, settings.broker_socket_path)
+        await server.start()
+        ready.set()
+        try:
+            await stopping.wait()
+        finally:
+            await server.close()
+            await service.stop()
+
+
+def _run_coordinator(settings: Settings, ready: Event) -> None:
+    asyncio.run(_serve_coordinator(settings, ready))
+
+
+def serve_with_workers(settings: Settings) -> None:
+    """Run the coordinator process and `settings.server_workers` uvicorn workers; blocks."""
+    assert settings.server_workers > 1, (
+        f"Expected server_workers > 1, got: {settings.server_workers}"
+    )
+    socket_dir = None
+    if not settings.broker_socket_path:
+        # A directory only this user can enter keeps other local users off the socket.
+        socket_dir = tempfile.mkdtemp(prefix="vvv-broker-")
+        settings = settings.model_copy(
+            update={"broker_socket_path": os.path.join(socket_dir, "broker.sock")}
+        )
+    settings_file = None
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    coordinator = context.Process(
+        target=_run_coordinator, args=(settings, ready), name="vvv-broker"
+    )
+    coordinator.start()
+    try:
+        if not ready.wait(_COORDINATOR_START_TIMEOUT_SECONDS):
+            raise RuntimeError("Queue coordinator process did not start")
+        settings_fd, settings_file = tempfile.mkstemp(prefix="vvv-settings-", suffix=".json")
+        # mkstemp creates it 0600; workers, respawned ones included, read it at startup.
+        with os.fdopen(settings_fd, "w") as file:
+            file.write(settings.model_dump_json())
+        os.environ[SETTINGS_FILE_ENV_VAR] = settings_file
+        uvicorn.run(
+            "server.app:create_app_from_env",
+            factory=True,
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=settings.server_workers,
+            log_level="warning",
+            access_log=False,
+        )
+    finally:
+        if settings_file is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(settings_file)
+        coordinator.terminate()
+        coordinator.join()
+        if socket_dir is not None:
+            with contextlib.suppress(OSError):
+                os.rmdir(socket_dir)
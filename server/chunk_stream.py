@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+from collections import deque
+from collections.abc import AsyncGenerator
+
+
+class ChunkReplayGapError(Exception):
+    """The requested resume point has already been evicted from the replay log."""
+
+
+class ChunkStream:
+    """Append-only log of one job's output chunks, numbered for SSE `id:` fields.
+
+    The producer put()s chunks and finally None, which closes the stream.
+    Chunk ids start at 1 and increase by one. Readers iterate from any id
+    with subscribe(after_id), so a client that lost its connection resumes
+    where it left off. The last `replay_size` entries are retained.
+
+    put() blocks while any attached reader is `max_lag` chunks behind, so a
+    slow reader applies backpressure. With no reader attached (client gone,
+    maybe reconnecting) the producer runs freely and old chunks roll off.
+    """
+
+    def __init__(self, max_lag: int, replay_size: int) -> None:
+        assert max_lag >= 1, f"Expected max_lag >= 1, got: {max_lag}"
+        assert replay_size > max_lag, (
+            f"Expected replay_size > max_lag, got: replay_size={replay_size}, max_lag={max_lag}"
+        )
+        self._max_lag = max_lag
+        self._log: deque[tuple[int, str]] = deque(maxlen=replay_size)
+        self._last_id = 0
+        self._closed = False
+        # reader handle -> id of the last chunk that reader consumed
+        self._cursors: dict[int, int] = {}
+        self._reader_handles = itertools.count()
+        self._subscriptions_opened = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def first_retained_id(self) -> int:
+        """Id of the oldest chunk still in the replay log (last_id + 1 if empty)."""
+        return self._log[0][0] if self._log else self._last_id + 1
+
+    @property
+    def reader_count(self) -> int:
+        return len(self._cursors)
+
+    @property
+    def subscriptions_opened(self) -> int:
+        """Readers ever attached, so callers can tell whether anyone reattached."""
+        return self._subscriptions_opened
+
+    def retained_chunks(self) -> list[str]:
+        """Chunks still in the replay log, oldest first."""
+        return [chunk for _, chunk in self._log]
+
+    async def put(self, chunk: str | None) -> None:
+        """Append a chunk, or close the stream with None."""
+        while chunk is not None and self._reader_is_lagging():
+            await self._wait_for_change()
+        self._append(chunk)
+        # Yield even when nobody applies backpressure, so a producer in a tight
+        # loop cannot starve readers, cancellation and the rest of the server.
+        await asyncio.sleep(0)
+
+    def close(self) -> None:
+        """Close the stream without waiting for readers (cancellation, shutdown)."""
+        if not self._closed:
+            self._append(None)
+
+    async def wait_closed(self) -> None:
+        """Wait until the stream is closed, without attaching as a reader."""
+        while not self._closed:
+            await self._wait_for_change()
+
+    async def subscribe(self, after_id: int) -> AsyncGenerator[tuple[int, str], None]:
+        """Yield (id, chunk) for every chunk after `after_id` until the stream closes.
+
+        The reader is attached from the first iteration until the iterator is
+        exhausted or aclose()d. Raises ChunkReplayGapError if chunks after
+        `after_id` were already evicted.
+        """
+        assert 0 <= after_id <= self._last_id, (
+            f"Expected after_id in [0, {self._last_id}], got: {after_id}"
+        )
+        handle = next(self._reader_handles)
+        self._cursors[handle] = after_id
+        self._subscriptions_opened += 1
+        try:
+            while True:
+                cursor = self._cursors[handle]
+                if cursor == self._last_id:
+                    if self._closed:
+                        return
+                    await self._wait_for_change()
+                    continue
+                oldest_id = self.first_retained_id
+                if cursor + 1 < oldest_id:
+                    raise ChunkReplayGapError(
+                        f"Chunks {cursor + 1}..{oldest_id - 1} are no longer retained"
+                    )
+                chunk_id, chunk = self._log[cursor + 1 - oldest_id]
+                yield chunk_id, chunk
+                self._cursors[handle] = chunk_id
+                self._notify()
+        finally:
+            del self._cursors[handle]
+            self._notify()
+
+    def _reader_is_lagging(self) -> bool:
+        return bool(self._cursors) and (
+            min(self._cursors.values()) <= self._last_id - self._max_lag
+        )
+
+    def _append(self, chunk: str | None) -> None:
+        assert not self._closed, f"Chunk stream already closed at id {self._last_id}"
+        if chunk is None:
+            self._closed = True
+        else:
+            self._last_id += 1
+            self._log.append((self._last_id, chunk))
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait_for_change(self) -> None:
+        await self._changed.wait()
@@ -7,16 +7,39 @@ class Settings(BaseModel):
     asr_backend: Literal["vibevoice", "groq"]
     server_host: str
     server_port: int
+    server_workers: int
+    broker_socket_path: str
     max_audio_bytes: int
+    audio_spool_dir: str
     max_queue_size: int
+    max_queued_audio_seconds: float
+    max_queued_audio_bytes: int
+    max_concurrent_jobs: int
+    max_media_processes: int
+    media_process_timeout_seconds: float
+    trim_silence: bool
+    subject_weights: dict[str, float]
+    priority_lane_seconds: float
+    eta_model_file: str
+    job_retention_seconds: float
+    result_cache_bytes: int
+    result_cache_ttl_seconds: float
+    stream_resume_grace_seconds: float
     jwt_public_key_file: str
     revoked_tokens_file: str
     require_https: bool
     # vLLM / VibeVoice settings (used when asr_backend == "vibevoice")
-    vllm_base_url: str
+    vllm_base_urls: list[str]
     vllm_model_name: str
     vllm_temperature: float
     vllm_top_p: float
+    vllm_stall_timeout_seconds: float
+    vllm_max_model_len: int
+    vllm_kv_token_budget: int
+    vllm_priority_scheduling: bool
+    vllm_media_dir: str
+    vllm_window_seconds: float
+    normalize_audio: bool
     # Groq Whisper settings (used when asr_backend == "groq")
     groq_api_key: str
     groq_model_name: str
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from server.models import EtaFitInfo
+
+logger = logging.getLogger(__name__)
+
+# Cold-start guess per job, used until a backend has a fitted sample.
+DEFAULT_JOB_SECONDS = 30.0
+# Weight given to each new observation; older jobs fade out over ~20 completions.
+EWMA_ALPHA = 0.05
+
+_STATE_VERSION = 1
+
+
+@dataclass
+class _LinearFit:
+    """Exponentially weighted least-squares fit of wall seconds vs audio seconds."""
+
+    weight: float = 0.0
+    sum_x: float = 0.0
+    sum_y: float = 0.0
+    sum_xx: float = 0.0
+    sum_xy: float = 0.0
+    abs_error: float = 0.0
+    samples: int = 0
+
+    def coefficients(self) -> tuple[float, float]:
+        """Return (overhead_seconds, seconds_per_audio_second)."""
+        if self.samples == 0:
+            return DEFAULT_JOB_SECONDS, 0.0
+        mean_x = self.sum_x / self.weight
+        mean_y = self.sum_y / self.weight
+        var_x = self.sum_xx / self.weight - mean_x * mean_x
+        # All observed clips about the same length: the slope is not identifiable.
+        if var_x <= 1e-3 * (mean_x * mean_x + 1.0):
+            return mean_y, 0.0
+        rate = (self.sum_xy / self.weight - mean_x * mean_y) / var_x
+        overhead = mean_y - rate * mean_x
+        if rate < 0.0:
+            return mean_y, 0.0
+        if overhead < 0.0:
+            return 0.0, self.sum_xy / self.sum_xx
+        return overhead, rate
+
+    def predict(self, audio_seconds: float) -> float:
+        overhead, rate = self.coefficients()
+        return overhead + rate * audio_seconds
+
+    def observe(self, audio_seconds: float, elapsed_seconds: float) -> None:
+        error = abs(self.predict(audio_seconds) - elapsed_seconds)
+        decay = 1.0 - EWMA_ALPHA
+        self.weight = self.weight * decay + 1.0
+        self.sum_x = self.sum_x * decay + audio_seconds
+        self.sum_y = self.sum_y * decay + elapsed_seconds
+        self.sum_xx = self.sum_xx * decay + audio_seconds * audio_seconds
+        self.sum_xy = self.sum_xy * decay + audio_seconds * elapsed_seconds
+        if self.samples == 0:
+            self.abs_error = error
+        else:
+            self.abs_error = self.abs_error * decay + error * EWMA_ALPHA
+        self.samples += 1
+
+
+class EtaModel:
+    """Online per-backend estimate of job wall time: overhead + rate * audio seconds.
+
+    When `state_file` is set, the fits are loaded from it at startup and
+    rewritten after every observation, so ETAs survive restarts. A failed
+    write is logged and does not stop the model from learning.
+    """
+
+    def __init__(self, state_file: str | None = None) -> None:
+        self._fits: dict[str, _LinearFit] = {}
+        self._state_file = Path(state_file) if state_file else None
+        if self._state_file is not None and self._state_file.exists():
+            self._load(self._state_file)
+
+    def predict(self, backend: str, audio_seconds: float) -> float:
+        return self._fit(backend).predict(audio_seconds)
+
+    def predict_total(self, backend: str, job_count: int, audio_seconds: float) -> float:
+        """Predicted wall time of `job_count` jobs totalling `audio_seconds` of audio."""
+        overhead, rate = self._fit(backend).coefficients()
+        return job_count * overhead + rate * audio_seconds
+
+    def observe(self, backend: str, audio_seconds: float, elapsed_seconds: float) -> None:
+        assert audio_seconds >= 0 and elapsed_seconds >= 0, (
+            f"Expected non-negative observation, got: audio_seconds={audio_seconds}, "
+            f"elapsed_seconds={elapsed_seconds}"
+        )
+        self._fits.setdefault(backend, _LinearFit()).observe(audio_seconds, elapsed_seconds)
+        if self._state_file is not None:
+            try:
+                self._save(self._state_file)
+            except OSError as exc:
+                # The in-memory fit is still current; only persistence is lost.
+                logger.warning("Could not save ETA model to %s: %s", self._state_file, exc)
+
+    def describe(self) -> dict[str, EtaFitInfo]:
+        result: dict[str, EtaFitInfo] = {}
+        for backend, fit in self._fits.items():
+            overhead, rate = fit.coefficients()
+            result[backend] = EtaFitInfo(
+                overhead_seconds=overhead,
+                seconds_per_audio_second=rate,
+                samples=fit.samples,
+                mean_absolute_error_seconds=fit.abs_error,
+            )
+        return result
+
+    def _fit(self, backend: str) -> _LinearFit:
+        return self._fits.get(backend) or _LinearFit()
+
+    def _load(self, path: Path) -> None:
+        try:
+            state = json.loads(path.read_text())
+        except json.JSONDecodeError as exc:
+            raise RuntimeError(f"ETA model state file {path} is not valid JSON: {exc}") from None
+        if not isinstance(state, dict) or state.get("version") != _STATE_VERSION:
+            raise RuntimeError(
+                f"ETA model state file {path} has unexpected format, "
+                f"expected version {_STATE_VERSION}: {str(state)[:200]!r}"
+            )
+        backends = state.get("backends")
+        if not isinstance(backends, dict):
+            raise RuntimeError(
+                f"ETA model state file {path} 'backends' is {type(backends).__name__}, "
+                "expected object"
+            )
+        for name, fields in backends.items():
+            try:
+                self._fits[name] = _LinearFit(**fields)
+            except TypeError as exc:
+                raise RuntimeError(
+                    f"ETA model state file {path} has invalid fit for {name!r}: {exc}"
+                ) from None
+
+    def _save(self, path: Path) -> None:
+        state = {
+            "version": _STATE_VERSION,
+            "backends": {name: asdict(fit) for name, fit in self._fits.items()},
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, path)
@@ -1,8 +1,7 @@
-import base64
-
 import httpx
 
-from server.audio import compress_to_opus
+from server.audio import FfmpegPool, compress_to_opus
+from server.audio_buffer import AudioBuffer
 
 
 async def transcribe_audio(
@@ -10,9 +9,10 @@ async def transcribe_audio(
     http_client: httpx.AsyncClient,
     api_key: str,
     model_name: str,
-    audio_base64: str,
+    audio: AudioBuffer,
     audio_mime: str,
     hotwords: str | None,
+    ffmpeg: FfmpegPool,
 ) -> str:
     """Transcribe audio using Groq's Whisper API (OpenAI-compatible endpoint).
 
@@ -20,8 +20,7 @@ async def transcribe_audio(
     Groq's 25 MB file size limit and reduce upload latency.
     Groq handles the 30-second Whisper windowing internally for longer audio.
     """
-    raw_bytes = base64.b64decode(audio_base64)
-    opus_bytes = await compress_to_opus(raw_bytes)
+    opus_bytes = await compress_to_opus(audio, ffmpeg)
 
     files = {"file": ("audio.ogg", opus_bytes, "audio/ogg")}
     data: dict[str, str] = {
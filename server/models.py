@@ -9,6 +9,15 @@ class JobStatus(StrEnum):
     STREAMING = "streaming"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobPriority(StrEnum):
+    """Scheduling class of a job; interactive jobs are dispatched ahead of batch work."""
+
+    INTERACTIVE = "interactive"
+    NORMAL = "normal"
+    BATCH = "batch"
 
 
 class QueuePositionEvent(BaseModel):
@@ -21,17 +30,82 @@ class TranscriptionChunkEvent(BaseModel):
     text: str
 
 
+class SegmentEvent(BaseModel):
+    """A segment of the transcript, sent once the data events have completed it."""
+
+    start: float | None
+    end: float | None
+    speaker: int | str | None
+    content: str
+
+
 class ErrorEvent(BaseModel):
     error: str
 
 
+class BatchFile(BaseModel):
+    file: int
+    name: str
+    job_id: str
+
+
+class BatchStartEvent(BaseModel):
+    files: list[BatchFile]
+
+
+class BatchQueuePositionEvent(QueuePositionEvent):
+    file: int
+
+
+class BatchChunkEvent(TranscriptionChunkEvent):
+    file: int
+    # Position in the file's own job stream, for resuming it via /v1/jobs/{job_id}/events
+    chunk_id: int
+
+
+class BatchSegmentEvent(SegmentEvent):
+    file: int
+    chunk_id: int
+
+
+class BatchFileDoneEvent(BaseModel):
+    file: int
+    job_id: str
+
+
+class BatchFileErrorEvent(ErrorEvent):
+    file: int
+    job_id: str
+
+
+class BatchProgressEvent(BaseModel):
+    completed: int
+    failed: int
+    total: int
+
+
 class JobInfo(BaseModel):
     job_id: str
     status: JobStatus
     position: int | None = None
     estimated_wait_seconds: float | None = None
+    audio_bytes_saved: int | None = None
+    # Fraction of the audio's duration cut as silence before transcription
+    trimmed_seconds_ratio: float | None = None
 
 
 class QueueStatusResponse(BaseModel):
     your_jobs: list[JobInfo]
     total_queued: int
+
+
+class EtaFitInfo(BaseModel):
+    overhead_seconds: float
+    seconds_per_audio_second: float
+    samples: int
+    mean_absolute_error_seconds: float
+
+
+class EtaModelResponse(BaseModel):
+    asr_backend: str
+    backends: dict[str, EtaFitInfo]
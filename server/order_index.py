@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import math
+import random
+from collections.abc import Iterator
+from typing import Generic, Protocol, Self, TypeVar
+
+
+class _Comparable(Protocol):
+    def __lt__(self, other: Self, /) -> bool: ...
+
+
+K = TypeVar("K", bound=_Comparable)
+V = TypeVar("V")
+
+# 2**24 entries before the top level saturates; far beyond any queue size.
+_MAX_LEVELS = 24
+
+
+class _Node(Generic[K, V]):
+    __slots__ = ("key", "next", "span", "value", "weight", "width")
+
+    def __init__(self, key: K | None, value: V | None, weight: float, levels: int) -> None:
+        self.key = key
+        self.value = value
+        self.weight = weight
+        self.next: list[_Node[K, V] | None] = [None] * levels
+        # width[i]: number of bottom-level steps that link i skips over
+        self.width: list[int] = [1] * levels
+        # span[i]: total weight of the entries link i skips over, target included
+        self.span: list[float] = [0.0] * levels
+
+
+class OrderIndex(Generic[K, V]):
+    """Sorted map from unique keys to values with O(log n) rank lookups.
+
+    An indexable skip list: each forward link records how many entries it
+    skips, so the rank of a key is the sum of widths along its search path.
+    Links also carry the summed weight of the entries they skip, giving
+    prefix sums of per-entry weights along the same path.
+    Insert, remove, rank, prefix and first are all expected O(log n).
+    """
+
+    def __init__(self) -> None:
+        self._head: _Node[K, V] = _Node(None, None, 0.0, _MAX_LEVELS)
+        self._size = 0
+        self._total_weight = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def total_weight(self) -> float:
+        return self._total_weight
+
+    def __iter__(self) -> Iterator[tuple[K, V]]:
+        node = self._head.next[0]
+        while node is not None:
+            yield self._entry(node)
+            node = node.next[0]
+
+    def first(self) -> tuple[K, V] | None:
+        node = self._head.next[0]
+        return None if node is None else self._entry(node)
+
+    def insert(self, key: K, value: V, weight: float = 0.0) -> None:
+        chain, steps_at_level, weight_at_level = self._search(key)
+        successor = chain[0].next[0]
+        assert successor is None or self._key(successor) != key, (
+            f"Duplicate key in OrderIndex: {key!r}"
+        )
+        steps = steps_at_level[0]
+        weight_before = weight_at_level[0]
+
+        levels = min(_MAX_LEVELS, 1 - int(math.log2(1.0 - random.random())))
+        node: _Node[K, V] = _Node(key, value, weight, levels)
+        for level in range(levels):
+            prev = chain[level]
+            skipped = steps - steps_at_level[level]
+            skipped_weight = weight_before - weight_at_level[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - skipped
+            prev.width[level] = skipped + 1
+            node.span[level] = prev.span[level] - skipped_weight
+            prev.span[level] = skipped_weight + weight
+        for level in range(levels, _MAX_LEVELS):
+            chain[level].width[level] += 1
+            chain[level].span[level] += weight
+        self._size += 1
+        self._total_weight += weight
+
+    def remove(self, key: K) -> V:
+        chain, _, _ = self._search(key)
+        node = chain[0].next[0]
+        if node is None or self._key(node) != key:
+            raise KeyError(key)
+
+        levels = len(node.next)
+        for level in range(levels):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.span[level] += node.span[level] - node.weight
+            prev.next[level] = node.next[level]
+        for level in range(levels, _MAX_LEVELS):
+            chain[level].width[level] -= 1
+            chain[level].span[level] -= node.weight
+        self._size -= 1
+        self._total_weight -= node.weight
+        if self._size == 0:
+            # Drop accumulated float error whenever the index drains.
+            self._total_weight = 0.0
+            self._head.span = [0.0] * _MAX_LEVELS
+        assert node.value is not None, f"OrderIndex node for {key!r} has no value"
+        return node.value
+
+    def rank(self, key: K) -> int:
+        """Return the 0-based rank of an existing key. Raises KeyError if absent."""
+        return self.prefix(key)[0]
+
+    def prefix(self, key: K) -> tuple[int, float]:
+        """Return (count, total weight) of the entries before an existing key."""
+        chain, steps_at_level, weight_at_level = self._search(key)
+        node = chain[0].next[0]
+        if node is None or self._key(node) != key:
+            raise KeyError(key)
+        return steps_at_level[0], weight_at_level[0]
+
+    def _search(self, key: K) -> tuple[list[_Node[K, V]], list[int], list[float]]:
+        """Find the last node before `key` per level, with its position and cumulative weight."""
+        chain: list[_Node[K, V]] = [self._head] * _MAX_LEVELS
+        steps_at_level = [0] * _MAX_LEVELS
+        weight_at_level = [0.0] * _MAX_LEVELS
+        node = self._head
+        steps = 0
+        weight = 0.0
+        for level in reversed(range(_MAX_LEVELS)):
+            next_node = node.next[level]
+            while next_node is not None and self._key(next_node) < key:
+                steps += node.width[level]
+                weight += node.span[level]
+                node = next_node
+                next_node = node.next[level]
+            chain[level] = node
+            steps_at_level[level] = steps
+            weight_at_level[level] = weight
+        return chain, steps_at_level, weight_at_level
+
+    @staticmethod
+    def _key(node: _Node[K, V]) -> K:
+        assert node.key is not None, "Head sentinel reached where an entry was expected"
+        return node.key
+
+    @staticmethod
+    def _entry(node: _Node[K, V]) -> tuple[K, V]:
+        assert node.key is not None and node.value is not None, (
+            f"Incomplete OrderIndex entry: key={node.key!r}, value={node.value!r}"
+        )
+        return node.key, node.value
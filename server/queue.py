@@ -2,148 +2,586 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import itertools
 import logging
+import math
 import time
 import uuid
-from collections import OrderedDict
-from collections.abc import Callable, Coroutine
+from collections import OrderedDict, deque
+from collections.abc import Callable, Coroutine, Mapping
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Any
 
-from server.models import JobInfo, JobStatus, QueueStatusResponse
+from server.audio_buffer import AudioBuffer
+from server.chunk_stream import ChunkStream
+from server.eta import EtaModel
+from server.models import (
+    EtaModelResponse,
+    JobInfo,
+    JobPriority,
+    JobStatus,
+    QueueStatusResponse,
+)
+from server.order_index import OrderIndex
 
 logger = logging.getLogger(__name__)
 
+# VibeVoice compresses 24 kHz audio by 3200x into 7.5 tokens per second.
+AUDIO_TOKENS_PER_SECOND = 7.5
+# Observed output rate: ~16K JSON tokens for 60 minutes of speech (see README).
+OUTPUT_TOKENS_PER_SECOND = 4.5
+# System prompt, chat template and the duration/hotwords text prompt.
+PROMPT_OVERHEAD_TOKENS = 256
+# Chunks a connected SSE reader may fall behind before the producer blocks.
+CHUNK_STREAM_MAX_LAG = 256
+# Chunks kept per job for clients resuming with Last-Event-ID.
+CHUNK_REPLAY_SIZE = 8192
+# Fair-share charge floor, so zero-length clips still advance their owner's clock.
+MIN_FAIR_SHARE_COST_SECONDS = 1.0
+# Finished jobs are evicted in passes at most this far apart (and this late).
+EXPIRY_BATCH_SECONDS = 1.0
+# Lane of each priority class; a lane is worth `priority_lane_seconds` of virtual time.
+PRIORITY_LANES = {JobPriority.INTERACTIVE: 1, JobPriority.NORMAL: 0, JobPriority.BATCH: -1}
+
+
+def estimate_kv_tokens(audio_duration_seconds: float) -> int:
+    """Estimate the peak KV-cache tokens a job occupies: prompt + audio + expected output."""
+    assert audio_duration_seconds >= 0, (
+        f"Expected non-negative audio duration, got: {audio_duration_seconds}"
+    )
+    per_second = AUDIO_TOKENS_PER_SECOND + OUTPUT_TOKENS_PER_SECOND
+    return PROMPT_OVERHEAD_TOKENS + math.ceil(audio_duration_seconds * per_second)
+
 
 @dataclass
 class TranscriptionJob:
     job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
     token_fingerprint: str = ""
-    audio_base64: str = ""
+    audio: AudioBuffer = field(default_factory=lambda: AudioBuffer.in_memory(b""))
     audio_mime: str = "application/octet-stream"
     hotwords: str | None = None
     audio_duration_seconds: float = 0.0
+    priority: JobPriority = JobPriority.NORMAL
     status: JobStatus = JobStatus.QUEUED
-    chunk_queue: asyncio.Queue[str | None] = field(default_factory=asyncio.Queue)
+    chunk_stream: ChunkStream = field(
+        default_factory=lambda: ChunkStream(
+            max_lag=CHUNK_STREAM_MAX_LAG, replay_size=CHUNK_REPLAY_SIZE
+        )
+    )
     error_message: str | None = None
     created_at: float = field(default_factory=time.monotonic)
+    # Hash of the audio and everything else that determines the transcript
+    content_key: str | None = None
+    # Other token subjects whose identical submissions were attached to this job
+    coalesced_subjects: list[str] = field(default_factory=list)
+    # How much smaller normalization made the audio sent to the backend, if it ran
+    audio_bytes_saved: int | None = None
+    # Seconds of silence cut from the audio before it was transcribed, if trimming ran
+    trimmed_seconds: float | None = None
+
+
+class QueueFullError(asyncio.QueueFull):
+    """A job was refused admission; `retry_after_seconds` estimates when it would fit."""
+
+    def __init__(self, reason: str, retry_after_seconds: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+@dataclass
+class _InFlightJob:
+    kv_tokens: int
+    started_at: float = field(default_factory=time.monotonic)
 
 
 class TranscriptionQueue:
-    def __init__(self, max_size: int) -> None:
-        self._pending: asyncio.Queue[str] = asyncio.Queue(maxsize=max_size)
+    """Weighted-fair job queue dispatched to a pool of concurrent workers.
+
+    Dispatch order is self-clocked fair queuing keyed on token_fingerprint:
+    each job is stamped at enqueue with a virtual finish time,
+    max(virtual clock, owner's previous finish) + audio seconds / owner weight,
+    and jobs start in finish-time order. A heavy user's backlog therefore
+    interleaves with everyone else instead of blocking them. Stamps never
+    change once assigned, so queue positions are the real dispatch order.
+
+    Priority classes shift the dispatch key by `priority_lane_seconds` of
+    virtual time per lane: an interactive clip sorts as if it had been
+    stamped that much earlier, a batch job that much later. Aging is
+    implicit. The virtual clock advances with every dispatch, so a batch
+    job falls behind newer work by at most two lanes and is never starved.
+
+    A job is admitted once fewer than `max_concurrent_jobs` are in flight and
+    its estimated KV-cache footprint fits in what is left of `kv_token_budget`
+    (None disables the budget). A job that exceeds the whole budget on its own
+    still runs, alone.
+
+    ETAs come from `eta_model`, fitted on completed jobs of `asr_backend`: the
+    predicted wall time of every job ahead, plus what is left of the jobs in
+    flight, spread over the worker pool.
+
+    Admission is capped by the number of queued jobs (`max_size`) and,
+    optionally, by their total audio seconds and audio bytes. A job that is
+    over a cap on its own is still admitted into an empty queue. Rejections
+    carry the predicted time until enough of the queue has been dispatched
+    for the job to fit.
+
+    Finished and cancelled jobs stay visible for `job_retention_seconds`, so
+    a client whose connection dropped can replay the job's chunk stream.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_concurrent_jobs: int = 1,
+        kv_token_budget: int | None = None,
+        subject_weights: Mapping[str, float] | None = None,
+        eta_model: EtaModel | None = None,
+        asr_backend: str = "vibevoice",
+        job_retention_seconds: float = 30.0,
+        priority_lane_seconds: float = 600.0,
+        max_queued_audio_seconds: float | None = None,
+        max_queued_audio_bytes: int | None = None,
+    ) -> None:
+        assert max_concurrent_jobs >= 1, (
+            f"Expected max_concurrent_jobs >= 1, got: {max_concurrent_jobs}"
+        )
+        assert kv_token_budget is None or kv_token_budget > 0, (
+            f"Expected positive kv_token_budget or None, got: {kv_token_budget}"
+        )
+        weights = dict(subject_weights or {})
+        assert all(w > 0 for w in weights.values()), (
+            f"Expected positive subject weights, got: {weights!r}"
+        )
+        assert job_retention_seconds >= 0, (
+            f"Expected non-negative job_retention_seconds, got: {job_retention_seconds}"
+        )
+        assert priority_lane_seconds >= 0, (
+            f"Expected non-negative priority_lane_seconds, got: {priority_lane_seconds}"
+        )
+        assert max_queued_audio_seconds is None or max_queued_audio_seconds > 0, (
+            f"Expected positive max_queued_audio_seconds or None, got: {max_queued_audio_seconds}"
+        )
+        assert max_queued_audio_bytes is None or max_queued_audio_bytes > 0, (
+            f"Expected positive max_queued_audio_bytes or None, got: {max_queued_audio_bytes}"
+        )
+        self._max_size = max_size
+        self._max_queued_audio_seconds = max_queued_audio_seconds
+        self._max_queued_audio_bytes = max_queued_audio_bytes
+        # Total audio size of queued (not yet dispatched) jobs
+        self._queued_audio_bytes = 0
+        self._priority_lane_seconds = priority_lane_seconds
+        self._job_retention_seconds = job_retention_seconds
         self._jobs: OrderedDict[str, TranscriptionJob] = OrderedDict()
-        self._processing_times: list[float] = []
-        self._max_history: int = 20
+        # Dispatch order of queued jobs:
+        # (virtual finish time shifted by priority lane, enqueue sequence) -> job_id
+        self._order: OrderIndex[tuple[float, int], str] = OrderIndex()
+        self._order_keys: dict[str, tuple[float, int]] = {}
+        # job_id -> unshifted virtual finish time, for every queued job
+        self._finish_times: dict[str, float] = {}
+        self._enqueue_seq = itertools.count()
+        self._subject_weights = weights
+        # Latest finish time among dispatched jobs
+        self._virtual_time = 0.0
+        # token_fingerprint -> finish time of that owner's last queued job
+        self._flow_finish: dict[str, float] = {}
+        # token_fingerprint -> job_ids (insertion-ordered) of every job in self._jobs
+        self._jobs_by_token: dict[str, dict[str, None]] = {}
+        self._eta_model = eta_model if eta_model is not None else EtaModel()
+        self._asr_backend = asr_backend
+        self._max_concurrent_jobs = max_concurrent_jobs
+        self._kv_token_budget = kv_token_budget
+        # job_id -> reserved KV tokens and start time, for every job currently dispatched
+        self._in_flight: dict[str, _InFlightJob] = {}
+        self._wakeup = asyncio.Event()
         self._worker_task: asyncio.Task[None] | None = None
+        self._job_tasks: dict[str, asyncio.Task[None]] = {}
         self._process_fn: Callable[[TranscriptionJob], Coroutine[Any, Any, None]] | None = None
-        self._cleanup_tasks: set[asyncio.Task[None]] = set()
+        self._finish_fn: Callable[[TranscriptionJob], None] | None = None
+        # (deadline, job_id) of finished jobs awaiting eviction. The retention is
+        # fixed, so deadlines arrive in order and a FIFO serves as the timer heap.
+        self._expiry: deque[tuple[float, str]] = deque()
+        self._expiry_slack = min(EXPIRY_BATCH_SECONDS, job_retention_seconds)
+        self._expiry_wakeup = asyncio.Event()
+        self._expiry_task: asyncio.Task[None] | None = None
+        self._abandon_tasks: set[asyncio.Task[None]] = set()
 
     def set_process_fn(
         self, fn: Callable[[TranscriptionJob], Coroutine[Any, Any, None]]
     ) -> None:
         self._process_fn = fn
 
+    def set_finish_fn(self, fn: Callable[[TranscriptionJob], None]) -> None:
+        """Call `fn` once with every job that ends, whether completed, failed or cancelled."""
+        self._finish_fn = fn
+
     def start_worker(self) -> None:
-        self._worker_task = asyncio.create_task(self._worker())
+        self._worker_task = asyncio.create_task(self._dispatcher())
 
     async def stop(self) -> None:
+        tasks = [*self._job_tasks.values(), *self._abandon_tasks]
         if self._worker_task:
-            self._worker_task.cancel()
+            tasks.append(self._worker_task)
+        if self._expiry_task:
+            tasks.append(self._expiry_task)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
             with contextlib.suppress(asyncio.CancelledError):
-                await self._worker_task
+                await task
 
     def enqueue(self, job: TranscriptionJob) -> None:
-        """Add a job to the queue. Raises asyncio.QueueFull if at capacity."""
-        try:
-            self._pending.put_nowait(job.job_id)
-        except asyncio.QueueFull:
-            raise
+        """Add a job to the queue. Raises QueueFullError if it does not fit."""
+        reason = self._admission_refusal(job, 0, 0.0, 0)
+        if reason is not None:
+            raise QueueFullError(reason, self._estimate_retry_after(job))
+        finish = self._stamp_finish_time(job)
+        head_start = PRIORITY_LANES[job.priority] * self._priority_lane_seconds
+        key = (finish - head_start, next(self._enqueue_seq))
+        self._order.insert(key, job.job_id, weight=job.audio_duration_seconds)
+        self._order_keys[job.job_id] = key
+        self._finish_times[job.job_id] = finish
+        self._queued_audio_bytes += job.audio.size
+        self._jobs[job.job_id] = job
+        self._jobs_by_token.setdefault(job.token_fingerprint, {})[job.job_id] = None
+        self._wakeup.set()
+
+    def _admission_refusal(
+        self,
+        job: TranscriptionJob,
+        jobs_leaving: int,
+        audio_seconds_leaving: float,
+        audio_bytes_leaving: int,
+    ) -> str | None:
+        """Why `job` would be refused once the given queued work has left, or None if it fits."""
+        jobs = len(self._order) - jobs_leaving
+        if jobs == 0:
+            return None
+        if jobs >= self._max_size:
+            return f"{jobs} jobs queued"
+        audio_seconds = self._order.total_weight - audio_seconds_leaving
+        limit_seconds = self._max_queued_audio_seconds
+        if limit_seconds is not None and audio_seconds + job.audio_duration_seconds > limit_seconds:
+            return f"{audio_seconds:.0f} s of audio queued, limit {limit_seconds:.0f} s"
+        audio_bytes = self._queued_audio_bytes - audio_bytes_leaving
+        limit_bytes = self._max_queued_audio_bytes
+        if limit_bytes is not None and audio_bytes + job.audio.size > limit_bytes:
+            return f"{audio_bytes} bytes of audio queued, limit {limit_bytes}"
+        return None
+
+    def _estimate_retry_after(self, job: TranscriptionJob) -> float:
+        """Predicted seconds until enough queued jobs have been dispatched for `job` to fit."""
+        audio_seconds_leaving = 0.0
+        audio_bytes_leaving = 0
+        for jobs_ahead, (_, job_id) in enumerate(self._order):
+            queued = self._jobs[job_id]
+            # `queued` leaves the queue when it is dispatched, after the jobs ahead of it.
+            start_delay = self._estimate_start_delay(queued, jobs_ahead, audio_seconds_leaving)
+            audio_seconds_leaving += queued.audio_duration_seconds
+            audio_bytes_leaving += queued.audio.size
+            refusal = self._admission_refusal(
+                job, jobs_ahead + 1, audio_seconds_leaving, audio_bytes_leaving
+            )
+            if refusal is None:
+                return start_delay
+        raise AssertionError(f"Job {job.job_id[:8]} does not fit even in an empty queue")
+
+    def _stamp_finish_time(self, job: TranscriptionJob) -> float:
+        weight = self._subject_weights.get(job.token_fingerprint, 1.0)
+        cost = max(job.audio_duration_seconds, MIN_FAIR_SHARE_COST_SECONDS)
+        start = max(self._virtual_time, self._flow_finish.get(job.token_fingerprint, 0.0))
+        finish = start + cost / weight
+        self._flow_finish[job.token_fingerprint] = finish
+        return finish
+
+    def add_finished(self, job: TranscriptionJob) -> None:
+        """Register a job that was answered without running, e.g. from a result cache.
+
+        It is retained like any finished job, so its stream can be replayed.
+        """
+        assert job.chunk_stream.closed, f"Job {job.job_id[:8]} stream is still open"
         self._jobs[job.job_id] = job
+        self._jobs_by_token.setdefault(job.token_fingerprint, {})[job.job_id] = None
+        self._schedule_expiry(job.job_id)
 
     def get_job(self, job_id: str) -> TranscriptionJob | None:
         return self._jobs.get(job_id)
 
+    def cancel(self, job_id: str) -> None:
+        """Abandon a job whose client went away.
+
+        A queued job is dropped from the queue. A running job has its worker
+        task cancelled, which closes the backend stream so the backend stops
+        generating for it. Finished or unknown jobs are left alone.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        key = self._order_keys.pop(job_id, None)
+        if key is not None:
+            self._order.remove(key)
+            del self._finish_times[job_id]
+            self._queued_audio_bytes -= job.audio.size
+            owner_has_queued = any(
+                other_id in self._order_keys
+                for other_id in self._jobs_by_token[job.token_fingerprint]
+            )
+            if not owner_has_queued:
+                # Leave the clock alone otherwise: cancel-and-resubmit must not
+                # let a job jump ahead of its owner's older ones.
+                self._flow_finish.pop(job.token_fingerprint, None)
+            job.status = JobStatus.CANCELLED
+            job.audio.wipe()
+            job.chunk_stream.close()
+            self._schedule_expiry(job_id)
+            if self._finish_fn is not None:
+                self._finish_fn(job)
+            logger.info("Job %s cancelled while queued", job_id[:8])
+            return
+        task = self._job_tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    def cancel_if_unattended(
+        self, job_id: str, grace_seconds: float, own_reader_attached: bool = False
+    ) -> None:
+        """Cancel a job after `grace_seconds` unless someone is still reading its stream.
+
+        Called when a client's connection drops, giving it time to resume with
+        Last-Event-ID before the job is abandoned. `own_reader_attached` says
+        the dropped connection's reader may not have detached yet.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        stream = job.chunk_stream
+        other_readers = max(0, stream.reader_count - int(own_reader_attached))
+        task = asyncio.create_task(
+            self._cancel_after_grace(
+                job, stream.subscriptions_opened, other_readers, grace_seconds
+            )
+        )
+        self._abandon_tasks.add(task)
+        task.add_done_callback(self._abandon_tasks.discard)
+
+    async def _cancel_after_grace(
+        self, job: TranscriptionJob, subscriptions: int, other_readers: int, grace_seconds: float
+    ) -> None:
+        await asyncio.sleep(grace_seconds)
+        stream = job.chunk_stream
+        # The dropped connection's reader may still be attached if the server has
+        # not noticed yet. Unless other readers (coalesced submitters) were
+        # attached already, only a reader that subscribed since counts.
+        if stream.reader_count == 0 or (
+            other_readers == 0 and stream.subscriptions_opened == subscriptions
+        ):
+            self.cancel(job.job_id)
+
     def get_queue_info(self, token_fingerprint: str) -> QueueStatusResponse:
-        queued_ids = list(self._jobs.keys())
         your_jobs: list[JobInfo] = []
-        total_queued = 0
-
-        for job_id in queued_ids:
+        for job_id in self._jobs_by_token.get(token_fingerprint, {}):
             job = self._jobs[job_id]
-            if job.status == JobStatus.QUEUED:
-                total_queued += 1
-
-            if job.token_fingerprint == token_fingerprint:
-                position = self._get_position(job_id)
-                eta = self._estimate_wait(position) if position is not None else None
-                your_jobs.append(
-                    JobInfo(
-                        job_id=job.job_id,
-                        status=job.status,
-                        position=position,
-                        estimated_wait_seconds=eta,
-                    )
+            position, eta = self.get_position_and_eta(job_id)
+            your_jobs.append(
+                JobInfo(
+                    job_id=job.job_id,
+                    status=job.status,
+                    position=position,
+                    estimated_wait_seconds=eta,
+                    audio_bytes_saved=job.audio_bytes_saved,
+                    trimmed_seconds_ratio=(
+                        None
+                        # A header-only upload probes to zero seconds.
+                        if job.trimmed_seconds is None or job.audio_duration_seconds <= 0
+                        else job.trimmed_seconds / job.audio_duration_seconds
+                    ),
                 )
+            )
 
-        return QueueStatusResponse(your_jobs=your_jobs, total_queued=total_queued)
+        return QueueStatusResponse(your_jobs=your_jobs, total_queued=len(self._order))
 
     def get_position_and_eta(self, job_id: str) -> tuple[int | None, float | None]:
-        position = self._get_position(job_id)
-        eta = self._estimate_wait(position) if position is not None else None
-        return position, eta
-
-    def _get_position(self, job_id: str) -> int | None:
-        position = 0
-        for jid, job in self._jobs.items():
-            if job.status == JobStatus.QUEUED:
-                position += 1
-                if jid == job_id:
-                    return position
-        return None
+        key = self._order_keys.get(job_id)
+        if key is None:
+            return None, None
+        jobs_ahead, audio_seconds_ahead = self._order.prefix(key)
+        eta = self._estimate_wait(self._jobs[job_id], jobs_ahead, audio_seconds_ahead)
+        return jobs_ahead + 1, eta
+
+    def _estimate_wait(
+        self, job: TranscriptionJob, jobs_ahead: int, audio_seconds_ahead: float
+    ) -> float:
+        """Predicted seconds until `job` finishes."""
+        return self._estimate_start_delay(
+            job, jobs_ahead, audio_seconds_ahead
+        ) + self._eta_model.predict(self._asr_backend, job.audio_duration_seconds)
 
-    def _estimate_wait(self, position: int) -> float:
-        if not self._processing_times:
-            return position * 30.0  # Default 30s per job
-        avg_time = sum(self._processing_times) / len(self._processing_times)
-        return position * avg_time
+    def _estimate_start_delay(
+        self, job: TranscriptionJob, jobs_ahead: int, audio_seconds_ahead: float
+    ) -> float:
+        """Predicted seconds until `job` is dispatched."""
+        now = time.monotonic()
+        work_ahead = self._eta_model.predict_total(
+            self._asr_backend, jobs_ahead, audio_seconds_ahead
+        )
+        for job_id, in_flight in self._in_flight.items():
+            predicted = self._eta_model.predict(
+                self._asr_backend, self._jobs[job_id].audio_duration_seconds
+            )
+            work_ahead += max(0.0, predicted - (now - in_flight.started_at))
+        concurrency = self._effective_concurrency(job, jobs_ahead, audio_seconds_ahead)
+        # Starts immediately if a worker is free, otherwise once the pool drains enough.
+        if jobs_ahead + len(self._in_flight) < concurrency:
+            return 0.0
+        return work_ahead / concurrency
 
-    async def _worker(self) -> None:
+    def _effective_concurrency(
+        self, job: TranscriptionJob, jobs_ahead: int, audio_seconds_ahead: float
+    ) -> int:
+        """How many jobs like those ahead can run at once under the worker and KV limits."""
+        if self._kv_token_budget is None:
+            return self._max_concurrent_jobs
+        # Mean KV footprint of the in-flight jobs, the jobs ahead and this job.
+        job_count = len(self._in_flight) + jobs_ahead + 1
+        kv_tokens = (
+            sum(f.kv_tokens for f in self._in_flight.values())
+            + jobs_ahead * PROMPT_OVERHEAD_TOKENS
+            + math.ceil(audio_seconds_ahead * (AUDIO_TOKENS_PER_SECOND + OUTPUT_TOKENS_PER_SECOND))
+            + estimate_kv_tokens(job.audio_duration_seconds)
+        )
+        fitting = int(self._kv_token_budget * job_count / kv_tokens)
+        return max(1, min(self._max_concurrent_jobs, fitting))
+
+    def describe_eta_model(self) -> EtaModelResponse:
+        return EtaModelResponse(
+            asr_backend=self._asr_backend, backends=self._eta_model.describe()
+        )
+
+    def _can_admit(self, kv_tokens: int) -> bool:
+        if len(self._in_flight) >= self._max_concurrent_jobs:
+            return False
+        if self._kv_token_budget is None or not self._in_flight:
+            return True
+        kv_tokens_in_flight = sum(f.kv_tokens for f in self._in_flight.values())
+        return kv_tokens_in_flight + kv_tokens <= self._kv_token_budget
+
+    def _pop_admissible(self) -> TranscriptionJob | None:
+        """Remove and return the head job if it may start now (no skipping past the head)."""
+        head = self._order.first()
+        if head is None:
+            return None
+        key, job_id = head
+        job = self._jobs[job_id]
+        kv_tokens = estimate_kv_tokens(job.audio_duration_seconds)
+        if not self._can_admit(kv_tokens):
+            return None
+        self._order.remove(key)
+        del self._order_keys[job_id]
+        self._queued_audio_bytes -= job.audio.size
+        self._in_flight[job_id] = _InFlightJob(kv_tokens=kv_tokens)
+
+        finish_time = self._finish_times.pop(job_id)
+        # Lanes dispatch jobs out of finish-time order; the clock never runs back.
+        self._virtual_time = max(self._virtual_time, finish_time)
+        if self._flow_finish.get(job.token_fingerprint) == finish_time:
+            # Owner has nothing else queued; its next job starts from the virtual clock.
+            del self._flow_finish[job.token_fingerprint]
+        return job
+
+    async def _dispatcher(self) -> None:
         while True:
-            job_id = await self._pending.get()
-            job = self._jobs.get(job_id)
+            job = self._pop_admissible()
             if job is None:
+                # Woken by enqueue() or by a finishing job releasing capacity.
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            task = asyncio.create_task(self._run_job(job))
+            self._job_tasks[job.job_id] = task
+            task.add_done_callback(partial(self._forget_job_task, job.job_id))
+
+    def _forget_job_task(self, job_id: str, _task: asyncio.Task[None]) -> None:
+        del self._job_tasks[job_id]
+        if job_id in self._in_flight:
+            # Cancelled before its first step, so _run_job never got to release it.
+            job = self._jobs[job_id]
+            job.status = JobStatus.CANCELLED
+            logger.info("Job %s cancelled before it started", job_id[:8])
+            self._release(job)
+
+    async def _run_job(self, job: TranscriptionJob) -> None:
+        job.status = JobStatus.PROCESSING
+
+        try:
+            if self._process_fn:
+                await self._process_fn(job)
+            else:
+                await job.chunk_stream.put(None)
+            job.status = JobStatus.COMPLETED
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            logger.info("Job %s cancelled while running", job.job_id[:8])
+            raise
+        except Exception as exc:
+            job.status = JobStatus.FAILED
+            job.error_message = str(exc) or type(exc).__name__
+            logger.warning("Job %s failed: %s", job.job_id[:8], job.error_message)
+        finally:
+            in_flight = self._release(job)
+            if job.status == JobStatus.COMPLETED:
+                elapsed = time.monotonic() - in_flight.started_at
+                self._eta_model.observe(
+                    self._asr_backend, job.audio_duration_seconds, elapsed
+                )
+
+    def _release(self, job: TranscriptionJob) -> _InFlightJob:
+        """Free a dispatched job's audio and capacity and end its stream, whatever its outcome."""
+        # Clear audio data immediately
+        job.audio.wipe()
+        # End the stream for readers on every outcome; the error, if any, is
+        # already on the job for the final SSE event.
+        job.chunk_stream.close()
+
+        in_flight = self._in_flight.pop(job.job_id)
+        self._wakeup.set()
+
+        self._schedule_expiry(job.job_id)
+        if self._finish_fn is not None:
+            self._finish_fn(job)
+        return in_flight
+
+    def _schedule_expiry(self, job_id: str) -> None:
+        self._expiry.append((time.monotonic() + self._job_retention_seconds, job_id))
+        if self._expiry_task is None:
+            self._expiry_task = asyncio.create_task(self._expire_jobs())
+        self._expiry_wakeup.set()
+
+    async def _expire_jobs(self) -> None:
+        """Evict finished jobs once their retention has passed, from one long-lived task.
+
+        Wakes `_expiry_slack` after the oldest deadline, so every job falling
+        due in that window is evicted in the same pass.
+        """
+        while True:
+            if not self._expiry:
+                self._expiry_wakeup.clear()
+                await self._expiry_wakeup.wait()
                 continue
+            delay = self._expiry[0][0] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay + self._expiry_slack)
+            now = time.monotonic()
+            while self._expiry and self._expiry[0][0] <= now:
+                _, job_id = self._expiry.popleft()
+                self._forget_job(job_id)
 
-            job.status = JobStatus.PROCESSING
-            start_time = time.monotonic()
-
-            try:
-                if self._process_fn:
-                    await self._process_fn(job)
-                else:
-                    await job.chunk_queue.put(None)
-                job.status = JobStatus.COMPLETED
-            except Exception as exc:
-                job.status = JobStatus.FAILED
-                job.error_message = str(exc) or type(exc).__name__
-                # Signal error to waiting client
-                await job.chunk_queue.put(None)
-                logger.warning("Job %s failed: %s", job.job_id[:8], job.error_message)
-            finally:
-                elapsed = time.monotonic() - start_time
-                self._processing_times.append(elapsed)
-                if len(self._processing_times) > self._max_history:
-                    self._processing_times.pop(0)
-
-                # Clear audio data immediately
-                job.audio_base64 = ""
-
-                # Schedule cleanup (store reference to prevent GC)
-                task = asyncio.create_task(self._cleanup_job(job_id))
-                self._cleanup_tasks.add(task)
-                task.add_done_callback(self._cleanup_tasks.discard)
-
-    async def _cleanup_job(self, job_id: str) -> None:
-        await asyncio.sleep(30)
-        self._jobs.pop(job_id, None)
+    def _forget_job(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        token_jobs = self._jobs_by_token[job.token_fingerprint]
+        del token_jobs[job_id]
+        if not token_jobs:
+            del self._jobs_by_token[job.token_fingerprint]
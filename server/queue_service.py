@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from functools import partial
+from typing import Protocol
+
+import httpx
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.backend_pool import BackendPool
+from server.chunk_stream import ChunkReplayGapError
+from server.config import Settings
+from server.eta import EtaModel
+from server.models import EtaModelResponse, JobPriority, JobStatus, QueueStatusResponse
+from server.queue import QueueFullError, TranscriptionJob, TranscriptionQueue
+from server.result_cache import ResultCache
+from server.transcribe import process_groq_job, process_vibevoice_job
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JobSubmission:
+    """Everything about a new job except its audio."""
+
+    token_fingerprint: str
+    audio_mime: str
+    hotwords: str | None
+    audio_duration_seconds: float
+    priority: JobPriority
+    # Hash of the audio, hotwords and generation parameters; identical
+    # submissions share one job. None opts out of coalescing and caching.
+    content_key: str | None
+
+
+@dataclass(frozen=True)
+class JobView:
+    job_id: str
+    token_fingerprint: str
+    last_chunk_id: int
+    first_retained_chunk_id: int
+    # Other subjects whose identical submissions were attached to this job
+    coalesced_subjects: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class JobOutcome:
+    """How a job ended; the last item of its event stream."""
+
+    status: JobStatus
+    error_message: str | None
+    last_chunk_id: int
+
+
+# (chunk id, chunk) for each chunk, then exactly one JobOutcome.
+JobStreamItem = tuple[int, str] | JobOutcome
+
+
+class QueueService(Protocol):
+    """What the HTTP routes need from the job queue.
+
+    LocalQueueService serves it from a TranscriptionQueue in this process;
+    server.broker.BrokerQueueService from one shared by several processes.
+    """
+
+    async def submit(self, submission: JobSubmission, audio: AudioBuffer) -> str:
+        """Queue a job and return its id. Raises QueueFullError if it does not fit.
+
+        The service takes over `audio`: it is wiped once it is no longer needed,
+        including when the job is refused or answered without running.
+        """
+        ...
+
+    async def get_job(self, job_id: str) -> JobView | None: ...
+
+    async def get_position_and_eta(self, job_id: str) -> tuple[int | None, float | None]: ...
+
+    def subscribe(self, job_id: str, after_id: int) -> AsyncGenerator[JobStreamItem, None]:
+        """Stream a job's chunks after `after_id`, then its outcome.
+
+        Raises ChunkReplayGapError if those chunks, or the whole job, are no
+        longer retained.
+        """
+        ...
+
+    async def cancel_if_unattended(
+        self, job_id: str, grace_seconds: float, own_reader_attached: bool = False
+    ) -> None: ...
+
+    async def get_queue_info(self, token_fingerprint: str) -> QueueStatusResponse: ...
+
+    async def describe_eta_model(self) -> EtaModelResponse: ...
+
+
+class LocalQueueService:
+    """QueueService backed by a TranscriptionQueue running in this process."""
+
+    def __init__(
+        self,
+        queue: TranscriptionQueue,
+        audio_spool_dir: str,
+        backends: BackendPool | None = None,
+        result_cache: ResultCache | None = None,
+    ) -> None:
+        self.queue = queue
+        self._audio_spool_dir = audio_spool_dir
+        self._backends = backends
+        self._result_cache = result_cache
+        # content key -> id of the queued or running job producing that transcript
+        self._active_by_key: dict[str, str] = {}
+        queue.set_finish_fn(self._on_job_finished)
+
+    def start(self) -> None:
+        if self._backends is not None:
+            self._backends.start()
+        self.queue.start_worker()
+
+    async def stop(self) -> None:
+        await self.queue.stop()
+        if self._backends is not None:
+            await self._backends.stop()
+
+    async def submit(self, submission: JobSubmission, audio: AudioBuffer) -> str:
+        key = submission.content_key
+        if key is not None:
+            job_id = self._attach_to_active(key, submission.token_fingerprint)
+            if job_id is None:
+                job_id = await self._replay_cached(key, submission)
+            if job_id is not None:
+                audio.wipe()
+                return job_id
+        if self._audio_spool_dir and not audio.spooled:
+            # Audio unpacked from an archive or relayed by the broker arrives in memory.
+            in_memory = audio
+            audio = await AudioBuffer.spool(await in_memory.read(), self._audio_spool_dir)
+            in_memory.wipe()
+        job = TranscriptionJob(
+            token_fingerprint=submission.token_fingerprint,
+            audio=audio,
+            audio_mime=submission.audio_mime,
+            hotwords=submission.hotwords,
+            audio_duration_seconds=submission.audio_duration_seconds,
+            priority=submission.priority,
+            content_key=key,
+        )
+        try:
+            self.queue.enqueue(job)
+        except QueueFullError:
+            audio.wipe()
+            raise
+        if key is not None:
+            self._active_by_key[key] = job.job_id
+        return job.job_id
+
+    def _attach_to_active(self, content_key: str, token_fingerprint: str) -> str | None:
+        """Return the id of an identical job still replayable from its first chunk."""
+        job_id = self._active_by_key.get(content_key)
+        job = None if job_id is None else self.queue.get_job(job_id)
+        if job is None or job.chunk_stream.first_retained_id != 1:
+            return None
+        if (
+            token_fingerprint != job.token_fingerprint
+            and token_fingerprint not in job.coalesced_subjects
+        ):
+            job.coalesced_subjects.append(token_fingerprint)
+        logger.info("Job %s coalesced with an identical submission", job.job_id[:8])
+        return job.job_id
+
+    async def _replay_cached(self, content_key: str, submission: JobSubmission) -> str | None:
+        """Answer a submission from the result cache as an already finished job."""
+        if self._result_cache is None:
+            return None
+        chunks = self._result_cache.get(content_key)
+        if chunks is None:
+            return None
+        job = TranscriptionJob(
+            token_fingerprint=submission.token_fingerprint,
+            audio_mime=submission.audio_mime,
+            hotwords=submission.hotwords,
+            audio_duration_seconds=submission.audio_duration_seconds,
+            priority=submission.priority,
+            status=JobStatus.COMPLETED,
+        )
+        for chunk in chunks:
+            await job.chunk_stream.put(chunk)
+        await job.chunk_stream.put(None)
+        self.queue.add_finished(job)
+        logger.info("Job %s answered from the result cache", job.job_id[:8])
+        return job.job_id
+
+    def _on_job_finished(self, job: TranscriptionJob) -> None:
+        if job.content_key is None:
+            return
+        if self._active_by_key.get(job.content_key) == job.job_id:
+            del self._active_by_key[job.content_key]
+        if (
+            self._result_cache is not None
+            and job.status == JobStatus.COMPLETED
+            and job.error_message is None
+            and job.chunk_stream.first_retained_id == 1
+        ):
+            self._result_cache.put(job.content_key, job.chunk_stream.retained_chunks())
+
+    async def get_job(self, job_id: str) -> JobView | None:
+        job = self.queue.get_job(job_id)
+        if job is None:
+            return None
+        return JobView(
+            job_id=job.job_id,
+            token_fingerprint=job.token_fingerprint,
+            last_chunk_id=job.chunk_stream.last_id,
+            first_retained_chunk_id=job.chunk_stream.first_retained_id,
+            coalesced_subjects=tuple(job.coalesced_subjects),
+        )
+
+    async def get_position_and_eta(self, job_id: str) -> tuple[int | None, float | None]:
+        return self.queue.get_position_and_eta(job_id)
+
+    async def subscribe(self, job_id: str, after_id: int) -> AsyncGenerator[JobStreamItem, None]:
+        job = self.queue.get_job(job_id)
+        if job is None:
+            raise ChunkReplayGapError(f"Job {job_id} is no longer retained")
+        chunks = job.chunk_stream.subscribe(after_id)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # Detach from the stream now, not whenever the generator is collected.
+            await chunks.aclose()
+        yield JobOutcome(
+            status=job.status,
+            error_message=job.error_message,
+            last_chunk_id=job.chunk_stream.last_id,
+        )
+
+    async def cancel_if_unattended(
+        self, job_id: str, grace_seconds: float, own_reader_attached: bool = False
+    ) -> None:
+        self.queue.cancel_if_unattended(job_id, grace_seconds, own_reader_attached)
+
+    async def get_queue_info(self, token_fingerprint: str) -> QueueStatusResponse:
+        return self.queue.get_queue_info(token_fingerprint)
+
+    async def describe_eta_model(self) -> EtaModelResponse:
+        return self.queue.describe_eta_model()
+
+
+def create_local_service(
+    config: Settings, http_client: httpx.AsyncClient, ffmpeg: FfmpegPool
+) -> LocalQueueService:
+    """Build the queue and its ASR backend workers as configured (not yet started)."""
+    backends = None
+    if config.asr_backend == "groq":
+        # Groq has no local KV cache to protect; only the concurrency cap applies.
+        kv_token_budget = None
+        process_fn = partial(
+            process_groq_job, http_client=http_client, config=config, ffmpeg=ffmpeg
+        )
+    else:
+        backends = BackendPool(config.vllm_base_urls, http_client)
+        # The budget is per vLLM instance; each job's KV cache lives on one of them.
+        kv_token_budget = config.vllm_kv_token_budget * len(config.vllm_base_urls)
+        process_fn = partial(
+            process_vibevoice_job,
+            http_client=http_client,
+            config=config,
+            backends=backends,
+            ffmpeg=ffmpeg,
+        )
+    queue = TranscriptionQueue(
+        max_size=config.max_queue_size,
+        max_queued_audio_seconds=config.max_queued_audio_seconds or None,
+        max_queued_audio_bytes=config.max_queued_audio_bytes or None,
+        max_concurrent_jobs=config.max_concurrent_jobs,
+        kv_token_budget=kv_token_budget,
+        subject_weights=config.subject_weights,
+        eta_model=EtaModel(state_file=config.eta_model_file or None),
+        asr_backend=config.asr_backend,
+        job_retention_seconds=config.job_retention_seconds,
+        priority_lane_seconds=config.priority_lane_seconds,
+    )
+    queue.set_process_fn(process_fn)
+    result_cache = None
+    if config.result_cache_bytes > 0:
+        result_cache = ResultCache(config.result_cache_bytes, config.result_cache_ttl_seconds)
+    return LocalQueueService(queue, config.audio_spool_dir, backends, result_cache)
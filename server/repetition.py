@@ -0,0 +1,27 @@
+"""Spotting a model stuck repeating itself, as VibeVoice does on music and sound effects.
+
+Left alone, such a loop runs until the token limit, burning GPU time on
+output that is thrown away. The test is the one VibeVoice's own recovery
+script uses: a pattern of at least 10 characters repeated at least 10
+times in a row within the last 400 characters.
+"""
+
+# Only this much of the end of the text is looked at.
+LOOP_WINDOW_CHARS = 400
+_MIN_PATTERN_CHARS = 10
+_MIN_REPEATS = 10
+
+
+def ends_in_loop(text: str) -> bool:
+    """Whether `text` ends in a pattern of 10+ characters repeated 10+ times in a row.
+
+    Checked after every chunk, a loop is caught as soon as it reaches the
+    end of the text, whatever character it was cut at.
+    """
+    tail = text[-LOOP_WINDOW_CHARS:]
+    for period in range(_MIN_PATTERN_CHARS, len(tail) // _MIN_REPEATS + 1):
+        span = period * _MIN_REPEATS
+        # Periodic with this period iff it equals itself shifted by one period.
+        if tail[-span + period :] == tail[-span:-period]:
+            return True
+    return False
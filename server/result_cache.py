@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+_NONCE_BYTES = 12
+
+
+class ResultCache:
+    """Bounded LRU of finished transcripts, encrypted with keys the cache never holds.
+
+    Entries are indexed by a hash of the job's content key and encrypted with
+    AES-GCM under a different hash of it. The content key itself is derived
+    from the uploaded audio and is not stored, so a transcript can only be
+    read back by someone presenting the same audio: a memory dump of the
+    server yields nothing but ciphertext. Entries expire `ttl_seconds` after
+    they were stored, and the least recently used ones are evicted once the
+    ciphertexts exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        assert max_bytes > 0, f"Expected positive max_bytes, got: {max_bytes}"
+        assert ttl_seconds > 0, f"Expected positive ttl_seconds, got: {ttl_seconds}"
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        # entry id -> (expiry time, nonce + ciphertext), least recently used first
+        self._entries: OrderedDict[bytes, tuple[float, bytes]] = OrderedDict()
+        # (expiry time, entry id) in insertion order, which is expiry order
+        self._expiry: deque[tuple[float, bytes]] = deque()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def get(self, content_key: str) -> list[str] | None:
+        """Return the cached chunks of a transcript, or None."""
+        self._expire()
+        entry_id, key = _derive(content_key)
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(entry_id)
+        sealed = entry[1]
+        plaintext = AESGCM(key).decrypt(sealed[:_NONCE_BYTES], sealed[_NONCE_BYTES:], None)
+        chunks: list[str] = json.loads(plaintext)
+        return chunks
+
+    def put(self, content_key: str, chunks: list[str]) -> None:
+        self._expire()
+        entry_id, key = _derive(content_key)
+        nonce = os.urandom(_NONCE_BYTES)
+        sealed = nonce + AESGCM(key).encrypt(nonce, json.dumps(chunks).encode(), None)
+        if len(sealed) > self._max_bytes:
+            return
+        self._remove(entry_id)
+        expires_at = time.monotonic() + self._ttl_seconds
+        self._entries[entry_id] = (expires_at, sealed)
+        self._expiry.append((expires_at, entry_id))
+        self._size += len(sealed)
+        while self._size > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, entry_id = self._expiry.popleft()
+            entry = self._entries.get(entry_id)
+            # Skip ids that were evicted, or replaced by a newer entry since.
+            if entry is not None and entry[0] == expires_at:
+                self._remove(entry_id)
+
+    def _remove(self, entry_id: bytes) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+def _derive(content_key: str) -> tuple[bytes, bytes]:
+    """Split a content key into an entry id and an encryption key, neither revealing the other."""
+    raw = bytes.fromhex(content_key)
+    entry_id = hashlib.sha256(b"vvv-result-cache-id\0" + raw).digest()
+    key = hashlib.sha256(b"vvv-result-cache-key\0" + raw).digest()
+    return entry_id, key
@@ -1,23 +1,45 @@
+import asyncio
+
 import httpx
 from fastapi import APIRouter, Request
 
+from server.audio import FfmpegPool
 from server.config import Settings
 
 router = APIRouter()
 
 
+async def _probe(http_client: httpx.AsyncClient, base_url: str) -> str:
+    try:
+        resp = await http_client.get(f"{base_url}/health", timeout=5.0)
+        return "ok" if resp.status_code == 200 else "degraded"
+    except Exception:
+        return "unreachable"
+
+
 @router.get("/health")
-async def health(request: Request) -> dict[str, str]:
+async def health(request: Request) -> dict[str, str | dict[str, str] | dict[str, int | float]]:
     http_client: httpx.AsyncClient = request.app.state.http_client
     settings: Settings = request.app.state.settings
+    ffmpeg: FfmpegPool = request.app.state.ffmpeg
 
     if settings.asr_backend == "groq":
-        return {"status": "ok", "asr_backend": "groq"}
+        return {"status": "ok", "asr_backend": "groq", "ffmpeg": ffmpeg.stats()}
 
-    try:
-        resp = await http_client.get(f"{settings.vllm_base_url}/health", timeout=5.0)
-        vllm_status = "ok" if resp.status_code == 200 else "degraded"
-    except Exception:
+    statuses = await asyncio.gather(
+        *(_probe(http_client, url) for url in settings.vllm_base_urls)
+    )
+    # ok only if every backend is; unreachable only if none answers.
+    if all(s == "ok" for s in statuses):
+        vllm_status = "ok"
+    elif all(s == "unreachable" for s in statuses):
         vllm_status = "unreachable"
+    else:
+        vllm_status = "degraded"
 
-    return {"status": "ok", "vllm": vllm_status}
+    return {
+        "status": "ok",
+        "vllm": vllm_status,
+        "vllm_backends": dict(zip(settings.vllm_base_urls, statuses, strict=True)),
+        "ffmpeg": ffmpeg.stats(),
+    }
@@ -3,8 +3,8 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, Request
 
 from server.auth import verify_token
-from server.models import QueueStatusResponse
-from server.queue import TranscriptionQueue
+from server.models import EtaModelResponse, QueueStatusResponse
+from server.queue_service import QueueService
 
 router = APIRouter()
 
@@ -14,5 +14,14 @@ async def queue_status(
     request: Request,
     token_fingerprint: Annotated[str, Depends(verify_token)],
 ) -> QueueStatusResponse:
-    queue: TranscriptionQueue = request.app.state.queue
-    return queue.get_queue_info(token_fingerprint)
+    queue: QueueService = request.app.state.queue_service
+    return await queue.get_queue_info(token_fingerprint)
+
+
+@router.get("/v1/queue/eta-model")
+async def eta_model(
+    request: Request,
+    token_fingerprint: Annotated[str, Depends(verify_token)],
+) -> EtaModelResponse:
+    queue: QueueService = request.app.state.queue_service
+    return await queue.describe_eta_model()
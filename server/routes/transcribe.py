@@ -1,94 +1,539 @@
 import asyncio
+import hashlib
 import json
+import logging
+import math
 from collections.abc import AsyncIterator
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
-from server.audio import detect_mime_type, encode_audio_base64, probe_duration
-from server.auth import verify_token
-from server.models import ErrorEvent, QueuePositionEvent, TranscriptionChunkEvent
-from server.queue import TranscriptionJob, TranscriptionQueue
+from server.audio import (
+    FfmpegPool,
+    detect_mime_type,
+    is_archive,
+    probe_duration,
+    unpack_archive,
+)
+from server.audio_buffer import AudioBuffer
+from server.auth import TokenIdentity, verify_token, verify_token_identity
+from server.chunk_stream import ChunkReplayGapError
+from server.config import Settings
+from server.models import (
+    BatchChunkEvent,
+    BatchFile,
+    BatchFileDoneEvent,
+    BatchFileErrorEvent,
+    BatchProgressEvent,
+    BatchQueuePositionEvent,
+    BatchSegmentEvent,
+    BatchStartEvent,
+    ErrorEvent,
+    JobPriority,
+    JobStatus,
+    QueuePositionEvent,
+    SegmentEvent,
+    TranscriptionChunkEvent,
+)
+from server.queue import PRIORITY_LANES, QueueFullError
+from server.queue_service import JobOutcome, JobSubmission, QueueService
+from server.segments import Segment, SegmentParser, segment_speaker, segment_time
+from server.upload import Upload, UploadedFile, receive_upload
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+_DISCONNECT_POLL_SECONDS = 1.0
+# Files one batch upload may contain.
+MAX_BATCH_FILES = 1000
+# Events buffered between a batch's jobs and its client; beyond that the jobs wait.
+_BATCH_EVENT_BUFFER = 64
 
-@router.post("/v1/transcribe")
-async def transcribe(
-    request: Request,
-    audio: UploadFile,
-    token_fingerprint: Annotated[str, Depends(verify_token)],
-    hotwords: str | None = None,
-) -> StreamingResponse:
-    queue: TranscriptionQueue = request.app.state.queue
-    max_audio_bytes: int = request.app.state.settings.max_audio_bytes
 
-    audio_bytes = await audio.read()
-    if len(audio_bytes) > max_audio_bytes:
-        raise HTTPException(status_code=413, detail="Audio file too large")
+async def _abandon_on_disconnect(
+    request: Request, queue: QueueService, job_ids: list[str], grace_seconds: float
+) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(_DISCONNECT_POLL_SECONDS)
+    # The stream's readers may not have noticed the disconnect and detached yet.
+    for job_id in job_ids:
+        await queue.cancel_if_unattended(job_id, grace_seconds, own_reader_attached=True)
 
-    if len(audio_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Empty audio file")
 
-    audio_b64 = encode_audio_base64(audio_bytes)
-    if audio.filename is None:
-        raise HTTPException(status_code=400, detail="Audio file must include a filename")
+def _content_key(settings: Settings, hotwords: str | None, audio_sha256: bytes) -> str:
+    """Hash everything that determines a transcript, so identical jobs can share one."""
+    if settings.asr_backend == "groq":
+        params: list[object] = ["groq", settings.groq_model_name, hotwords]
+    else:
+        params = [
+            "vibevoice",
+            settings.vllm_model_name,
+            settings.vllm_temperature,
+            settings.vllm_top_p,
+            hotwords,
+        ]
+    digest = hashlib.sha256(json.dumps(params).encode())
+    digest.update(b"\0")
+    digest.update(audio_sha256)
+    return digest.hexdigest()
+
+
+def _resolve_priority(identity: TokenIdentity, priority: JobPriority | None) -> JobPriority:
+    """Default to the token's class; a request may step down, never up."""
+    if priority is None:
+        return identity.max_priority
+    if PRIORITY_LANES[priority] > PRIORITY_LANES[identity.max_priority]:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Token allows priority up to {identity.max_priority}, got: {priority}",
+        )
+    return priority
+
+
+async def _prepare_submission(
+    settings: Settings,
+    subject: str,
+    uploaded: UploadedFile,
+    hotwords: str | None,
+    priority: JobPriority,
+    ffmpeg: FfmpegPool,
+) -> JobSubmission:
     try:
-        mime_type = detect_mime_type(audio.filename)
+        mime_type = detect_mime_type(uploaded.filename)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from None
     try:
-        duration = await probe_duration(audio_bytes)
+        duration = await probe_duration(uploaded.audio, ffmpeg)
     except RuntimeError as exc:
         raise HTTPException(status_code=422, detail=f"Cannot read audio: {exc}") from None
-
-    job = TranscriptionJob(
-        token_fingerprint=token_fingerprint,
-        audio_base64=audio_b64,
+    return JobSubmission(
+        token_fingerprint=subject,
         audio_mime=mime_type,
         hotwords=hotwords,
         audio_duration_seconds=duration,
+        priority=priority,
+        content_key=_content_key(settings, hotwords, uploaded.sha256),
+    )
+
+
+def _queue_full(exc: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Queue is full: {exc.reason}",
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after_seconds)))},
     )
 
+
+def _audio_files(upload: Upload) -> list[UploadedFile]:
+    """The upload's `audio` file parts, each checked for a filename."""
+    files = upload.files
+    if not files:
+        raise HTTPException(status_code=400, detail="Upload has no audio file")
+    for uploaded in files:
+        if uploaded.field_name != "audio":
+            raise HTTPException(
+                status_code=400, detail=f"Unexpected file field: {uploaded.field_name!r}"
+            )
+        if not uploaded.filename:
+            raise HTTPException(status_code=400, detail="Audio file must include a filename")
+    return files
+
+
+def _unpack_batch_archive(
+    archive: UploadedFile, archive_bytes: bytes, max_total_bytes: int
+) -> list[UploadedFile]:
     try:
-        queue.enqueue(job)
-    except asyncio.QueueFull:
-        raise HTTPException(status_code=503, detail="Queue is full") from None
+        members = unpack_archive(archive.filename, archive_bytes, max_total_bytes)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    return [
+        UploadedFile(
+            field_name=archive.field_name,
+            filename=name,
+            audio=AudioBuffer.in_memory(data),
+            sha256=hashlib.sha256(data).digest(),
+        )
+        for name, data in members
+    ]
 
-    async def event_stream() -> AsyncIterator[str]:
-        # Send initial queue position
-        position, eta = queue.get_position_and_eta(job.job_id)
-        if position is not None:
-            assert eta is not None, f"ETA must not be None when position={position} is not None"
-            event = QueuePositionEvent(
-                job_id=job.job_id,
-                position=position,
-                estimated_wait_seconds=eta,
+
+async def _read_batch(upload: Upload, max_total_bytes: int) -> list[UploadedFile]:
+    """Return every file in a batch upload, unpacking a single archive."""
+    files = _audio_files(upload)
+    if len(files) == 1 and is_archive(files[0].filename):
+        archive = files[0]
+        archive_bytes = await archive.audio.read()
+        archive.audio.wipe()
+        upload.files = await asyncio.to_thread(
+            _unpack_batch_archive, archive, archive_bytes, max_total_bytes
+        )
+        files = upload.files
+    if not files:
+        raise HTTPException(status_code=400, detail="Batch contains no audio files")
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch has {len(files)} files, more than the limit of {MAX_BATCH_FILES}",
+        )
+    return files
+
+
+@router.post("/v1/transcribe")
+async def transcribe(
+    request: Request,
+    identity: Annotated[TokenIdentity, Depends(verify_token_identity)],
+    hotwords: str | None = None,
+    priority: JobPriority | None = None,
+) -> StreamingResponse:
+    """Transcribe the multipart `audio` file, streaming its events.
+
+    The upload is written to its buffer as it arrives rather than after it
+    has been received whole. `hotwords` may be a form field or a query
+    parameter.
+    """
+    queue: QueueService = request.app.state.queue_service
+    settings: Settings = request.app.state.settings
+    priority = _resolve_priority(identity, priority)
+
+    upload = await receive_upload(
+        request, settings.max_audio_bytes, max_files=1, spool_dir=settings.audio_spool_dir
+    )
+    try:
+        (uploaded,) = _audio_files(upload)
+        if uploaded.audio.size == 0:
+            raise HTTPException(status_code=400, detail="Empty audio file")
+        hotwords = upload.fields.get("hotwords", hotwords)
+        submission = await _prepare_submission(
+            settings, identity.subject, uploaded, hotwords, priority, request.app.state.ffmpeg
+        )
+    except BaseException:
+        upload.wipe()
+        raise
+    try:
+        job_id = await queue.submit(submission, uploaded.audio)
+    except QueueFullError as exc:
+        raise _queue_full(exc) from None
+
+    return _event_stream_response(request, queue, job_id, after_id=0)
+
+
+@router.post("/v1/transcribe/batch")
+async def transcribe_batch(
+    request: Request,
+    identity: Annotated[TokenIdentity, Depends(verify_token_identity)],
+    hotwords: str | None = None,
+    priority: JobPriority | None = None,
+) -> StreamingResponse:
+    """Queue many `audio` files, or the audio in one zip/tar archive, and stream all their events.
+
+    The files share one upload, one token check and one SSE connection. The
+    whole batch counts against --max-audio-bytes, and it is queued entirely
+    or not at all.
+    """
+    queue: QueueService = request.app.state.queue_service
+    settings: Settings = request.app.state.settings
+    priority = _resolve_priority(identity, priority)
+
+    ffmpeg: FfmpegPool = request.app.state.ffmpeg
+    upload = await receive_upload(
+        request, settings.max_audio_bytes, MAX_BATCH_FILES, settings.audio_spool_dir
+    )
+    hotwords = upload.fields.get("hotwords", hotwords)
+
+    async def prepare(uploaded: UploadedFile) -> JobSubmission:
+        name = uploaded.filename
+        if uploaded.audio.size == 0:
+            raise HTTPException(status_code=400, detail=f"{name}: Empty audio file")
+        # Files needing ffprobe queue for the process pool; the rest take microseconds.
+        try:
+            return await _prepare_submission(
+                settings, identity.subject, uploaded, hotwords, priority, ffmpeg
             )
-            yield f"event: queue\ndata: {event.model_dump_json()}\n\n"
+        except HTTPException as exc:
+            raise HTTPException(exc.status_code, detail=f"{name}: {exc.detail}") from None
 
-        # Stream transcription chunks
-        while True:
-            chunk = await job.chunk_queue.get()
-            if chunk is None:
-                break
+    try:
+        files = await _read_batch(upload, settings.max_audio_bytes)
+        submissions = await asyncio.gather(*(prepare(uploaded) for uploaded in files))
+    except BaseException:
+        upload.wipe()
+        raise
 
-            chunk_event = TranscriptionChunkEvent(text=chunk)
-            yield f"data: {chunk_event.model_dump_json()}\n\n"
+    job_ids: list[str] = []
+    try:
+        for submission, uploaded in zip(submissions, files, strict=True):
+            job_ids.append(await queue.submit(submission, uploaded.audio))
+    except QueueFullError as exc:
+        # The refused file's audio is wiped by the queue; the rest were never submitted.
+        for uploaded in files[len(job_ids) + 1 :]:
+            uploaded.audio.wipe()
+        # Nobody is reading the jobs queued so far, so this withdraws them.
+        for job_id in job_ids:
+            await queue.cancel_if_unattended(job_id, grace_seconds=0.0)
+        raise _queue_full(exc) from None
 
-        # Send final event
-        if job.error_message is not None:
-            error_event = ErrorEvent(error=job.error_message)
-            yield f"event: error\ndata: {error_event.model_dump_json()}\n\n"
-        else:
-            yield f"event: done\ndata: {json.dumps({'job_id': job.job_id})}\n\n"
+    names = [uploaded.filename for uploaded in files]
+    return StreamingResponse(
+        _batch_event_stream(request, queue, names, job_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/v1/jobs/{job_id}/events")
+async def job_events(
+    request: Request,
+    job_id: str,
+    token_fingerprint: Annotated[str, Depends(verify_token)],
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """Resume a job's event stream after the chunk named by Last-Event-ID."""
+    queue: QueueService = request.app.state.queue_service
+    job = await queue.get_job(job_id)
+    # Someone else's job is reported as missing, so job ids cannot be probed.
+    # Submitters of identical audio that was coalesced into the job may resume it too.
+    if job is None or (
+        job.token_fingerprint != token_fingerprint
+        and token_fingerprint not in job.coalesced_subjects
+    ):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    after_id = 0
+    if last_event_id is not None:
+        try:
+            after_id = int(last_event_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid Last-Event-ID: {last_event_id!r}"
+            ) from None
+        if not 0 <= after_id <= job.last_chunk_id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Last-Event-ID {after_id} is outside 0..{job.last_chunk_id}",
+            )
+    if after_id + 1 < job.first_retained_chunk_id:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Chunks after {after_id} are no longer retained; resubmit the audio",
+        )
+
+    return _event_stream_response(request, queue, job_id, after_id=after_id)
 
+
+def _event_stream_response(
+    request: Request, queue: QueueService, job_id: str, after_id: int
+) -> StreamingResponse:
     return StreamingResponse(
-        event_stream(),
+        _event_stream(request, queue, job_id, after_id),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "X-Accel-Buffering": "no",
+            "X-Job-Id": job_id,
         },
     )
+
+
+async def _event_stream(
+    request: Request, queue: QueueService, job_id: str, after_id: int
+) -> AsyncIterator[str]:
+    """SSE events of one job from chunk `after_id` on; each chunk's `id:` is its position.
+
+    Each data event is followed by a `segment` event for every segment it
+    completes, with the same `id:`.
+    """
+    grace_seconds: float = request.app.state.settings.stream_resume_grace_seconds
+    # Starlette cancels this generator on http.disconnect for servers speaking
+    # ASGI < 2.4 (uvicorn). Under 2.4 it only notices a vanished client when a
+    # write fails, which may be minutes away while the job is queued, so poll too.
+    watcher = asyncio.create_task(
+        _abandon_on_disconnect(request, queue, [job_id], grace_seconds)
+    )
+    items = queue.subscribe(job_id, after_id)
+    # Chunks end on segment boundaries, so a resumed stream starts after a complete segment.
+    parser = SegmentParser(resumed=after_id > 0)
+    outcome: JobOutcome | None = None
+    stream_complete = False
+    try:
+        # Send initial queue position
+        position, eta = await queue.get_position_and_eta(job_id)
+        if position is not None:
+            assert eta is not None, (
+                f"ETA must not be None when position={position} is not None"
+            )
+            event = QueuePositionEvent(
+                job_id=job_id,
+                position=position,
+                estimated_wait_seconds=eta,
+            )
+            yield f"event: queue\nid: {after_id}\ndata: {event.model_dump_json()}\n\n"
+
+        # Stream transcription chunks
+        try:
+            async for item in items:
+                if isinstance(item, JobOutcome):
+                    outcome = item
+                    continue
+                chunk_id, chunk = item
+                chunk_event = TranscriptionChunkEvent(text=chunk)
+                yield f"id: {chunk_id}\ndata: {chunk_event.model_dump_json()}\n\n"
+                for segment in parser.feed(chunk):
+                    segment_event = _segment_event(segment)
+                    yield (
+                        f"event: segment\nid: {chunk_id}\n"
+                        f"data: {segment_event.model_dump_json()}\n\n"
+                    )
+        except ChunkReplayGapError as exc:
+            stream_complete = True
+            error_event = ErrorEvent(error=str(exc))
+            yield f"event: error\ndata: {error_event.model_dump_json()}\n\n"
+            return
+        stream_complete = True
+    finally:
+        await items.aclose()
+        watcher.cancel()
+        if not stream_complete:
+            # Generator closed early: the response was cancelled mid-stream.
+            # Keep the job for a while in case the client resumes.
+            await queue.cancel_if_unattended(job_id, grace_seconds)
+
+    # Send final event
+    assert outcome is not None, f"Event stream of job {job_id[:8]} ended without an outcome"
+    final_id = outcome.last_chunk_id
+    error = _outcome_error(outcome)
+    if error is not None:
+        error_event = ErrorEvent(error=error)
+        yield f"event: error\nid: {final_id}\ndata: {error_event.model_dump_json()}\n\n"
+    else:
+        done = json.dumps({"job_id": job_id})
+        yield f"event: done\nid: {final_id}\ndata: {done}\n\n"
+
+
+def _segment_event(segment: Segment) -> SegmentEvent:
+    content = segment["Content"]
+    return SegmentEvent(
+        start=segment_time(segment, "Start"),
+        end=segment_time(segment, "End"),
+        speaker=segment_speaker(segment),
+        content=content if isinstance(content, str) else json.dumps(content),
+    )
+
+
+def _outcome_error(outcome: JobOutcome) -> str | None:
+    if outcome.status == JobStatus.CANCELLED:
+        return "Job was cancelled"
+    return outcome.error_message
+
+
+async def _batch_event_stream(
+    request: Request, queue: QueueService, names: list[str], job_ids: list[str]
+) -> AsyncIterator[str]:
+    """SSE events of every job in a batch, each tagged with its file's index.
+
+    Starts with a `batch` event listing the files and their job ids. Per
+    file there are `queue`, chunk and `segment` events, then `file-done` or
+    `file-error`, each followed by a `progress` event with the batch's
+    totals. The stream ends with `done`. Events carry no `id:`, as the
+    batch stream cannot be resumed as a whole; a client that loses it
+    resumes each unfinished job by its id from the chunk_id it last saw.
+    """
+    grace_seconds: float = request.app.state.settings.stream_resume_grace_seconds
+    files = [
+        BatchFile(file=index, name=name, job_id=job_id)
+        for index, (name, job_id) in enumerate(zip(names, job_ids, strict=True))
+    ]
+    yield f"event: batch\ndata: {BatchStartEvent(files=files).model_dump_json()}\n\n"
+
+    watcher = asyncio.create_task(
+        _abandon_on_disconnect(request, queue, job_ids, grace_seconds)
+    )
+    # (SSE event, None while the file is running, then whether it succeeded)
+    events: asyncio.Queue[tuple[str, bool | None]] = asyncio.Queue(maxsize=_BATCH_EVENT_BUFFER)
+    pumps = [
+        asyncio.create_task(_pump_batch_job(queue, index, job_id, events))
+        for index, job_id in enumerate(job_ids)
+    ]
+    progress = BatchProgressEvent(completed=0, failed=0, total=len(job_ids))
+    stream_complete = False
+    try:
+        while progress.completed + progress.failed < progress.total:
+            event, ok = await events.get()
+            yield event
+            if ok is None:
+                continue
+            if ok:
+                progress.completed += 1
+            else:
+                progress.failed += 1
+            yield f"event: progress\ndata: {progress.model_dump_json()}\n\n"
+        stream_complete = True
+    finally:
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        watcher.cancel()
+        if not stream_complete:
+            for job_id in job_ids:
+                await queue.cancel_if_unattended(job_id, grace_seconds)
+
+    yield f"event: done\ndata: {progress.model_dump_json()}\n\n"
+
+
+async def _pump_batch_job(
+    queue: QueueService,
+    index: int,
+    job_id: str,
+    events: asyncio.Queue[tuple[str, bool | None]],
+) -> None:
+    """Forward one batch job's events, ending with its file-done or file-error."""
+    items = queue.subscribe(job_id, 0)
+    parser = SegmentParser()
+    error: str | None = None
+    try:
+        position, eta = await queue.get_position_and_eta(job_id)
+        if position is not None:
+            assert eta is not None, (
+                f"ETA must not be None when position={position} is not None"
+            )
+            queue_event = BatchQueuePositionEvent(
+                file=index, job_id=job_id, position=position, estimated_wait_seconds=eta
+            )
+            await events.put((f"event: queue\ndata: {queue_event.model_dump_json()}\n\n", None))
+
+        async for item in items:
+            if isinstance(item, JobOutcome):
+                error = _outcome_error(item)
+                continue
+            chunk_id, chunk = item
+            chunk_event = BatchChunkEvent(file=index, chunk_id=chunk_id, text=chunk)
+            await events.put((f"data: {chunk_event.model_dump_json()}\n\n", None))
+            for segment in parser.feed(chunk):
+                event = _segment_event(segment)
+                segment_event = BatchSegmentEvent(
+                    file=index,
+                    chunk_id=chunk_id,
+                    start=event.start,
+                    end=event.end,
+                    speaker=event.speaker,
+                    content=event.content,
+                )
+                await events.put(
+                    (f"event: segment\ndata: {segment_event.model_dump_json()}\n\n", None)
+                )
+    except ChunkReplayGapError as exc:
+        error = str(exc)
+    except Exception as exc:
+        # Fail this file rather than stall the batch waiting for its outcome.
+        logger.exception("Event stream of batch job %s failed", job_id[:8])
+        error = f"Event stream failed: {exc}"
+    finally:
+        await items.aclose()
+
+    if error is not None:
+        error_event = BatchFileErrorEvent(file=index, job_id=job_id, error=error)
+        await events.put((f"event: file-error\ndata: {error_event.model_dump_json()}\n\n", False))
+    else:
+        done_event = BatchFileDoneEvent(file=index, job_id=job_id)
+        await events.put((f"event: file-done\ndata: {done_event.model_dump_json()}\n\n", True))
@@ -0,0 +1,275 @@
+"""The JSON segment list VibeVoice returns, and stitching window transcripts into one.
+
+A segment looks like {"Start": 0.0, "End": 2.5, "Speaker": 0, "Content": "..."}.
+Only Start and End are needed here; Speaker is matched across windows when
+present, and everything else is passed through untouched.
+"""
+
+import json
+
+Segment = dict[str, object]
+Speaker = int | str
+
+
+def parse_segments(text: str) -> list[Segment] | None:
+    """The segments in a model output, or None if it is not a JSON list of objects."""
+    try:
+        parsed: object = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parsed, list):
+        return None
+    segments: list[Segment] = []
+    for item in parsed:
+        if not isinstance(item, dict):
+            return None
+        segments.append(item)
+    return segments
+
+
+class SegmentScanner:
+    """Follows a segment list as it streams in, to know how much of it is complete.
+
+    `complete` is the length of the text up to the end of the last complete
+    segment, or of the list once it is closed.
+    """
+
+    def __init__(self) -> None:
+        self.complete = 0
+        self._length = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> None:
+        for index, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth <= 1:
+                    self.complete = self._length + index + 1
+        self._length += len(text)
+
+
+class SegmentParser:
+    """Parses a segment list as it streams in, returning each segment once it is complete.
+
+    With `resumed` the text is taken to start inside the list, right after
+    a complete segment, as a stream resumed from a chunk id does. The first
+    problem found is described in `error`, which reads as a predicate of
+    "the output", and nothing is parsed after it.
+    """
+
+    def __init__(self, resumed: bool = False) -> None:
+        self.error: str | None = None
+        self._scanner = SegmentScanner()
+        self._opened = resumed
+        self._closed = False
+        self._count = 0
+        # Whether the next segment must be preceded by a comma
+        self._after_segment = resumed
+        # Text after the last complete segment, and where it starts in the whole output
+        self._pending: list[str] = []
+        self._pending_start = 0
+        if resumed:
+            self._scanner.feed("[")
+            self._pending_start = 1
+
+    def feed(self, text: str) -> list[Segment]:
+        """Take the next piece of output; return the segments it completes."""
+        if self.error is not None or not text:
+            return []
+        if self._closed:
+            if text.strip():
+                self.error = "goes on after the end of the segment list"
+            return []
+        self._scanner.feed(text)
+        self._pending.append(text)
+        complete = self._scanner.complete
+        if complete <= self._pending_start:
+            return []
+        joined = "".join(self._pending)
+        cut = complete - self._pending_start
+        piece, rest = joined[:cut], joined[cut:]
+        self._pending = [rest] if rest else []
+        self._pending_start = complete
+        segments = self._parse(piece)
+        if self._closed and rest.strip():
+            self.error = "goes on after the end of the segment list"
+        return segments
+
+    def finish(self) -> None:
+        """Note the end of the output, which is an error if the list is still open."""
+        if self.error is None and not self._closed:
+            self.error = "ends inside the segment list" if self._opened else "is not a JSON list"
+
+    def _parse(self, piece: str) -> list[Segment]:
+        body = piece.strip()
+        if not self._opened:
+            if not body.startswith("["):
+                self.error = "is not a JSON list"
+                return []
+            body = body[1:].lstrip()
+            self._opened = True
+        if body.endswith("]"):
+            body = body[:-1].rstrip()
+            self._closed = True
+        # The pieces are parsed on their own, so check the commas between them here.
+        if self._after_segment and body:
+            if not body.startswith(","):
+                self.error = f"is not valid JSON: no comma before segment[{self._count}]"
+                return []
+            body = body[1:]
+            if not body.strip():
+                self.error = f"is not valid JSON: stray comma after {self._count} segments"
+                return []
+        elif body.startswith(","):
+            self.error = f"is not valid JSON: stray comma after {self._count} segments"
+            return []
+        self._after_segment = True
+        try:
+            parsed: object = json.loads(f"[{body}]")
+        except json.JSONDecodeError as exc:
+            self.error = f"is not valid JSON: {exc}"
+            return []
+        assert isinstance(parsed, list), f"Expected a list, got: {parsed!r}"
+        segments: list[Segment] = []
+        for item in parsed:
+            if not isinstance(item, dict):
+                self.error = (
+                    f"has segment[{self._count}] of type {type(item).__name__}, expected object"
+                )
+                return segments
+            if "Content" not in item:
+                self.error = f"has segment[{self._count}] without Content, keys={list(item)}"
+                return segments
+            segments.append(item)
+            self._count += 1
+        return segments
+
+
+def segment_time(segment: Segment, key: str) -> float | None:
+    value = segment.get(key)
+    if isinstance(value, bool) or not isinstance(value, int | float):
+        return None
+    return float(value)
+
+
+class WindowStitcher:
+    """Joins the transcripts of consecutive, overlapping windows into one segment list.
+
+    Each window's times are shifted to whole-audio time. Its segments in
+    the overlap with the previous window, which repeat what that window
+    already covered, are dropped, but first used to match speakers: the
+    pair of IDs that talk at the same time longest is taken to be the same
+    person, then the next pair, and so on. A speaker not heard in the
+    overlap keeps its ID unless another speaker was mapped to it. Then it
+    becomes the first speaker of the previous window left unmatched, and
+    failing that, a new ID.
+    """
+
+    def __init__(self) -> None:
+        self._previous: list[Segment] = []
+        self._speakers: set[Speaker] = set()
+
+    def add(self, segments: list[Segment], start: float, overlap: float) -> list[Segment]:
+        """Take the next window's segments; return the new ones, in whole-audio time."""
+        shifted = [_shifted(segment, start) for segment in segments]
+        boundary = start + overlap
+        mapping = self._match_speakers(shifted, boundary)
+        relabelled = [_relabelled(segment, mapping) for segment in shifted]
+        self._previous = relabelled
+        self._speakers.update(
+            speaker for segment in relabelled if (speaker := segment_speaker(segment)) is not None
+        )
+        return [segment for segment in relabelled if _midpoint(segment) >= boundary]
+
+    def _match_speakers(self, segments: list[Segment], boundary: float) -> dict[Speaker, Speaker]:
+        shared: dict[tuple[Speaker, Speaker], float] = {}
+        for segment in segments:
+            speaker = segment_speaker(segment)
+            if speaker is None or _midpoint(segment) >= boundary:
+                continue
+            for earlier in self._previous:
+                earlier_speaker = segment_speaker(earlier)
+                if earlier_speaker is None:
+                    continue
+                together = _overlap(segment, earlier)
+                if together > 0:
+                    key = (speaker, earlier_speaker)
+                    shared[key] = shared.get(key, 0.0) + together
+
+        mapping: dict[Speaker, Speaker] = {}
+        taken: set[Speaker] = set()
+        for (speaker, earlier_speaker), _ in sorted(shared.items(), key=lambda item: -item[1]):
+            if speaker not in mapping and earlier_speaker not in taken:
+                mapping[speaker] = earlier_speaker
+                taken.add(earlier_speaker)
+        unmatched = [
+            speaker
+            for earlier in self._previous
+            if (speaker := segment_speaker(earlier)) is not None and speaker not in taken
+        ]
+        for segment in segments:
+            speaker = segment_speaker(segment)
+            if speaker is None or speaker in mapping:
+                continue
+            if speaker not in taken:
+                mapping[speaker] = speaker
+            elif left := [s for s in unmatched if s not in taken]:
+                mapping[speaker] = left[0]
+            else:
+                used = [s for s in self._speakers | taken if isinstance(s, int)]
+                mapping[speaker] = max(used, default=-1) + 1
+            taken.add(mapping[speaker])
+        return mapping
+
+
+def segment_speaker(segment: Segment) -> Speaker | None:
+    speaker = segment.get("Speaker")
+    if isinstance(speaker, bool) or not isinstance(speaker, int | str):
+        return None
+    return speaker
+
+
+def _shifted(segment: Segment, offset: float) -> Segment:
+    shifted = dict(segment)
+    for key in ("Start", "End"):
+        value = segment_time(segment, key)
+        if value is not None:
+            shifted[key] = value + offset
+    return shifted
+
+
+def _relabelled(segment: Segment, mapping: dict[Speaker, Speaker]) -> Segment:
+    speaker = segment_speaker(segment)
+    if speaker is None or speaker not in mapping:
+        return segment
+    return {**segment, "Speaker": mapping[speaker]}
+
+
+def _midpoint(segment: Segment) -> float:
+    start = segment_time(segment, "Start")
+    end = segment_time(segment, "End")
+    if start is None:
+        # Without times there is no telling; keep it.
+        return float("inf")
+    return start if end is None else (start + end) / 2
+
+
+def _overlap(a: Segment, b: Segment) -> float:
+    a_start, a_end = segment_time(a, "Start"), segment_time(a, "End")
+    b_start, b_end = segment_time(b, "Start"), segment_time(b, "End")
+    if a_start is None or a_end is None or b_start is None or b_end is None:
+        return 0.0
+    return min(a_end, b_end) - max(a_start, b_start)
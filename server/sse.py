@@ -0,0 +1,116 @@
+"""Reading vLLM's server-sent event stream straight from the response bytes.
+
+vLLM sends one event per token, so per-event overhead adds up across
+sequences in flight. Events are split on the raw bytes, never building a
+string per line. A token's text is sliced straight out of vLLM's compact
+JSON when it holds no escapes; otherwise the chunk is decoded with orjson
+or msgspec when one is installed, falling back to the standard library.
+"""
+
+import importlib
+import json
+from collections.abc import AsyncGenerator, AsyncIterable, Callable
+from dataclasses import dataclass
+
+# How vLLM serialises a single choice's content delta.
+_CONTENT_PREFIX = b'"delta":{"content":"'
+
+
+@dataclass(frozen=True)
+class JsonDecoder:
+    name: str
+    loads: Callable[[bytes], object]
+    # What `loads` raises on malformed input
+    errors: tuple[type[Exception], ...]
+
+
+def _stdlib_loads(data: bytes) -> object:
+    # Faster than handing json.loads bytes, which it first sniffs for an encoding.
+    return json.loads(data.decode())
+
+
+def available_decoders() -> list[JsonDecoder]:
+    """The JSON decoders installed, fastest first; the standard library's is always last."""
+    decoders: list[JsonDecoder] = []
+    try:
+        orjson = importlib.import_module("orjson")
+    except ImportError:
+        pass
+    else:
+        decoders.append(JsonDecoder("orjson", orjson.loads, (ValueError,)))
+    try:
+        msgspec = importlib.import_module("msgspec")
+        msgspec_json = importlib.import_module("msgspec.json")
+    except ImportError:
+        pass
+    else:
+        decoders.append(JsonDecoder("msgspec", msgspec_json.decode, (msgspec.DecodeError,)))
+    decoders.append(JsonDecoder("json", _stdlib_loads, (ValueError,)))
+    return decoders
+
+
+DECODER = available_decoders()[0]
+
+
+async def sse_data(chunks: AsyncIterable[bytes]) -> AsyncGenerator[bytes, None]:
+    """The data of each event in an SSE byte stream, multi-line data joined with newlines.
+
+    Events without data are skipped. An event cut off by the end of the
+    stream is still passed on.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        if buffer:
+            chunk = buffer + chunk
+        if b"\r" in chunk:
+            # A CRLF split across chunks is joined by now; a lone CR is left as is.
+            chunk = chunk.replace(b"\r\n", b"\n")
+        *events, buffer = chunk.split(b"\n\n")
+        for event in events:
+            # vLLM's events are a single data line.
+            if event.startswith(b"data: ") and b"\n" not in event:
+                yield event[6:]
+            elif (data := _event_data(event)) is not None:
+                yield data
+    if buffer.strip() and (data := _event_data(buffer.rstrip(b"\n"))) is not None:
+        yield data
+
+
+def delta_content(data: bytes, decoder: JsonDecoder = DECODER) -> str | None:
+    """choices[0].delta.content of a chat completion chunk, or None if it has none."""
+    start = data.find(_CONTENT_PREFIX)
+    if start >= 0 and data.find(b'"delta"', start + 1) < 0:
+        start += len(_CONTENT_PREFIX)
+        end = data.find(b'"', start)
+        # Without a backslash the first quote ends the string, and its bytes are the text.
+        if end >= 0 and data.find(b"\\", start, end) < 0:
+            try:
+                return data[start:end].decode()
+            except UnicodeDecodeError:
+                return None
+    # Role-only, finish and usage chunks carry no content; skip decoding them.
+    if b'"content"' not in data:
+        return None
+    try:
+        chunk = decoder.loads(data)
+    except decoder.errors:
+        return None
+    if not isinstance(chunk, dict):
+        return None
+    choices = chunk.get("choices")
+    if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+        return None
+    delta = choices[0].get("delta")
+    if not isinstance(delta, dict):
+        return None
+    content = delta.get("content")
+    return content if isinstance(content, str) else None
+
+
+def _event_data(event: bytes) -> bytes | None:
+    lines = [_field_value(line[5:]) for line in event.split(b"\n") if line.startswith(b"data:")]
+    return b"\n".join(lines) if lines else None
+
+
+def _field_value(value: bytes) -> bytes:
+    return value[1:] if value.startswith(b" ") else value
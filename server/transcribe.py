@@ -1,115 +1,704 @@
+from __future__ import annotations
+
+import asyncio
 import json
+import logging
+import math
+import re
+import time
+from collections.abc import AsyncGenerator, Callable
+from contextlib import aclosing
+from functools import partial
 
 import httpx
 
+from server.audio import FfmpegPool, suffix_for_mime
+from server.audio_buffer import AudioBuffer, AudioExport
+from server.audio_normalize import normalize_audio
+from server.audio_split import AudioWindow, audio_from, split_at_pauses
+from server.audio_trim import OffsetMap, trim_silence
+from server.backend_pool import BackendPool, NoBackendAvailableError, VllmBackend
 from server.config import Settings
 from server.groq_client import transcribe_audio
-from server.models import JobStatus
-from server.queue import TranscriptionJob
+from server.models import JobPriority, JobStatus
+from server.queue import (
+    AUDIO_TOKENS_PER_SECOND,
+    OUTPUT_TOKENS_PER_SECOND,
+    PROMPT_OVERHEAD_TOKENS,
+    TranscriptionJob,
+)
+from server.repetition import LOOP_WINDOW_CHARS, ends_in_loop
+from server.segments import (
+    Segment,
+    SegmentParser,
+    SegmentScanner,
+    WindowStitcher,
+    parse_segments,
+    segment_time,
+)
 from server.vllm_client import stream_transcription
 
+logger = logging.getLogger(__name__)
+
+# vLLM's priority scheduler runs lower values first.
+VLLM_PRIORITIES = {JobPriority.INTERACTIVE: -1, JobPriority.NORMAL: 0, JobPriority.BATCH: 1}
+# Sampling for each retry after the model gets stuck repeating itself, as VibeVoice's own
+# recovery script does; the configured temperature is kept if it is higher.
+_RECOVERY_SAMPLING = ((0.2, 0.95), (0.3, 0.95), (0.4, 0.95))
+# Output is cut off at this multiple of its expected length, so only a runaway generation
+# gets there; for long audio the model's context, less prompt and audio, cuts it off first.
+_MAX_TOKENS_FACTOR = 6
+_MIN_MAX_TOKENS = 512
+# Times a failed transcription is picked up again after its last complete segment.
+_MAX_RESUMES = 2
+# How much of a bad output goes into its error message.
+_OUTPUT_PREVIEW_CHARS = 500
+# A segment's "Start" or "End" with its whole number, known complete by what follows it.
+_SEGMENT_TIME = re.compile(r'("(Start|End)"\s*:\s*)(-?\d+(?:\.\d+)?)(?![\d.])')
+# Text from a quote onwards that may still grow into a _SEGMENT_TIME match.
+_PARTIAL_SEGMENT_TIME = re.compile(
+    r'"(?:S(?:t(?:a(?:r(?:t)?)?)?)?|E(?:n(?:d)?)?)?|"(?:Start|End)"\s*(?::\s*-?[\d.]*)?'
+)
+
 
 async def process_vibevoice_job(
     job: TranscriptionJob,
     http_client: httpx.AsyncClient,
     config: Settings,
+    backends: BackendPool,
+    ffmpeg: FfmpegPool,
 ) -> None:
-    """Worker function that processes a job via local vLLM VibeVoice."""
-    accumulated = []
-    first_chunk = True
-    async for chunk in stream_transcription(
-        http_client=http_client,
-        vllm_base_url=config.vllm_base_url,
-        model_name=config.vllm_model_name,
-        audio_base64=job.audio_base64,
-        audio_mime=job.audio_mime,
-        audio_duration=job.audio_duration_seconds,
-        hotwords=job.hotwords,
-        temperature=config.vllm_temperature,
-        top_p=config.vllm_top_p,
-    ):
-        if first_chunk:
-            job.status = JobStatus.STREAMING
-            first_chunk = False
-        accumulated.append(chunk)
-        await job.chunk_queue.put(chunk)
-
-    # Validate that model output is the expected JSON segment format.
-    # Clients depend on [{"Start":..,"End":..,"Content":..},...] structure.
-    raw = "".join(accumulated)
-    _validate_vibevoice_output(raw, job)
+    """Worker function that processes a job via local vLLM VibeVoice.
+
+    With --trim-silence long pauses are cut out first, and the segment
+    times vLLM streams back are mapped to the original audio on the way
+    through. With --normalize-audio the audio is then shrunk to 24 kHz
+    mono. With --vllm-window-seconds, audio longer than a window is split
+    at pauses into windows that are transcribed concurrently: the first
+    streams live, and each later one is stitched on once those before it
+    are done. See _resumable for how a transcription that breaks off is
+    picked up again, _transcribe for how a runaway generation is recovered
+    from, and _generate for how a request reaches a backend.
+    """
+    offsets = await _trim(job, config, ffmpeg) if config.trim_silence else None
+    duration = job.audio_duration_seconds if offsets is None else offsets.duration
+    if config.normalize_audio:
+        await _normalize(job, config, ffmpeg, duration)
+    windows = None
+    if config.vllm_window_seconds:
+        windows = await _split(job, config, ffmpeg, duration)
+    remapper = None if offsets is None else _SegmentTimeRemapper(offsets.to_original)
+    # Clients depend on the [{"Start":..,"End":..,"Content":..},...] structure.
+    check = _OutputCheck()
+
+    if windows is None:
+        async with aclosing(
+            _resumable(
+                job, job.audio, job.audio_mime, duration, http_client, config, backends, ffmpeg
+            )
+        ) as chunks:
+            async for chunk in chunks:
+                job.status = JobStatus.STREAMING
+                text = chunk if remapper is None else remapper.feed(chunk)
+                if text:
+                    check.feed(text)
+                    await job.chunk_stream.put(text)
+        if remapper is not None and (tail := remapper.flush()):
+            check.feed(tail)
+            await job.chunk_stream.put(tail)
+    else:
+        await _stream_windows(
+            job, windows, offsets, remapper, check, http_client, config, backends, ffmpeg
+        )
+
+    # The data chunks are already streamed to the client, so the error event
+    # arrives after them: the client gets both the raw output and the diagnosis.
+    job.error_message = check.error(job)
 
     # Signal end of stream
-    await job.chunk_queue.put(None)
+    await job.chunk_stream.put(None)
 
 
-def _validate_vibevoice_output(raw: str, job: TranscriptionJob) -> None:
-    """Validate VibeVoice model output is parseable JSON segments.
+async def _resumable(
+    job: TranscriptionJob,
+    audio: AudioBuffer,
+    audio_mime: str,
+    duration: float,
+    http_client: httpx.AsyncClient,
+    config: Settings,
+    backends: BackendPool,
+    ffmpeg: FfmpegPool,
+) -> AsyncGenerator[str, None]:
+    """Stream the output for `audio`, picking up after the last good segment if it breaks off.
 
-    Sets job.error_message with full diagnostic context if validation fails.
-    The data chunks are already streamed to the client, so the error event
-    arrives after the data — giving the client both the raw output and the
-    diagnosis.
+    If a transcription fails after streaming at least one segment, the
+    audio from that segment's End onwards is cut out and transcribed in
+    turn; its times are shifted to match and its segments spliced onto
+    the same list, up to _MAX_RESUMES times. Anything else is raised.
     """
-    trimmed = raw.strip()
-    if not trimmed:
-        job.error_message = (
-            "VibeVoice model returned empty output. "
-            f"audio_duration={job.audio_duration_seconds:.2f}s, "
-            f"audio_mime={job.audio_mime}"
+    source = AudioWindow(audio, audio_mime, start=0.0, duration=duration, overlap=0.0)
+    checkpoint: float | None = None
+    resumes = 0
+    try:
+        while True:
+            shift = None
+            if resumes:
+                shift = _SegmentTimeRemapper(partial(_shifted_time, offset=source.start))
+            streamed = spliced = False
+            try:
+                async with aclosing(
+                    _transcribe(
+                        job,
+                        source.audio,
+                        source.mime,
+                        source.duration,
+                        http_client,
+                        config,
+                        backends,
+                    )
+                ) as chunks:
+                    async for chunk in chunks:
+                        streamed = True
+                        text = chunk if shift is None else shift.feed(chunk)
+                        if shift is not None and not spliced and text.strip():
+                            # The list was opened before; carry it on.
+                            body = text.lstrip().removeprefix("[").lstrip()
+                            text = ", " + body if body.startswith("{") else body
+                            spliced = True
+                        for match in _SEGMENT_TIME.finditer(text):
+                            if match[2] == "End":
+                                checkpoint = float(match[3])
+                        yield text
+                if shift is not None and (tail := shift.flush()):
+                    yield tail
+                return
+            except (OSError, RuntimeError, httpx.HTTPError) as exc:
+                if not streamed or checkpoint is None or resumes == _MAX_RESUMES:
+                    raise
+                failure = exc
+            resumes += 1
+            logger.warning(
+                "Job %s transcription broke off (%s); resuming from %.2fs",
+                job.job_id[:8],
+                failure,
+                checkpoint,
+            )
+            try:
+                rest = await audio_from(
+                    audio, audio_mime, checkpoint, ffmpeg, config.audio_spool_dir
+                )
+            except (OSError, RuntimeError, ValueError) as exc:
+                logger.warning("Cannot cut job %s audio to resume: %s", job.job_id[:8], exc)
+                raise failure from None
+            if source.audio is not audio:
+                source.audio.wipe()
+            source = rest
+    finally:
+        if source.audio is not audio:
+            source.audio.wipe()
+
+
+def _shifted_time(seconds: float, end: bool, offset: float) -> float:
+    return seconds + offset
+
+
+async def _transcribe(
+    job: TranscriptionJob,
+    audio: AudioBuffer,
+    audio_mime: str,
+    duration: float,
+    http_client: httpx.AsyncClient,
+    config: Settings,
+    backends: BackendPool,
+) -> AsyncGenerator[str, None]:
+    """Stream the model's output for `audio`, a complete segment at a time.
+
+    Text is held back until the segment it is part of is complete. If the
+    model starts repeating itself, the request is aborted, the incomplete
+    segment dropped, and the model asked to go on from the last complete
+    one at the next _RECOVERY_SAMPLING setting; once those run out a
+    RuntimeError is raised. See _generate for how a request reaches a
+    backend.
+    """
+    expected_tokens = duration * OUTPUT_TOKENS_PER_SECOND
+    output_cap = max(_MIN_MAX_TOKENS, math.ceil(expected_tokens * _MAX_TOKENS_FACTOR))
+    context_room = (
+        config.vllm_max_model_len
+        - PROMPT_OVERHEAD_TOKENS
+        - math.ceil(duration * AUDIO_TOKENS_PER_SECOND)
+    )
+    # vLLM sends a token per chunk; every chunk received counts, kept or not.
+    generated_tokens = 0
+    sampling = [
+        (config.vllm_temperature, config.vllm_top_p),
+        *((max(t, config.vllm_temperature), p) for t, p in _RECOVERY_SAMPLING),
+    ]
+    kept: list[str] = []
+    scanner = SegmentScanner()
+    for attempt, (temperature, top_p) in enumerate(sampling):
+        if attempt:
+            logger.warning(
+                "Job %s output started repeating itself; retrying after %d characters "
+                "at temperature %.1f",
+                job.job_id[:8],
+                scanner.complete,
+                temperature,
+            )
+        sent = scanner.complete
+        pending: list[str] = []
+        tail = ""
+        looped = False
+        async with aclosing(
+            _generate(
+                job,
+                audio,
+                audio_mime,
+                duration,
+                http_client,
+                config,
+                backends,
+                temperature=temperature,
+                top_p=top_p,
+                # A continuation takes up context too.
+                max_tokens=max(1, min(output_cap, context_room - generated_tokens)),
+                continuation="".join(kept),
+            )
+        ) as chunks:
+            async for chunk in chunks:
+                generated_tokens += 1
+                pending.append(chunk)
+                scanner.feed(chunk)
+                tail = (tail + chunk)[-LOOP_WINDOW_CHARS:]
+                if ends_in_loop(tail):
+                    looped = True
+                    break
+                if scanner.complete > sent:
+                    text = "".join(pending)
+                    done, rest = text[: scanner.complete - sent], text[scanner.complete - sent :]
+                    kept.append(done)
+                    yield done
+                    sent = scanner.complete
+                    pending = [rest] if rest else []
+        if not looped:
+            if pending:
+                yield "".join(pending)
+            return
+        # Carry on from the last complete segment, with a scanner that has seen only that.
+        scanner = SegmentScanner()
+        scanner.feed("".join(kept))
+    raise RuntimeError(
+        f"VibeVoice output kept repeating itself after {len(_RECOVERY_SAMPLING)} retries: "
+        f"output_tail={tail!r}"
+    )
+
+
+async def _generate(
+    job: TranscriptionJob,
+    audio: AudioBuffer,
+    audio_mime: str,
+    duration: float,
+    http_client: httpx.AsyncClient,
+    config: Settings,
+    backends: BackendPool,
+    *,
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    continuation: str,
+) -> AsyncGenerator[str, None]:
+    """Stream one request's output for `audio`, chunk by chunk.
+
+    The request goes to the least-loaded healthy backend. If that backend
+    fails before producing the first chunk, the request is re-dispatched to
+    another one; after that, a failure is raised. With --vllm-media-dir, a
+    loopback backend gets a file:// URL of a copy of the audio, removed as
+    soon as the first chunk shows vLLM has loaded it.
+    """
+    received = 0
+    tried: set[str] = set()
+    last_error: Exception | None = None
+    export: AudioExport | None = None
+    try:
+        while True:
+            try:
+                backend = backends.acquire(exclude=frozenset(tried))
+            except NoBackendAvailableError:
+                if last_error is not None:
+                    raise last_error from None
+                raise
+            tried.add(backend.base_url)
+            if export is None:
+                export = await _export_for(job, audio, audio_mime, backend, config)
+            ok: bool | None = None
+            first_chunk_at = 0.0
+            try:
+                # Closed at once if the caller stops early, so vLLM stops generating too.
+                async with aclosing(
+                    stream_transcription(
+                        http_client=http_client,
+                        vllm_base_url=backend.base_url,
+                        model_name=config.vllm_model_name,
+                        audio=audio,
+                        audio_mime=audio_mime,
+                        audio_duration=duration,
+                        hotwords=job.hotwords,
+                        temperature=temperature,
+                        top_p=top_p,
+                        max_tokens=max_tokens,
+                        stall_timeout=config.vllm_stall_timeout_seconds,
+                        priority=(
+                            VLLM_PRIORITIES[job.priority]
+                            if config.vllm_priority_scheduling
+                            else None
+                        ),
+                        audio_url=export.url if export is not None and backend.local else None,
+                        continuation=continuation,
+                    )
+                ) as chunks:
+                    async for chunk in chunks:
+                        if not received:
+                            first_chunk_at = time.monotonic()
+                            if export is not None:
+                                export.remove()
+                        received += 1
+                        yield chunk
+                ok = True
+            except Exception as exc:
+                ok = False
+                if received:
+                    raise
+                logger.warning(
+                    "Job %s failed on %s before its first chunk: %s",
+                    job.job_id[:8],
+                    backend.base_url,
+                    exc,
+                )
+                last_error = exc
+                continue
+            finally:
+                # vLLM streams one token per delta, so chunks stand in for tokens.
+                decode_seconds = time.monotonic() - first_chunk_at if received else 0.0
+                backends.release(backend, ok, received, decode_seconds)
+            break
+    finally:
+        if export is not None:
+            export.remove()
+
+
+async def _stream_windows(
+    job: TranscriptionJob,
+    windows: list[AudioWindow],
+    offsets: OffsetMap | None,
+    remapper: _SegmentTimeRemapper | None,
+    check: _OutputCheck,
+    http_client: httpx.AsyncClient,
+    config: Settings,
+    backends: BackendPool,
+    ffmpeg: FfmpegPool,
+) -> None:
+    """Transcribe all windows at once and stream their segments as one list, in order.
+
+    The first window's output is passed through as it arrives, less its
+    closing bracket. Each later window is parsed once complete, shifted
+    and stitched on by WindowStitcher. Everything streamed goes through
+    `check`.
+    """
+    first, rest = windows[0], windows[1:]
+    pending = [
+        asyncio.create_task(_window_text(job, window, http_client, config, backends, ffmpeg))
+        for window in rest
+    ]
+
+    async def put(text: str) -> None:
+        job.status = JobStatus.STREAMING
+        check.feed(text)
+        await job.chunk_stream.put(text)
+
+    try:
+        accumulated: list[str] = []
+        held = ""
+        try:
+            async with aclosing(
+                _resumable(
+                    job,
+                    first.audio,
+                    first.mime,
+                    first.duration,
+                    http_client,
+                    config,
+                    backends,
+                    ffmpeg,
+                )
+            ) as chunks:
+                async for chunk in chunks:
+                    accumulated.append(chunk)
+                    text = held + (chunk if remapper is None else remapper.feed(chunk))
+                    # The list goes on after this window; hold back what may be its end.
+                    cut = len(text.rstrip())
+                    if text[:cut].endswith("]"):
+                        cut -= 1
+                    held = text[cut:]
+                    if text[:cut]:
+                        await put(text[:cut])
+        finally:
+            first.audio.wipe()
+        tail = (held + ("" if remapper is None else remapper.flush())).rstrip()
+        tail = tail.removesuffix("]")
+        if tail:
+            await put(tail)
+
+        stitcher = WindowStitcher()
+        first_segments = parse_segments("".join(accumulated))
+        stitcher.add(first_segments or [], first.start, first.overlap)
+        # Output that did not parse was streamed as is; the validation will report it.
+        any_segments = first_segments is None or bool(first_segments)
+        for window, task in zip(rest, pending, strict=True):
+            text = await task
+            segments = parse_segments(text)
+            if segments is None:
+                raise RuntimeError(
+                    f"VibeVoice output for the window at {window.start:.1f}s is not a JSON "
+                    f"segment list: output_preview={text[:500]!r}"
+                )
+            added = stitcher.add(segments, window.start, window.overlap)
+            if added:
+                body = ", ".join(json.dumps(_in_original_time(s, offsets)) for s in added)
+                await put(", " + body if any_segments else body)
+                any_segments = True
+        await put("]")
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _window_text(
+    job: TranscriptionJob,
+    window: AudioWindow,
+    http_client: httpx.AsyncClient,
+    config: Settings,
+    backends: BackendPool,
+    ffmpeg: FfmpegPool,
+) -> str:
+    try:
+        async with aclosing(
+            _resumable(
+                job,
+                window.audio,
+                window.mime,
+                window.duration,
+                http_client,
+                config,
+                backends,
+                ffmpeg,
+            )
+        ) as chunks:
+            return "".join([chunk async for chunk in chunks])
+    finally:
+        window.audio.wipe()
+
+
+def _in_original_time(segment: Segment, offsets: OffsetMap | None) -> Segment:
+    mapped = dict(segment)
+    for key in ("Start", "End"):
+        value = segment_time(segment, key)
+        if value is None:
+            continue
+        if offsets is not None:
+            value = offsets.to_original(value, end=key == "End")
+        mapped[key] = round(value, 2)
+    return mapped
+
+
+class _SegmentTimeRemapper:
+    """Rewrites Start/End values in streamed segment JSON, e.g. from trimmed to original time.
+
+    `remap` takes a time and whether it is an End. Text that might be the
+    beginning of a time is held back until the next chunk shows where it
+    ends.
+    """
+
+    def __init__(self, remap: Callable[[float, bool], float]) -> None:
+        self._remap_time = remap
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        hold = len(text)
+        last_quote = text.rfind('"')
+        # A partial time starts at its key's opening quote: the last quote, or the one before.
+        for quote in (text.rfind('"', 0, last_quote), last_quote):
+            if quote >= 0 and _PARTIAL_SEGMENT_TIME.fullmatch(text, quote):
+                hold = quote
+                break
+        self._pending = text[hold:]
+        return _SEGMENT_TIME.sub(self._remap, text[:hold])
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return _SEGMENT_TIME.sub(self._remap, text)
+
+    def _remap(self, match: re.Match[str]) -> str:
+        seconds = self._remap_time(float(match[3]), match[2] == "End")
+        return f"{match[1]}{seconds:.2f}"
+
+
+async def _trim(job: TranscriptionJob, config: Settings, ffmpeg: FfmpegPool) -> OffsetMap | None:
+    """Swap the job's audio for a copy without long silences, keeping the original on failure."""
+    original = job.audio
+    try:
+        trimmed = await trim_silence(original, job.audio_mime, ffmpeg, config.audio_spool_dir)
+    except (OSError, RuntimeError, ValueError) as exc:
+        logger.warning("Cannot trim job %s audio, sending it whole: %s", job.job_id[:8], exc)
+        return None
+    if trimmed is None:
+        job.trimmed_seconds = 0.0
+        return None
+    job.audio = trimmed.audio
+    job.audio_mime = trimmed.mime
+    job.trimmed_seconds = trimmed.offsets.trimmed_seconds
+    original.wipe()
+    logger.info(
+        "Job %s silence trimmed: %.1f -> %.1f s",
+        job.job_id[:8],
+        trimmed.offsets.original_duration,
+        trimmed.offsets.duration,
+    )
+    return trimmed.offsets
+
+
+async def _normalize(
+    job: TranscriptionJob, config: Settings, ffmpeg: FfmpegPool, duration: float
+) -> None:
+    """Swap the job's audio for its 24 kHz mono version, keeping the original on failure."""
+    original = job.audio
+    try:
+        normalized = await normalize_audio(
+            original, job.audio_mime, duration, ffmpeg, config.audio_spool_dir
         )
+    except (OSError, RuntimeError, ValueError) as exc:
+        logger.warning("Cannot normalize job %s audio, sending it as is: %s", job.job_id[:8], exc)
         return
+    if normalized is None:
+        return
+    job.audio = normalized.audio
+    job.audio_mime = normalized.mime
+    job.audio_bytes_saved = original.size - normalized.audio.size
+    original.wipe()
+    logger.info(
+        "Job %s audio normalized to %s: %d -> %d bytes",
+        job.job_id[:8],
+        normalized.mime,
+        original.size,
+        normalized.audio.size,
+    )
 
+
+async def _split(
+    job: TranscriptionJob, config: Settings, ffmpeg: FfmpegPool, duration: float
+) -> list[AudioWindow] | None:
+    """Cut the job's audio into windows, or None to send it whole, as on failure."""
     try:
-        parsed = json.loads(trimmed)
-    except json.JSONDecodeError as e:
-        preview = trimmed[:500]
-        job.error_message = (
-            f"VibeVoice model output is not valid JSON: {e}. "
-            f"audio_duration={job.audio_duration_seconds:.2f}s, "
-            f"output_length={len(trimmed)}, "
-            f"output_preview={preview!r}"
+        windows = await split_at_pauses(
+            job.audio,
+            job.audio_mime,
+            duration,
+            config.vllm_window_seconds,
+            ffmpeg,
+            config.audio_spool_dir,
         )
-        return
+    except (OSError, RuntimeError, ValueError) as exc:
+        logger.warning("Cannot split job %s audio, sending it whole: %s", job.job_id[:8], exc)
+        return None
+    if windows is not None:
+        logger.info(
+            "Job %s split into %d windows: %s",
+            job.job_id[:8],
+            len(windows),
+            ", ".join(f"{w.start:.0f}+{w.duration:.0f}s" for w in windows),
+        )
+    return windows
 
-    if not isinstance(parsed, list):
-        job.error_message = (
-            f"VibeVoice model output is {type(parsed).__name__}, expected list. "
-            f"audio_duration={job.audio_duration_seconds:.2f}s, "
-            f"output_preview={trimmed[:500]!r}"
+
+async def _export_for(
+    job: TranscriptionJob,
+    audio: AudioBuffer,
+    audio_mime: str,
+    backend: VllmBackend,
+    config: Settings,
+) -> AudioExport | None:
+    """Copy the audio into --vllm-media-dir if this backend can read it from there."""
+    if not config.vllm_media_dir or not backend.local:
+        return None
+    try:
+        return await audio.export(config.vllm_media_dir, suffix_for_mime(audio_mime))
+    except OSError as exc:
+        logger.warning(
+            "Cannot write job %s audio to %s, sending it inline: %s",
+            job.job_id[:8],
+            config.vllm_media_dir,
+            exc,
         )
-        return
+        return None
 
-    for i, seg in enumerate(parsed):
-        if not isinstance(seg, dict):
-            job.error_message = (
-                f"VibeVoice segment[{i}] is {type(seg).__name__}, expected object. "
-                f"output_preview={trimmed[:500]!r}"
-            )
-            return
-        if "Content" not in seg:
-            job.error_message = (
-                f"VibeVoice segment[{i}] missing 'Content' key. "
-                f"keys={list(seg.keys())}, "
-                f"output_preview={trimmed[:500]!r}"
+
+class _OutputCheck:
+    """Validates the VibeVoice output as it streams, one complete segment at a time."""
+
+    def __init__(self) -> None:
+        self._parser = SegmentParser()
+        self._length = 0
+        self._preview = ""
+        self._blank = True
+
+    def feed(self, text: str) -> None:
+        self._parser.feed(text)
+        self._length += len(text)
+        if len(self._preview) < _OUTPUT_PREVIEW_CHARS:
+            self._preview = (self._preview + text)[:_OUTPUT_PREVIEW_CHARS]
+        self._blank = self._blank and not text.strip()
+
+    def error(self, job: TranscriptionJob) -> str | None:
+        """What is wrong with the output once it has all streamed, with diagnostic context."""
+        if self._blank:
+            return (
+                "VibeVoice model returned empty output. "
+                f"audio_duration={job.audio_duration_seconds:.2f}s, "
+                f"audio_mime={job.audio_mime}"
             )
-            return
+        self._parser.finish()
+        if self._parser.error is None:
+            return None
+        return (
+            f"VibeVoice model output {self._parser.error}. "
+            f"audio_duration={job.audio_duration_seconds:.2f}s, "
+            f"output_length={self._length}, "
+            f"output_preview={self._preview.lstrip()!r}"
+        )
 
 
 async def process_groq_job(
     job: TranscriptionJob,
     http_client: httpx.AsyncClient,
     config: Settings,
+    ffmpeg: FfmpegPool,
 ) -> None:
-    """Worker function that processes a job via Groq Whisper API."""
+    """Worker function that processes a job via Groq Whisper API.
+
+    With --trim-silence long pauses are cut out before the upload. The
+    transcript still spans the whole original duration.
+    """
+    if config.trim_silence:
+        await _trim(job, config, ffmpeg)
     job.status = JobStatus.STREAMING
     text = await transcribe_audio(
         http_client=http_client,
         api_key=config.groq_api_key,
         model_name=config.groq_model_name,
-        audio_base64=job.audio_base64,
+        audio=job.audio,
         audio_mime=job.audio_mime,
         hotwords=job.hotwords,
+        ffmpeg=ffmpeg,
     )
     if text:
         # Wrap in the same JSON segment format that VibeVoice produces,
@@ -117,7 +706,7 @@ async def process_groq_job(
         segment = json.dumps(
             [{"Start": 0, "End": job.audio_duration_seconds, "Content": text}]
         )
-        await job.chunk_queue.put(segment)
+        await job.chunk_stream.put(segment)
 
     # Signal end of stream
-    await job.chunk_queue.put(None)
+    await job.chunk_stream.put(None)
@@ -0,0 +1,215 @@
+"""Multipart audio uploads consumed as they arrive.
+
+Each file part is written to its AudioBuffer (spool file or memory) and
+hashed chunk by chunk while the request body streams in, so nothing is
+left to do once the last byte lands but read the duration from its
+headers. Oversized uploads are refused from Content-Length up front, or
+cut off as soon as the running total passes the limit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from server.audio_buffer import AudioBuffer, AudioBufferWriter
+
+if TYPE_CHECKING:
+    from python_multipart.multipart import MultipartCallbacks
+
+# Largest non-file form field (hotwords and the like).
+_MAX_FIELD_BYTES = 64 * 1024
+# Allowance for multipart boundaries and part headers when checking Content-Length.
+_MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+@dataclass
+class UploadedFile:
+    field_name: str
+    filename: str
+    audio: AudioBuffer
+    sha256: bytes
+
+
+@dataclass
+class Upload:
+    files: list[UploadedFile] = field(default_factory=list)
+    fields: dict[str, str] = field(default_factory=dict)
+
+    def wipe(self) -> None:
+        for uploaded in self.files:
+            uploaded.audio.wipe()
+
+
+async def receive_upload(
+    request: Request, max_file_bytes: int, max_files: int, spool_dir: str
+) -> Upload:
+    """Read a multipart/form-data body, spooling file parts as they stream in.
+
+    `max_file_bytes` bounds the file parts together. Raises HTTPException
+    (400 or 413) for a malformed or oversized upload, with anything
+    received so far wiped.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_file_bytes + _MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail="Audio file too large")
+
+    receiver = _Receiver(max_file_bytes, max_files, spool_dir)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await receiver.drain()
+        parser.finalize()
+        await receiver.drain()
+        if receiver.in_part:
+            raise HTTPException(status_code=400, detail="Upload ended in the middle of a part")
+    except MultipartParseError as exc:
+        receiver.discard()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {exc}") from None
+    except BaseException:
+        receiver.discard()
+        raise
+    return receiver.upload
+
+
+class _Receiver:
+    """Turns the parser's synchronous callbacks into awaited writes, in order."""
+
+    def __init__(self, max_file_bytes: int, max_files: int, spool_dir: str) -> None:
+        self._max_file_bytes = max_file_bytes
+        self._max_files = max_files
+        self._spool_dir = spool_dir
+        self.upload = Upload()
+        self.in_part = False
+        # Parser events not yet applied: part headers, a data chunk, or None at a part's end.
+        self._events: list[dict[bytes, bytes] | bytes | None] = []
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._received_bytes = 0
+        # The part being received: a file with its writer and hash, or a form field.
+        self._name = ""
+        self._filename: str | None = None
+        self._writer: AudioBufferWriter | None = None
+        self._hash = hashlib.sha256()
+        self._field_value = bytearray()
+
+    def callbacks(self) -> MultipartCallbacks:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        self._events.append(self._headers)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._events.append(None)
+
+    async def drain(self) -> None:
+        events, self._events = self._events, []
+        for event in events:
+            if isinstance(event, dict):
+                self._begin_part(event)
+            elif event is None:
+                await self._end_part()
+            else:
+                await self._receive(event)
+
+    def discard(self) -> None:
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+        self.upload.wipe()
+
+    def _begin_part(self, headers: dict[bytes, bytes]) -> None:
+        disposition, params = parse_options_header(headers.get(b"content-disposition", b""))
+        name = params.get(b"name")
+        if disposition != b"form-data" or name is None:
+            raise HTTPException(status_code=400, detail="Multipart part without a form field name")
+        self.in_part = True
+        self._name = name.decode("utf-8", errors="replace")
+        filename = params.get(b"filename")
+        self._filename = None if filename is None else filename.decode("utf-8", errors="replace")
+        if self._filename is None:
+            self._field_value = bytearray()
+            return
+        if len(self.upload.files) >= self._max_files:
+            raise HTTPException(
+                status_code=400, detail=f"More than {self._max_files} files in one upload"
+            )
+        self._writer = AudioBufferWriter(self._spool_dir)
+        self._hash = hashlib.sha256()
+
+    async def _receive(self, chunk: bytes) -> None:
+        if self._writer is None:
+            self._field_value += chunk
+            if len(self._field_value) > _MAX_FIELD_BYTES:
+                raise HTTPException(
+                    status_code=400, detail=f"Form field {self._name!r} is too long"
+                )
+            return
+        self._received_bytes += len(chunk)
+        if self._received_bytes > self._max_file_bytes:
+            raise HTTPException(status_code=413, detail="Audio file too large")
+        self._hash.update(chunk)
+        await self._writer.write(chunk)
+
+    async def _end_part(self) -> None:
+        self.in_part = False
+        if self._writer is None:
+            try:
+                self.upload.fields[self._name] = self._field_value.decode()
+            except UnicodeDecodeError:
+                raise HTTPException(
+                    status_code=400, detail=f"Form field {self._name!r} is not UTF-8"
+                ) from None
+            return
+        writer, self._writer = self._writer, None
+        assert self._filename is not None, f"File part {self._name!r} lost its filename"
+        try:
+            audio = await writer.finish()
+        except BaseException:
+            writer.discard()
+            raise
+        self.upload.files.append(
+            UploadedFile(
+                field_name=self._name,
+                filename=self._filename,
+                audio=audio,
+                sha256=self._hash.digest(),
+            )
+        )
@@ -1,26 +1,49 @@
+import asyncio
 import json
-from collections.abc import AsyncIterator
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import aclosing
 
 import httpx
 
+from server.audio_buffer import AudioBuffer
+from server.sse import delta_content, sse_data
+
+# Stands in for the audio data URL while the rest of the request is serialised.
+_AUDIO_URL_PLACEHOLDER = "\u0000audio-url\u0000"
+
 
 async def stream_transcription(
     *,
     http_client: httpx.AsyncClient,
     vllm_base_url: str,
     model_name: str,
-    audio_base64: str,
+    audio: AudioBuffer,
     audio_mime: str,
     audio_duration: float,
     hotwords: str | None,
     temperature: float,
     top_p: float,
-) -> AsyncIterator[str]:
-    """Stream transcription from vLLM via OpenAI-compatible SSE endpoint."""
-    audio_url = f"data:{audio_mime};base64,{audio_base64}"
+    max_tokens: int,
+    stall_timeout: float,
+    priority: int | None = None,
+    audio_url: str | None = None,
+    continuation: str | None = None,
+) -> AsyncGenerator[str, None]:
+    """Stream transcription from vLLM via OpenAI-compatible SSE endpoint.
+
+    Once the first token has arrived, a gap of `stall_timeout` seconds
+    before the next raises RuntimeError. With `continuation` the model is
+    asked to carry on from that text, as the start of its answer, and only
+    the new text is streamed.
 
+    With `audio_url` (a file:// URL vLLM can read) the request refers to
+    the audio; otherwise the audio is base64-encoded into the request body
+    as it is sent, so the encoded copy never exists in memory as a whole.
+    `priority` is passed to vLLM's priority scheduler (lower runs first);
+    None leaves it out.
+    """
     content: list[dict[str, object]] = [
-        {"type": "audio_url", "audio_url": {"url": audio_url}},
+        {"type": "audio_url", "audio_url": {"url": _AUDIO_URL_PLACEHOLDER}},
     ]
 
     text_prompt = f"This is a {audio_duration:.2f} seconds audio, "
@@ -46,15 +69,46 @@ async def stream_transcription(
         ],
         "temperature": temperature,
         "top_p": top_p,
+        "max_tokens": max_tokens,
         "stream": True,
     }
+    if priority is not None:
+        payload["priority"] = priority
+    if continuation:
+        messages = payload["messages"]
+        assert isinstance(messages, list), f"Expected a message list, got: {messages!r}"
+        messages.append({"role": "assistant", "content": continuation})
+        payload["add_generation_prompt"] = False
+        payload["continue_final_message"] = True
 
     url = f"{vllm_base_url}/v1/chat/completions"
 
+    body_prefix, body_suffix = _split_on_audio_url(payload)
+    if audio_url is not None:
+        # Percent-encoded file URLs need no JSON escaping either.
+        url_bytes = audio_url.encode()
+        content_length = len(body_prefix) + len(url_bytes) + len(body_suffix)
+
+        async def request_body() -> AsyncIterator[bytes]:
+            yield body_prefix + url_bytes + body_suffix
+
+    else:
+        url_prefix = f"data:{audio_mime};base64,".encode()
+        content_length = (
+            len(body_prefix) + len(url_prefix) + audio.base64_size() + len(body_suffix)
+        )
+
+        async def request_body() -> AsyncIterator[bytes]:
+            yield body_prefix + url_prefix
+            async for chunk in audio.iter_base64():
+                yield chunk
+            yield body_suffix
+
     async with http_client.stream(
         "POST",
         url,
-        json=payload,
+        content=request_body(),
+        headers={"Content-Type": "application/json", "Content-Length": str(content_length)},
         timeout=httpx.Timeout(connect=10.0, read=600.0, write=30.0, pool=10.0),
     ) as response:
         if response.status_code != 200:
@@ -62,21 +116,36 @@ async def stream_transcription(
             raise RuntimeError(
                 f"vLLM error {response.status_code}: {body.decode('utf-8', errors='replace')}"
             )
-        async for line in response.aiter_lines():
-            if not line.startswith("data: "):
-                continue
-            data_str = line[len("data: "):]
-            if data_str.strip() == "[DONE]":
-                return
-            try:
-                data = json.loads(data_str)
-            except json.JSONDecodeError:
-                continue
-            if "choices" not in data or not data["choices"]:
-                continue
-            choice = data["choices"][0]
-            if "delta" not in choice or "content" not in choice["delta"]:
-                continue
-            text = choice["delta"]["content"]
-            if text:
-                yield text
+        # Before the first token vLLM may still be queueing or prefilling, which the
+        # read timeout covers; after it, tokens come steadily or generation has stalled.
+        read_timeout: float | None = None
+        async with aclosing(sse_data(response.aiter_bytes())) as events:
+            while True:
+                try:
+                    async with asyncio.timeout(read_timeout):
+                        data = await anext(events)
+                except StopAsyncIteration:
+                    return
+                except TimeoutError:
+                    raise RuntimeError(
+                        f"vLLM stalled: no token for {stall_timeout:.0f}s mid-generation"
+                    ) from None
+                if data.strip() == b"[DONE]":
+                    return
+                text = delta_content(data)
+                if text:
+                    read_timeout = stall_timeout
+                    yield text
+
+
+def _split_on_audio_url(payload: dict[str, object]) -> tuple[bytes, bytes]:
+    """Serialise the request around the audio URL string, returning the bytes before and after.
+
+    Base64 and the data-URL prefix need no JSON escaping, so the URL can be
+    streamed between the two halves verbatim.
+    """
+    body = json.dumps(payload).encode()
+    placeholder = json.dumps(_AUDIO_URL_PLACEHOLDER)[1:-1].encode()
+    prefix, found, suffix = body.partition(placeholder)
+    assert found, f"Audio URL placeholder missing from serialised request: {body[:200]!r}"
+    return prefix, suffix
@@ -0,0 +1,186 @@
+"""Sample access to PCM and float WAV files with NumPy, for in-process audio processing.
+
+Audio in any other format is decoded to a WAV by ffmpeg first.
+"""
+
+import struct
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import AudioBytes
+
+WAV_HEADER_BYTES = 44
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Sample rate ffmpeg decodes other formats to; what VibeVoice works at.
+DECODE_SAMPLE_RATE = 24000
+# Analysis frames decoded at a time by frame_levels.
+_FRAMES_PER_BLOCK = 4096
+_SILENCE_DB = -100.0
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+Samples = npt.NDArray[np.float32]
+
+
+@dataclass(frozen=True)
+class WavLayout:
+    format_tag: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    block_align: int
+    # Byte offset of the first sample frame
+    data_offset: int
+    frames: int
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+
+def wav_layout(data: AudioBytes) -> WavLayout | None:
+    """The sample layout of a PCM or float WAV, or None for any other file."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    fmt: tuple[int, ...] | None = None
+    pos = 12
+    try:
+        while pos + 8 <= len(data):
+            chunk_id = data[pos : pos + 4]
+            (size,) = struct.unpack_from("<I", data, pos + 4)
+            body = pos + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", data, body)
+                if fmt[0] == _WAVE_FORMAT_EXTENSIBLE:
+                    # The real format tag leads the subformat GUID.
+                    (subformat,) = struct.unpack_from("<H", data, body + 24)
+                    fmt = (subformat, *fmt[1:])
+            elif chunk_id == b"data":
+                break
+            pos = body + size + (size & 1)
+        else:
+            return None
+    except struct.error:
+        return None
+    if fmt is None:
+        return None
+
+    format_tag, channels, sample_rate, _, block_align, bits = (int(value) for value in fmt)
+    supported = (
+        (format_tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32))
+        or (format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64))
+    )
+    if not supported or channels < 1 or sample_rate < 1 or block_align != channels * bits // 8:
+        return None
+    # Streaming writers leave the size at 0 or 0xFFFFFFFF; count what is there.
+    available = len(data) - body
+    if size in (0, 0xFFFFFFFF) or size > available:
+        size = available
+    return WavLayout(
+        format_tag, channels, sample_rate, bits, block_align, body, size // block_align
+    )
+
+
+def wav_header(
+    format_tag: int, channels: int, sample_rate: int, bits_per_sample: int, data_size: int
+) -> bytes:
+    """A canonical 44-byte header for `data_size` bytes of samples."""
+    block_align = channels * bits_per_sample // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, format_tag, channels,
+        sample_rate, sample_rate * block_align, block_align, bits_per_sample,
+        b"data", data_size,
+    )
+
+
+def mono_samples(data: AudioBytes, layout: WavLayout, start: int, end: int) -> Samples:
+    """Frames start..end of the WAV as float samples in [-1, 1], channels averaged."""
+    begin = layout.data_offset + start * layout.block_align
+    count = (end - start) * layout.block_align
+    raw = np.frombuffer(data, dtype=np.uint8, count=count, offset=begin)
+    bits = layout.bits_per_sample
+    if layout.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = raw.view("<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif bits == 8:
+        samples = (raw.astype(np.float32) - 128.0) / 128.0
+    elif bits == 24:
+        triples = raw.reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        # Sign-extend from 24 bits.
+        values = (values << 8) >> 8
+        samples = values.astype(np.float32) / float(1 << 23)
+    else:
+        dtype = "<i2" if bits == 16 else "<i4"
+        samples = raw.view(dtype).astype(np.float32) / float(1 << (bits - 1))
+    mono: Samples = samples.reshape(-1, layout.channels).mean(axis=1, dtype=np.float32)
+    return mono
+
+
+def wav_excerpt(
+    data: AudioBytes, layout: WavLayout, spans: list[tuple[int, int]]
+) -> Iterator[bytes]:
+    """A WAV of the given [start, end) frame ranges joined, in the original sample format."""
+    frames = sum(end - start for start, end in spans)
+    yield wav_header(
+        layout.format_tag,
+        layout.channels,
+        layout.sample_rate,
+        layout.bits_per_sample,
+        frames * layout.block_align,
+    )
+    for start, end in spans:
+        first = layout.data_offset + start * layout.block_align
+        last = layout.data_offset + end * layout.block_align
+        for offset in range(first, last, _COPY_CHUNK_BYTES):
+            yield data[offset : min(offset + _COPY_CHUNK_BYTES, last)]
+
+
+def frame_levels(data: AudioBytes, layout: WavLayout, frame: int) -> npt.NDArray[np.float64]:
+    """The level in dBFS of each `frame`-sample frame, the last one zero-padded."""
+    levels: list[npt.NDArray[np.float64]] = []
+    step = frame * _FRAMES_PER_BLOCK
+    for start in range(0, layout.frames, step):
+        samples = mono_samples(data, layout, start, min(start + step, layout.frames))
+        padded = np.zeros(-(-len(samples) // frame) * frame, dtype=np.float64)
+        padded[: len(samples)] = samples
+        power = np.square(padded).reshape(-1, frame).mean(axis=1)
+        levels.append(10 * np.log10(np.maximum(power, 10 ** (_SILENCE_DB / 10))))
+    return np.concatenate(levels) if levels else np.zeros(0)
+
+
+async def as_wav(
+    audio: AudioBuffer, mime: str, ffmpeg: FfmpegPool
+) -> tuple[AudioBuffer, WavLayout]:
+    """`audio` itself if it is a PCM or float WAV, else decoded by ffmpeg to 24 kHz mono 16-bit.
+
+    A decoded copy is held in memory. Raises RuntimeError if ffmpeg fails.
+    """
+    with audio.mapped() as data:
+        layout = wav_layout(data) if mime == "audio/wav" else None
+    if layout is not None:
+        return audio, layout
+    decoded = await ffmpeg.run(
+        audio,
+        lambda path: [
+            "ffmpeg",
+            "-nostdin",
+            "-i", path,
+            "-vn",
+            "-ac", "1",
+            "-ar", str(DECODE_SAMPLE_RATE),
+            "-c:a", "pcm_s16le",
+            "-f", "wav",
+            "pipe:1",
+        ],
+    )
+    layout = wav_layout(decoded)
+    if layout is None:
+        raise RuntimeError(f"ffmpeg decoded {mime} audio to an unreadable WAV")
+    return AudioBuffer.in_memory(decoded), layout
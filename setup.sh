@@ -194,6 +194,8 @@ ExecStart=%h/Desktop/vibe-voice-vendor/.venv/bin/python -m server \\
     --port 54912 \\
     --max-audio-bytes 524288000 \\
     --max-queue-size 50 \\
+    --audio-spool-dir /var/tmp \\
+    --eta-model-file %h/Desktop/vibe-voice-vendor/eta_model.json \\
     --jwt-public-key-file %h/Desktop/vibe-voice-vendor/keys/public.pem \\
     --revoked-tokens-file %h/Desktop/vibe-voice-vendor/revoked_tokens.txt \\
     --require-https true
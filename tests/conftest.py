@@ -34,17 +34,40 @@ def settings(tmp_path: Path) -> Settings:
     revoked_file.write_text("")
     return Settings(
         asr_backend="vibevoice",
-        vllm_base_url="http://127.0.0.1:9999",
+        vllm_base_urls=["http://127.0.0.1:9999"],
         server_host="127.0.0.1",
         server_port=54912,
+        server_workers=1,
+        broker_socket_path="",
         max_audio_bytes=500 * 1024 * 1024,
+        audio_spool_dir="",
         max_queue_size=5,
+        max_queued_audio_seconds=0.0,
+        max_queued_audio_bytes=0,
+        max_concurrent_jobs=1,
+        max_media_processes=2,
+        media_process_timeout_seconds=600.0,
+        trim_silence=False,
+        subject_weights={},
+        priority_lane_seconds=600.0,
+        eta_model_file="",
+        job_retention_seconds=30.0,
+        result_cache_bytes=0,
+        result_cache_ttl_seconds=3600.0,
+        stream_resume_grace_seconds=15.0,
         jwt_public_key_file=str(key_file),
         revoked_tokens_file=str(revoked_file),
         require_https=False,
         vllm_model_name="vibevoice",
         vllm_temperature=0.0,
         vllm_top_p=1.0,
+        vllm_stall_timeout_seconds=60.0,
+        vllm_max_model_len=48000,
+        vllm_kv_token_budget=48000,
+        vllm_priority_scheduling=False,
+        vllm_media_dir="",
+        vllm_window_seconds=0.0,
+        normalize_audio=False,
         groq_api_key="",
         groq_model_name="whisper-large-v3",
     )
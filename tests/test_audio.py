@@ -1,14 +1,40 @@
+import asyncio
 import base64
+import io
 import shutil
 import struct
+import tarfile
+import zipfile
+from pathlib import Path
 
 import pytest
 
-from server.audio import detect_mime_type, encode_audio_base64, probe_duration
+from server.audio import (
+    FfmpegPool,
+    detect_mime_type,
+    encode_audio_base64,
+    probe_duration,
+    unpack_archive,
+)
+from server.audio_buffer import AudioBuffer
 
 has_ffprobe = shutil.which("ffprobe") is not None
 
 
+def _ffmpeg(max_processes: int = 2, timeout_seconds: float = 30.0) -> FfmpegPool:
+    return FfmpegPool(max_processes, timeout_seconds)
+
+
+def _running_commands() -> list[str]:
+    commands = []
+    for cmdline in Path("/proc").glob("[0-9]*/cmdline"):
+        try:
+            commands.append(cmdline.read_bytes().replace(b"\0", b" ").decode().strip())
+        except OSError:
+            continue
+    return commands
+
+
 def _make_wav(
     sample_rate: int = 16000, num_samples: int = 16000, num_channels: int = 1
 ) -> bytes:
@@ -75,21 +101,85 @@ def test_detect_mime_type_case_insensitive() -> None:
     assert detect_mime_type("track.MP3") == "audio/mpeg"
 
 
-@pytest.mark.skipif(not has_ffprobe, reason="ffprobe not installed")
 async def test_probe_duration_wav() -> None:
     wav_bytes = _make_wav(sample_rate=16000, num_samples=16000)
-    duration = await probe_duration(wav_bytes)
+    duration = await probe_duration(AudioBuffer.in_memory(wav_bytes), _ffmpeg())
     assert abs(duration - 1.0) < 0.1
 
 
-@pytest.mark.skipif(not has_ffprobe, reason="ffprobe not installed")
 async def test_probe_duration_half_second() -> None:
     wav_bytes = _make_wav(sample_rate=16000, num_samples=8000)
-    duration = await probe_duration(wav_bytes)
+    duration = await probe_duration(AudioBuffer.in_memory(wav_bytes), _ffmpeg())
     assert abs(duration - 0.5) < 0.1
 
 
 @pytest.mark.skipif(not has_ffprobe, reason="ffprobe not installed")
 async def test_probe_duration_invalid() -> None:
     with pytest.raises(RuntimeError, match="ffprobe failed"):
-        await probe_duration(b"not audio data at all")
+        await probe_duration(AudioBuffer.in_memory(b"not audio data at all"), _ffmpeg())
+
+
+def test_unpack_tar_keeps_audio_members_in_order() -> None:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        members = [("b.wav", b"bb"), (".hidden.wav", b"h"), ("a.mp3", b"a"), ("x.txt", b"x")]
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    assert unpack_archive("set.tar.gz", buf.getvalue(), 100) == [("b.wav", b"bb"), ("a.mp3", b"a")]
+
+
+def test_unpack_rejects_archive_expanding_past_limit() -> None:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.wav", b"\x00" * 10_000)
+    assert len(buf.getvalue()) < 1_000
+    with pytest.raises(ValueError, match="more than 1000 bytes"):
+        unpack_archive("bomb.zip", buf.getvalue(), 1_000)
+    with pytest.raises(ValueError, match="Cannot read archive"):
+        unpack_archive("broken.zip", b"not a zip", 1_000)
+
+
+async def test_ffmpeg_pool_reads_audio_through_a_descriptor(tmp_path: Path) -> None:
+    ffmpeg = _ffmpeg()
+    for audio in (
+        AudioBuffer.in_memory(b"in memory"),
+        await AudioBuffer.spool(b"spooled", str(tmp_path)),
+    ):
+        assert await ffmpeg.run(audio, lambda path: ["cat", path]) == await audio.read()
+    assert list(tmp_path.iterdir()) == []
+    assert ffmpeg.stats()["completed"] == 2
+
+
+async def test_ffmpeg_pool_caps_running_processes() -> None:
+    ffmpeg = _ffmpeg(max_processes=1)
+    audio = AudioBuffer.in_memory(b"")
+    runs = [
+        asyncio.create_task(ffmpeg.run(audio, lambda _: ["sleep", "0.2"])) for _ in range(3)
+    ]
+    await asyncio.sleep(0.1)
+    assert (ffmpeg.stats()["running"], ffmpeg.stats()["waiting"]) == (1, 2)
+    await asyncio.gather(*runs)
+    stats = ffmpeg.stats()
+    assert (stats["running"], stats["waiting"], stats["completed"]) == (0, 0, 3)
+    assert stats["max_wait_seconds"] >= 0.3
+
+
+async def test_ffmpeg_pool_kills_process_on_timeout_and_cancel() -> None:
+    ffmpeg = _ffmpeg(timeout_seconds=0.1)
+    audio = AudioBuffer.in_memory(b"")
+    with pytest.raises(RuntimeError, match="did not finish within"):
+        await ffmpeg.run(audio, lambda _: ["sleep", "7.25"])
+    assert "sleep 7.25" not in _running_commands()
+    assert ffmpeg.stats()["timed_out"] == 1
+
+    ffmpeg = _ffmpeg()
+    run = asyncio.create_task(ffmpeg.run(audio, lambda _: ["sleep", "7.5"]))
+    await asyncio.sleep(0.1)
+    assert "sleep 7.5" in _running_commands()
+    run.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run
+    assert "sleep 7.5" not in _running_commands()
+    assert ffmpeg.stats()["running"] == 0
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import os
+from pathlib import Path
+
+from server.audio_buffer import AudioBuffer, AudioBufferWriter
+
+
+async def _encoded(buffer: AudioBuffer) -> bytes:
+    return b"".join([chunk async for chunk in buffer.iter_base64()])
+
+
+async def test_spooled_audio_leaves_no_file_behind(tmp_path: Path) -> None:
+    raw = os.urandom(1_000_001)
+    buffer = await AudioBuffer.spool(raw, str(tmp_path))
+
+    assert buffer.spooled
+    assert list(tmp_path.iterdir()) == []
+    assert await buffer.read() == raw
+
+
+async def test_base64_chunks_concatenate_to_full_encoding(tmp_path: Path) -> None:
+    raw = os.urandom(3 * 256 * 1024 * 2 + 7)
+    expected = base64.b64encode(raw)
+
+    spooled = await AudioBuffer.spool(raw, str(tmp_path))
+    in_memory = AudioBuffer.in_memory(raw)
+
+    assert await _encoded(spooled) == expected
+    assert await _encoded(in_memory) == expected
+    assert spooled.base64_size() == len(expected)
+
+
+async def test_wipe_zeroes_and_closes_spool_file(tmp_path: Path) -> None:
+    raw = b"secret audio" * 1000
+    buffer = await AudioBuffer.spool(raw, str(tmp_path))
+    file = buffer._file
+    assert file is not None
+    duplicate = os.dup(file.fileno())
+
+    buffer.wipe()
+    for _ in range(100):
+        if file.closed:
+            break
+        await asyncio.sleep(0.01)
+
+    assert buffer.wiped
+    assert file.closed
+    assert os.fstat(duplicate).st_size == 0
+    os.close(duplicate)
+
+
+async def test_wipe_drops_in_memory_audio() -> None:
+    buffer = AudioBuffer.in_memory(b"audio")
+    buffer.wipe()
+    assert buffer.wiped
+
+
+async def test_writer_spools_upload_as_it_arrives(tmp_path: Path) -> None:
+    chunks = [os.urandom(700 * 1024) for _ in range(3)]
+    writer = AudioBufferWriter(str(tmp_path))
+
+    await writer.write(chunks[0])
+    assert writer._file is None
+    await writer.write(chunks[1])
+    assert writer._file is not None
+    await writer.write(chunks[2])
+    buffer = await writer.finish()
+
+    assert buffer.spooled
+    assert buffer.size == writer.size == 3 * 700 * 1024
+    assert list(tmp_path.iterdir()) == []
+    assert await buffer.read() == b"".join(chunks)
+    with buffer.mapped() as view:
+        assert view[:16] == chunks[0][:16]
+
+
+async def test_writer_without_spool_dir_keeps_audio_in_memory() -> None:
+    writer = AudioBufferWriter("")
+    await writer.write(b"head")
+    await writer.write(b"tail")
+    buffer = await writer.finish()
+
+    assert not buffer.spooled
+    assert await buffer.read() == b"headtail"
+
+
+async def test_export_writes_owner_only_copy_and_removes_it(tmp_path: Path) -> None:
+    raw = os.urandom(100_003)
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    for buffer in (AudioBuffer.in_memory(raw), await AudioBuffer.spool(raw, str(spool_dir))):
+        export = await buffer.export(str(media_dir), ".wav")
+        path = Path(export.path)
+        assert path.parent == media_dir and path.suffix == ".wav"
+        assert export.url == path.as_uri()
+        assert path.stat().st_mode & 0o777 == 0o600
+        assert path.read_bytes() == raw
+
+        export.remove()
+        export.remove()
+        assert export.removed
+        assert list(media_dir.iterdir()) == []
@@ -0,0 +1,125 @@
+import struct
+
+import pytest
+
+from server.audio_headers import duration_from_headers
+
+
+def _wav(sample_rate: int, num_samples: int, data_size_field: int | None = None) -> bytes:
+    data_size = num_samples * 2
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    size_field = data_size if data_size_field is None else data_size_field
+    chunks = (
+        b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        # An odd-sized chunk before the data, which must be skipped with its pad byte.
+        + b"LIST" + struct.pack("<I", 3) + b"abc\x00"
+        + b"data" + struct.pack("<I", size_field) + b"\x00" * data_size
+    )
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+def _flac(sample_rate: int, total_samples: int) -> bytes:
+    packed = (sample_rate << 44) | (0 << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + struct.pack(">Q", packed)
+    streaminfo += b"\x00" * 16  # MD5 of the audio
+    return b"fLaC" + bytes([0x80, 0, 0, 34]) + streaminfo + b"\x00" * 100
+
+
+def _ogg_page(serial: int, granule: int, packet: bytes, header_type: int = 0) -> bytes:
+    header = b"OggS" + struct.pack("<BBqIII", 0, header_type, granule, serial, 0, 0)
+    return header + bytes([1, len(packet)]) + packet
+
+
+def _mp3_frame(bitrate_index: int = 9, body: bytes = b"") -> bytes:
+    """One MPEG-1 Layer III frame at 44.1 kHz (index 9 is 128 kbps)."""
+    bitrate = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)[bitrate_index]
+    length = 144 * bitrate * 1000 // 44100
+    header = bytes([0xFF, 0xFB, bitrate_index << 4, 0x00])
+    return (header + body).ljust(length, b"\x00")
+
+
+def _mp4(mvhd_body: bytes) -> bytes:
+    def box(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", 8 + len(body)) + kind + body
+
+    return (
+        box(b"ftyp", b"M4A \x00\x00\x00\x00")
+        + box(b"mdat", b"\x00" * 64)
+        + box(b"moov", box(b"mvhd", mvhd_body) + box(b"trak", b""))
+    )
+
+
+def test_wav() -> None:
+    assert duration_from_headers(_wav(16000, 24000)) == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("size_field", [0, 0xFFFFFFFF])
+def test_streamed_wav_counts_available_data(size_field: int) -> None:
+    assert duration_from_headers(_wav(16000, 8000, size_field)) == pytest.approx(0.5)
+
+
+def test_compressed_wav_falls_back() -> None:
+    pcm_fmt = b"fmt \x10\x00\x00\x00\x01\x00"
+    adpcm = _wav(16000, 100).replace(pcm_fmt, pcm_fmt[:-2] + b"\x02\x00")
+    assert duration_from_headers(adpcm) is None
+
+
+def test_flac_with_id3_tag() -> None:
+    id3 = b"ID3\x03\x00\x00" + bytes([0, 0, 0, 20]) + b"\x00" * 20
+    assert duration_from_headers(id3 + _flac(16000, 48000)) == pytest.approx(3.0)
+    assert duration_from_headers(_flac(16000, 0)) is None
+
+
+def test_ogg_opus_subtracts_pre_skip() -> None:
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, 312, 16000, 0, 0)
+    data = (
+        _ogg_page(7, 0, head, header_type=2)
+        + _ogg_page(7, 48000, b"audio")
+        + _ogg_page(7, 2 * 48000 + 312, b"audio", header_type=4)
+    )
+    assert duration_from_headers(data) == pytest.approx(2.0)
+
+
+def test_ogg_vorbis_ignores_other_streams() -> None:
+    ident = b"\x01vorbis" + struct.pack("<IBI", 0, 2, 44100) + b"\x00" * 13
+    data = (
+        _ogg_page(1, 0, ident, header_type=2)
+        + _ogg_page(1, 88200, b"audio", header_type=4)
+        + _ogg_page(2, 999_999, b"other stream")
+    )
+    assert duration_from_headers(data) == pytest.approx(2.0)
+
+
+def test_cbr_mp3_from_file_size() -> None:
+    data = _mp3_frame() * 100 + b"TAG" + b"\x00" * 125
+    expected = 100 * len(_mp3_frame()) * 8 / 128_000
+    assert duration_from_headers(data) == pytest.approx(expected)
+
+
+def test_mp3_xing_and_vbri_frame_counts() -> None:
+    xing = _mp3_frame(body=b"\x00" * 32 + b"Xing" + struct.pack(">II", 1, 1000))
+    assert duration_from_headers(xing + _mp3_frame() * 3) == pytest.approx(1000 * 1152 / 44100)
+    vbri = _mp3_frame(body=b"\x00" * 32 + b"VBRI" + struct.pack(">HHHII", 1, 0, 0, 0, 500))
+    assert duration_from_headers(vbri + _mp3_frame() * 3) == pytest.approx(500 * 1152 / 44100)
+
+
+def test_vbr_mp3_without_frame_count_falls_back() -> None:
+    data = _mp3_frame(9) + _mp3_frame(11) + _mp3_frame(9) * 10
+    assert duration_from_headers(data) is None
+
+
+def test_mp4_movie_header() -> None:
+    v0 = struct.pack(">B3xIIII", 0, 0, 0, 1000, 5500)
+    assert duration_from_headers(_mp4(v0)) == pytest.approx(5.5)
+    v1 = struct.pack(">B3xQQIQ", 1, 0, 0, 44100, 44100 * 90)
+    assert duration_from_headers(_mp4(v1)) == pytest.approx(90.0)
+    fragmented = struct.pack(">B3xIIII", 0, 0, 0, 1000, 0)
+    assert duration_from_headers(_mp4(fragmented)) is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"not audio data at all", _wav(16000, 100)[:30], b"fLaC\x00", b"OggS" + b"\x00" * 10],
+)
+def test_unrecognised_or_truncated_input_falls_back(data: bytes) -> None:
+    assert duration_from_headers(data) is None
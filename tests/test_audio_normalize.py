@@ -0,0 +1,113 @@
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_headers import duration_from_headers
+from server.audio_normalize import TARGET_SAMPLE_RATE, normalize_audio
+
+
+def _wav(channels: list[np.ndarray], sample_rate: int, float_samples: bool = False) -> bytes:
+    frames = np.stack(channels, axis=1)
+    if float_samples:
+        data = frames.astype("<f4").tobytes()
+        format_tag, bits = 3, 32
+    else:
+        data = np.rint(frames * 32767).astype("<i2").tobytes()
+        format_tag, bits = 1, 16
+    block_align = len(channels) * bits // 8
+    fmt = struct.pack(
+        "<HHIIHH",
+        format_tag, len(channels), sample_rate, sample_rate * block_align, block_align, bits,
+    )
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data))
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks) + len(data)) + b"WAVE" + chunks + data
+
+
+def _tone(frequency: float, sample_rate: int, seconds: float) -> np.ndarray:
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return 0.5 * np.sin(2 * np.pi * frequency * t)
+
+
+def _samples(wav: bytes) -> tuple[int, int, np.ndarray]:
+    """(sample rate, channels, samples) of a 16-bit PCM WAV with a 44-byte header."""
+    _, channels, sample_rate = struct.unpack_from("<HHI", wav, 20)
+    return sample_rate, channels, np.frombuffer(wav[44:], dtype="<i2") / 32768
+
+
+async def _normalize(wav: bytes, seconds: float, spool_dir: str = "") -> AudioBuffer | None:
+    normalized = await normalize_audio(
+        AudioBuffer.in_memory(wav), "audio/wav", seconds, FfmpegPool(1, 30.0), spool_dir
+    )
+    if normalized is None:
+        return None
+    assert normalized.mime == "audio/wav", f"Unexpected MIME type: {normalized.mime}"
+    return normalized.audio
+
+
+async def test_stereo_48k_wav_is_downmixed_and_resampled(tmp_path: Path) -> None:
+    tone = _tone(1000, 48000, 2.0)
+    wav = _wav([tone, tone], 48000)
+
+    audio = await _normalize(wav, 2.0, str(tmp_path))
+
+    assert audio is not None and audio.spooled
+    out = await audio.read()
+    sample_rate, channels, samples = _samples(out)
+    assert (sample_rate, channels) == (TARGET_SAMPLE_RATE, 1)
+    assert len(samples) == 2 * TARGET_SAMPLE_RATE
+    assert audio.size == len(out) == 44 + (len(wav) - 44) // 4
+    assert duration_from_headers(out) == pytest.approx(2.0)
+    # One second of a 1 kHz tone puts its peak in the 1000th bin at full amplitude.
+    spectrum = np.abs(np.fft.rfft(samples[12000:36000]))
+    assert int(np.argmax(spectrum)) == 1000
+    assert samples[1000:-1000].std() * np.sqrt(2) == pytest.approx(0.5, abs=0.005)
+
+
+async def test_content_above_the_new_nyquist_is_filtered_out() -> None:
+    wav = _wav([_tone(15000, 48000, 1.0)], 48000)
+
+    audio = await _normalize(wav, 1.0)
+
+    assert audio is not None
+    _, _, samples = _samples(await audio.read())
+    assert samples.std() < 0.005
+
+
+async def test_channels_are_averaged() -> None:
+    tone = _tone(440, 48000, 1.0)
+    wav = _wav([tone, np.zeros_like(tone)], 48000)
+
+    audio = await _normalize(wav, 1.0)
+
+    assert audio is not None
+    _, _, samples = _samples(await audio.read())
+    assert samples[1000:-1000].std() * np.sqrt(2) == pytest.approx(0.25, abs=0.005)
+
+
+async def test_44k_float_wav_is_resampled() -> None:
+    wav = _wav([_tone(1000, 44100, 1.0)], 44100, float_samples=True)
+
+    audio = await _normalize(wav, 1.0)
+
+    assert audio is not None
+    sample_rate, channels, samples = _samples(await audio.read())
+    assert (sample_rate, channels, len(samples)) == (TARGET_SAMPLE_RATE, 1, TARGET_SAMPLE_RATE)
+    assert int(np.argmax(np.abs(np.fft.rfft(samples)))) == 1000
+
+
+@pytest.mark.parametrize(
+    ("sample_rate", "channels"), [(24000, 1), (16000, 1), (16000, 2)]
+)
+async def test_compact_audio_is_left_alone(sample_rate: int, channels: int) -> None:
+    tone = _tone(440, sample_rate, 1.0)
+    assert await _normalize(_wav([tone] * channels, sample_rate), 1.0) is None
+
+
+async def test_lossy_audio_is_left_alone() -> None:
+    # 128 kbps is well under the 384 kbps of 16-bit 24 kHz mono, so ffmpeg is never run.
+    mp3 = AudioBuffer.in_memory(bytes(16000))
+    assert await normalize_audio(mp3, "audio/mpeg", 1.0, FfmpegPool(1, 30.0), "") is None
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_split import OVERLAP_SECONDS, split_at_pauses
+from server.wav import WAVE_FORMAT_PCM, wav_header, wav_layout
+
+_RATE = 8000
+
+
+def _talk(seconds: float, pauses_at: list[float]) -> bytes:
+    """A tone broken by half-second pauses at the given times."""
+    t = np.arange(int(_RATE * seconds)) / _RATE
+    samples = 0.3 * np.sin(2 * np.pi * 300 * t)
+    for pause in pauses_at:
+        samples[int(pause * _RATE) : int((pause + 0.5) * _RATE)] = 0.0
+    data = np.rint(samples * 32767).astype("<i2").tobytes()
+    return wav_header(WAVE_FORMAT_PCM, 1, _RATE, 16, len(data)) + data
+
+
+async def test_long_audio_is_cut_at_pauses_with_overlap(tmp_path: Path) -> None:
+    wav = _talk(200.0, pauses_at=[55.0, 70.0, 110.0, 130.0])
+
+    windows = await split_at_pauses(
+        AudioBuffer.in_memory(wav), "audio/wav", 200.0, 60.0, FfmpegPool(1, 30.0), str(tmp_path)
+    )
+
+    assert windows is not None
+    # Boundaries at the pauses closest to 60 s windows: 55 s, then 110 s, then the rest.
+    boundaries = [w.start + w.overlap for w in windows]
+    assert boundaries[0] == 0.0
+    assert boundaries[1] == pytest.approx(55.25, abs=0.2)
+    assert boundaries[2] == pytest.approx(110.25, abs=0.2)
+    assert len(windows) == 4
+    for window in windows[1:]:
+        assert window.overlap == pytest.approx(OVERLAP_SECONDS)
+    for window in windows:
+        assert window.audio.spooled
+        layout = wav_layout(await window.audio.read())
+        assert layout is not None
+        assert layout.duration == pytest.approx(window.duration)
+    assert windows[-1].start + windows[-1].duration == pytest.approx(200.0)
+
+
+async def test_audio_within_a_window_is_not_split() -> None:
+    wav = _talk(70.0, pauses_at=[30.0])
+    assert await split_at_pauses(
+        AudioBuffer.in_memory(wav), "audio/wav", 70.0, 60.0, FfmpegPool(1, 30.0), ""
+    ) is None
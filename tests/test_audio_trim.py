@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.audio_trim import OffsetMap, trim_silence
+from server.wav import WAVE_FORMAT_PCM, wav_header, wav_layout
+
+_RATE = 16000
+
+
+def _speech(seconds: float) -> np.ndarray:
+    t = np.arange(int(_RATE * seconds)) / _RATE
+    return 0.3 * np.sin(2 * np.pi * 300 * t)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    # Room noise around -60 dBFS rather than digital zero.
+    return 0.001 * np.random.default_rng(0).standard_normal(int(_RATE * seconds))
+
+
+def _wav(*parts: np.ndarray, channels: int = 1) -> bytes:
+    samples = np.repeat(np.concatenate(parts)[:, None], channels, axis=1)
+    data = np.rint(samples * 32767).astype("<i2").tobytes()
+    return wav_header(WAVE_FORMAT_PCM, channels, _RATE, 16, len(data)) + data
+
+
+async def _trim(wav: bytes, spool_dir: str = "") -> tuple[bytes, OffsetMap] | None:
+    trimmed = await trim_silence(
+        AudioBuffer.in_memory(wav), "audio/wav", FfmpegPool(1, 30.0), spool_dir
+    )
+    if trimmed is None:
+        return None
+    assert trimmed.mime == "audio/wav", f"Unexpected MIME type: {trimmed.mime}"
+    return await trimmed.audio.read(), trimmed.offsets
+
+
+async def test_long_silences_are_cut_and_mapped_back(tmp_path: Path) -> None:
+    wav = _wav(
+        _silence(5), _speech(3), _silence(0.8), _speech(2), _silence(10), _speech(4), _silence(3),
+        channels=2,
+    )
+
+    result = await _trim(wav, str(tmp_path))
+
+    assert result is not None
+    out, offsets = result
+    layout = wav_layout(out)
+    assert layout is not None
+    assert (layout.channels, layout.sample_rate) == (2, _RATE)
+    assert offsets.original_duration == pytest.approx(27.8)
+    assert layout.duration == pytest.approx(offsets.duration)
+    # Speech is 9 s, plus the 0.8 s pause and margins of about 0.3 s around each stretch.
+    assert 10.0 < offsets.duration < 12.0
+    assert offsets.trimmed_seconds == pytest.approx(27.8 - offsets.duration)
+    # The first word starts 5 s in; the third 20.8 s in.
+    first_kept, second_kept = offsets.original_starts
+    assert 4.5 < first_kept < 5.0
+    assert 20.3 < second_kept < 20.8
+    assert offsets.to_original(5.0 - first_kept) == pytest.approx(5.0)
+    resumed = offsets.trimmed_starts[1] + 20.8 - second_kept
+    assert offsets.to_original(resumed) == pytest.approx(20.8)
+
+
+async def test_short_pauses_are_kept() -> None:
+    assert await _trim(_wav(_speech(2), _silence(1.2), _speech(2))) is None
+
+
+async def test_audio_without_silence_is_left_alone() -> None:
+    assert await _trim(_wav(_speech(10))) is None
+    assert await _trim(_wav(_silence(10))) is None
+
+
+def test_offset_map_boundaries() -> None:
+    offsets = OffsetMap(
+        trimmed_starts=(0.0, 2.0), original_starts=(1.0, 10.0), duration=5.0, original_duration=14.0
+    )
+
+    assert offsets.trimmed_seconds == 9.0
+    assert offsets.to_original(0.5) == 1.5
+    assert offsets.to_original(2.0) == 10.0
+    assert offsets.to_original(2.0, end=True) == 3.0
+    assert offsets.to_original(4.0, end=True) == 12.0
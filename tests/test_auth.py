@@ -8,8 +8,9 @@ from cryptography.hazmat.primitives.asymmetric import ec
 from fastapi import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 
-from server.auth import _load_public_key, verify_token
+from server.auth import TokenIdentity, _load_public_key, verify_token, verify_token_identity
 from server.config import Settings
+from server.models import JobPriority
 
 # Generate a test key pair at module level (fast, in-memory only)
 _PRIVATE_KEY = ec.generate_private_key(ec.SECP256R1())
@@ -29,17 +30,40 @@ def _make_settings(tmp_path: object, public_pem: bytes, revoked_tokens_file: str
     key_file.write_bytes(public_pem)
     return Settings(
         asr_backend="vibevoice",
-        vllm_base_url="http://127.0.0.1:9999",
+        vllm_base_urls=["http://127.0.0.1:9999"],
         server_host="127.0.0.1",
         server_port=54912,
+        server_workers=1,
+        broker_socket_path="",
         max_audio_bytes=500 * 1024 * 1024,
+        audio_spool_dir="",
         max_queue_size=5,
+        max_queued_audio_seconds=0.0,
+        max_queued_audio_bytes=0,
+        max_concurrent_jobs=1,
+        max_media_processes=2,
+        media_process_timeout_seconds=600.0,
+        trim_silence=False,
+        subject_weights={},
+        priority_lane_seconds=600.0,
+        eta_model_file="",
+        job_retention_seconds=30.0,
+        result_cache_bytes=0,
+        result_cache_ttl_seconds=3600.0,
+        stream_resume_grace_seconds=15.0,
         jwt_public_key_file=str(key_file),
         revoked_tokens_file=revoked_tokens_file,
         require_https=False,
         vllm_model_name="vibevoice",
         vllm_temperature=0.0,
         vllm_top_p=1.0,
+        vllm_stall_timeout_seconds=60.0,
+        vllm_max_model_len=48000,
+        vllm_kv_token_budget=48000,
+        vllm_priority_scheduling=False,
+        vllm_media_dir="",
+        vllm_window_seconds=0.0,
+        normalize_audio=False,
         groq_api_key="",
         groq_model_name="whisper-large-v3",
     )
@@ -80,17 +104,40 @@ def test_no_public_key_configured(tmp_path: object) -> None:
     revoked_file.write_text("")
     settings = Settings(
         asr_backend="vibevoice",
-        vllm_base_url="http://127.0.0.1:9999",
+        vllm_base_urls=["http://127.0.0.1:9999"],
         server_host="127.0.0.1",
         server_port=54912,
+        server_workers=1,
+        broker_socket_path="",
         max_audio_bytes=500 * 1024 * 1024,
+        audio_spool_dir="",
         max_queue_size=5,
+        max_queued_audio_seconds=0.0,
+        max_queued_audio_bytes=0,
+        max_concurrent_jobs=1,
+        max_media_processes=2,
+        media_process_timeout_seconds=600.0,
+        trim_silence=False,
+        subject_weights={},
+        priority_lane_seconds=600.0,
+        eta_model_file="",
+        job_retention_seconds=30.0,
+        result_cache_bytes=0,
+        result_cache_ttl_seconds=3600.0,
+        stream_resume_grace_seconds=15.0,
         jwt_public_key_file="",
         revoked_tokens_file=str(revoked_file),
         require_https=False,
         vllm_model_name="vibevoice",
         vllm_temperature=0.0,
         vllm_top_p=1.0,
+        vllm_stall_timeout_seconds=60.0,
+        vllm_max_model_len=48000,
+        vllm_kv_token_budget=48000,
+        vllm_priority_scheduling=False,
+        vllm_media_dir="",
+        vllm_window_seconds=0.0,
+        normalize_audio=False,
         groq_api_key="",
         groq_model_name="whisper-large-v3",
     )
@@ -176,3 +223,42 @@ def test_revocation_file_comments_ignored(tmp_path: object) -> None:
     # The jti appears only in a comment line, so it should NOT be revoked
     subject = verify_token(creds, settings)
     assert subject == "alice"
+
+
+def test_priority_claim_sets_ceiling(tmp_path: object) -> None:
+    _reset_caches()
+    revoked_file = Path(str(tmp_path)) / "revoked.txt"
+    revoked_file.write_text("")
+    settings = _make_settings(tmp_path, _PUBLIC_PEM, str(revoked_file))
+
+    plain = _sign("alice", uuid.uuid4().hex, _PRIVATE_KEY)
+    identity = verify_token_identity(
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=plain), settings
+    )
+    assert identity == TokenIdentity(subject="alice", max_priority=JobPriority.NORMAL)
+
+    typing_app = pyjwt.encode(
+        {"sub": "bob", "jti": uuid.uuid4().hex, "priority": "interactive"},
+        _PRIVATE_KEY,  # type: ignore[arg-type]
+        algorithm="ES256",
+    )
+    identity = verify_token_identity(
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=typing_app), settings
+    )
+    assert identity.max_priority == JobPriority.INTERACTIVE
+
+
+def test_unknown_priority_claim_rejected(tmp_path: object) -> None:
+    _reset_caches()
+    revoked_file = Path(str(tmp_path)) / "revoked.txt"
+    revoked_file.write_text("")
+    settings = _make_settings(tmp_path, _PUBLIC_PEM, str(revoked_file))
+    token = pyjwt.encode(
+        {"sub": "mallory", "jti": uuid.uuid4().hex, "priority": "urgent"},
+        _PRIVATE_KEY,  # type: ignore[arg-type]
+        algorithm="ES256",
+    )
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    with pytest.raises(HTTPException) as exc_info:
+        verify_token(creds, settings)
+    assert exc_info.value.status_code == 401
@@ -0,0 +1,428 @@
+import asyncio
+import base64
+import json
+import struct
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+
+import server.backend_pool
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
+from server.backend_pool import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    BackendPool,
+    NoBackendAvailableError,
+)
+from server.config import Settings
+from server.queue import TranscriptionJob
+from server.transcribe import process_vibevoice_job
+
+_SEGMENTS = '[{"Start": 0, "End": 1, "Content": "hi"}]'
+
+
+def _sse(*chunks: str) -> bytes:
+    events = [
+        f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n"
+        for chunk in chunks
+    ]
+    return ("".join(events) + "data: [DONE]\n\n").encode()
+
+
+async def test_jobs_go_to_least_loaded_backend() -> None:
+    async with httpx.AsyncClient() as client:
+        pool = BackendPool(["http://a", "http://b"], client)
+        first = pool.acquire()
+        second = pool.acquire()
+        assert {first.base_url, second.base_url} == {"http://a", "http://b"}
+        pool.release(first, ok=True, tokens=100, decode_seconds=1.0)
+        pool.release(second, ok=True, tokens=100, decode_seconds=4.0)
+
+        # a decodes four times as fast, so it takes jobs until it has four in flight.
+        picked = [pool.acquire().base_url for _ in range(5)]
+        assert picked.count("http://a") == 4
+        assert picked.count("http://b") == 1
+
+
+async def test_circuit_opens_after_failures_and_closes_after_trial(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(server.backend_pool, "CIRCUIT_OPEN_SECONDS", 0.05)
+    async with httpx.AsyncClient() as client:
+        pool = BackendPool(["http://a"], client)
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+            pool.release(pool.acquire(), ok=False)
+        with pytest.raises(NoBackendAvailableError):
+            pool.acquire()
+
+        await asyncio.sleep(0.06)
+        trial = pool.acquire()
+        # Half-open: only the one trial job until it reports back.
+        with pytest.raises(NoBackendAvailableError):
+            pool.acquire()
+        pool.release(trial, ok=True)
+        pool.release(pool.acquire(), ok=None)
+        assert pool.backends[0].circuit_open_until is None
+
+
+async def test_unhealthy_backend_is_skipped() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200 if request.url.host == "b" else 503)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a", "http://b"], client)
+        pool.start()
+        await asyncio.sleep(0.05)
+        await pool.stop()
+        assert [b.healthy for b in pool.backends] == [False, True]
+        assert {pool.acquire().base_url for _ in range(3)} == {"http://b"}
+
+
+async def test_job_is_redispatched_when_backend_fails_before_first_chunk(
+    settings: Settings,
+) -> None:
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url.host))
+        if request.url.host == "a":
+            return httpx.Response(500, content=b"CUDA out of memory")
+        return httpx.Response(200, content=_sse(_SEGMENTS))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a", "http://b"], client)
+        job = TranscriptionJob(audio_duration_seconds=1.0)
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+        chunks = [chunk async for _, chunk in job.chunk_stream.subscribe(0)]
+
+    assert requests == ["a", "b"]
+    assert chunks == [_SEGMENTS]
+    assert job.error_message is None
+    assert [b.consecutive_failures for b in pool.backends] == [1, 0]
+    assert [b.in_flight for b in pool.backends] == [0, 0]
+
+
+async def test_failure_after_first_chunk_is_not_redispatched(settings: Settings) -> None:
+    requests: list[str] = []
+
+    async def broken_stream() -> AsyncIterator[bytes]:
+        yield _sse('[{"Start": 0, "End": 1, "Content": "hi"}')[: -len("data: [DONE]\n\n")]
+        raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url.host))
+        return httpx.Response(200, content=broken_stream())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a", "http://b"], client)
+        job = TranscriptionJob(audio_duration_seconds=1.0)
+        with pytest.raises(httpx.ReadError):
+            await process_vibevoice_job(
+                job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+            )
+
+    assert len(requests) == 1
+    assert job.chunk_stream.last_id == 1
+
+
+async def test_loopback_backend_reads_audio_from_media_dir(
+    settings: Settings, tmp_path: Path
+) -> None:
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    settings = settings.model_copy(update={"vllm_media_dir": str(media_dir)})
+    audio_urls: list[str] = []
+    handed_over: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        url = payload["messages"][1]["content"][0]["audio_url"]["url"]
+        audio_urls.append(url)
+        if request.url.host == "remote":
+            return httpx.Response(500, content=b"CUDA out of memory")
+        handed_over.append(Path(url.removeprefix("file://")).read_bytes())
+        return httpx.Response(200, content=_sse(_SEGMENTS))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://remote", "http://127.0.0.1:37845"], client)
+        assert [b.local for b in pool.backends] == [False, True]
+        job = TranscriptionJob(
+            audio=AudioBuffer.in_memory(b"RIFF audio"),
+            audio_mime="audio/wav",
+            audio_duration_seconds=1.0,
+        )
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+
+    assert audio_urls[0] == "data:audio/wav;base64,UklGRiBhdWRpbw=="
+    assert audio_urls[1].startswith(media_dir.as_uri() + "/") and audio_urls[1].endswith(".wav")
+    assert handed_over == [b"RIFF audio"]
+    assert list(media_dir.iterdir()) == []
+
+
+async def test_normalized_audio_is_sent_and_reported(settings: Settings) -> None:
+    settings = settings.model_copy(update={"normalize_audio": True})
+    sent: list[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        url = payload["messages"][1]["content"][0]["audio_url"]["url"]
+        sent.append(base64.b64decode(url.removeprefix("data:audio/wav;base64,")))
+        return httpx.Response(200, content=_sse(_SEGMENTS))
+
+    data = bytes(48000 * 4)
+    fmt = struct.pack("<HHIIHH", 1, 2, 48000, 48000 * 4, 4, 16)
+    wav = (
+        b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    original = AudioBuffer.in_memory(wav)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(audio=original, audio_mime="audio/wav", audio_duration_seconds=1.0)
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+
+    assert original.wiped
+    assert struct.unpack_from("<HI", sent[0], 22) == (1, 24000)
+    assert len(sent[0]) == 44 + 24000 * 2
+    assert job.audio_bytes_saved == len(wav) - len(sent[0])
+
+
+async def test_trimmed_audio_times_are_mapped_back(settings: Settings) -> None:
+    settings = settings.model_copy(update={"trim_silence": True})
+    prompts: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        prompts.append(payload["messages"][1]["content"][1]["text"])
+        # Times split across chunks, as vLLM streams them token by token.
+        return httpx.Response(200, content=_sse(
+            '[{"Start": 0', '.5, "End', '": 2.0, "Content": "a"}, ',
+            '{"St', 'art": 2.5, "End": 3', '.0, "Content": "b"}]',
+        ))
+
+    rate = 16000
+    t = np.arange(rate * 2) / rate
+    speech = 0.3 * np.sin(2 * np.pi * 300 * t)
+    silence = 0.001 * np.random.default_rng(0).standard_normal(rate * 10)
+    samples = np.concatenate([speech, silence, speech])
+    data = np.rint(samples * 32767).astype("<i2").tobytes()
+    fmt = struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16)
+    wav = (
+        b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(
+            audio=AudioBuffer.in_memory(wav), audio_mime="audio/wav", audio_duration_seconds=14.0
+        )
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+        chunks = [chunk async for _, chunk in job.chunk_stream.subscribe(0)]
+
+    # 2 s of speech, a 0.3 s margin after it and before the next, then 2 s more,
+    # give or take the 30 ms analysis frame the speech ends in.
+    assert prompts[0].startswith("This is a 4.61 seconds audio")
+    assert job.trimmed_seconds == pytest.approx(9.39)
+    segments = json.loads("".join(chunks))
+    assert [(s["Start"], s["End"]) for s in segments] == [(0.5, 2.0), (11.89, 12.39)]
+    assert job.error_message is None
+
+
+async def test_long_audio_is_transcribed_in_windows(settings: Settings) -> None:
+    settings = settings.model_copy(update={"vllm_window_seconds": 60.0})
+    durations: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        duration = float(payload["messages"][1]["content"][1]["text"].split()[3])
+        durations.append(duration)
+        if duration > 54:
+            return httpx.Response(200, content=_sse(
+                '[{"Start": 0.0, "End": 50.0, "Speaker": 0, "Content": "one"},',
+                ' {"Start": 50.0, "End": 55.0, "Speaker": 1, "Content": "two"}]',
+            ))
+        # The second window starts 8 s before the boundary and hears "two" again.
+        segments = [
+            {"Start": 3.0, "End": 8.0, "Speaker": 0, "Content": "two"},
+            {"Start": 8.5, "End": 20.0, "Speaker": 1, "Content": "three"},
+        ]
+        return httpx.Response(200, content=_sse(json.dumps(segments)))
+
+    rate = 8000
+    t = np.arange(rate * 100) / rate
+    samples = 0.3 * np.sin(2 * np.pi * 300 * t)
+    samples[55 * rate : int(55.5 * rate)] = 0.0
+    data = np.rint(samples * 32767).astype("<i2").tobytes()
+    fmt = struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16)
+    wav = (
+        b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(
+            audio=AudioBuffer.in_memory(wav), audio_mime="audio/wav", audio_duration_seconds=100.0
+        )
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+        chunks = [chunk async for _, chunk in job.chunk_stream.subscribe(0)]
+
+    # Cut in the pause at 55 s, give or take a 30 ms analysis frame.
+    assert sorted(durations) == pytest.approx([52.83, 55.17])
+    assert job.error_message is None
+    # The first window streams as it arrives; the second is stitched on after it.
+    assert chunks[0].startswith('[{"Start": 0.0')
+    assert json.loads("".join(chunks)) == [
+        {"Start": 0.0, "End": 50.0, "Speaker": 0, "Content": "one"},
+        {"Start": 50.0, "End": 55.0, "Speaker": 1, "Content": "two"},
+        {"Start": 55.67, "End": 67.17, "Speaker": 0, "Content": "three"},
+    ]
+    assert [b.in_flight for b in pool.backends] == [0]
+
+
+async def test_repetition_loop_is_aborted_and_continued(settings: Settings) -> None:
+    first = '[{"Start": 0, "End": 1, "Content": "hi"}'
+    payloads: list[dict[str, object]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        if len(payloads) == 1:
+            return httpx.Response(
+                200, content=_sse(first, ', {"Start": 1, "End": 2, "Content": "', *["wop "] * 200)
+            )
+        return httpx.Response(200, content=_sse(', {"Start": 1, "End": 2, "Content": "bye"}]'))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(audio_duration_seconds=2.0)
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+        chunks = [chunk async for _, chunk in job.chunk_stream.subscribe(0)]
+
+    assert json.loads("".join(chunks)) == [
+        {"Start": 0, "End": 1, "Content": "hi"},
+        {"Start": 1, "End": 2, "Content": "bye"},
+    ]
+    assert job.error_message is None
+    assert len(payloads) == 2
+    retry = payloads[1]
+    assert (retry["temperature"], retry["top_p"]) == (0.2, 0.95)
+    assert retry["max_tokens"] == payloads[0]["max_tokens"] == 512
+    assert retry["continue_final_message"] is True
+    messages = retry["messages"]
+    assert isinstance(messages, list)
+    assert messages[-1] == {"role": "assistant", "content": first}
+    assert pool.backends[0].in_flight == 0
+
+
+async def test_max_tokens_stays_within_the_model_context(settings: Settings) -> None:
+    payloads: list[dict[str, object]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, content=_sse('[{"Start": 0, "End": 1, "Content": "hi"}]'))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        for minutes in (10, 30):
+            job = TranscriptionJob(audio_duration_seconds=minutes * 60.0)
+            await process_vibevoice_job(
+                job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+            )
+            assert job.error_message is None
+
+    # 6x the expected output for 10 minutes; for 30, what prompt and audio leave of 48000.
+    assert [p["max_tokens"] for p in payloads] == [16200, 48000 - 256 - 13500]
+
+
+async def test_repetition_loop_fails_the_job_after_retries(settings: Settings) -> None:
+    requests = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal requests
+        requests += 1
+        looping = _sse('[{"Start": 0, "End": 1, "Content": "', *["la "] * 200)
+        return httpx.Response(200, content=looping)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(audio_duration_seconds=1.0)
+        with pytest.raises(RuntimeError, match="repeating"):
+            await process_vibevoice_job(
+                job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+            )
+
+    assert requests == 4
+    assert job.chunk_stream.last_id == 0
+
+
+async def test_broken_off_transcription_resumes_after_last_segment(settings: Settings) -> None:
+    sent: list[tuple[str, bytes]] = []
+
+    async def broken_stream() -> AsyncIterator[bytes]:
+        yield _sse(
+            '[{"Start": 0, "End": 2.5, "Content": "a"}, ',
+            '{"Start": 2.5, "End": 4.0, "Content": "b"}, {"Start": 4.5, "End',
+        )[: -len("data: [DONE]\n\n")]
+        raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        url = payload["messages"][1]["content"][0]["audio_url"]["url"]
+        sent.append(
+            (
+                payload["messages"][1]["content"][1]["text"],
+                base64.b64decode(url.removeprefix("data:audio/wav;base64,")),
+            )
+        )
+        if len(sent) == 1:
+            return httpx.Response(200, content=broken_stream())
+        return httpx.Response(
+            200, content=_sse('[{"Start": 0.5, "End": 3', '.0, "Content": "c"}]')
+        )
+
+    rate = 8000
+    data = np.arange(rate * 10, dtype="<i2").tobytes()
+    fmt = struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16)
+    wav = (
+        b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        pool = BackendPool(["http://a"], client)
+        job = TranscriptionJob(
+            audio=AudioBuffer.in_memory(wav), audio_mime="audio/wav", audio_duration_seconds=10.0
+        )
+        await process_vibevoice_job(
+            job, http_client=client, config=settings, backends=pool, ffmpeg=FfmpegPool(1, 30.0)
+        )
+        chunks = [chunk async for _, chunk in job.chunk_stream.subscribe(0)]
+
+    assert json.loads("".join(chunks)) == [
+        {"Start": 0, "End": 2.5, "Content": "a"},
+        {"Start": 2.5, "End": 4.0, "Content": "b"},
+        {"Start": 4.5, "End": 7.0, "Content": "c"},
+    ]
+    assert job.error_message is None
+    # Only the 6 s after the last complete segment went out again.
+    prompt, resent = sent[1]
+    assert prompt.startswith("This is a 6.00 seconds audio")
+    assert resent[44:] == data[4 * rate * 2 :]
+    assert [b.in_flight for b in pool.backends] == [0]
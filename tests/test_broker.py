@@ -0,0 +1,243 @@
+import asyncio
+import os
+import stat
+import threading
+from collections.abc import AsyncIterator
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import server.broker
+from server.audio_buffer import AudioBuffer
+from server.broker import (
+    SETTINGS_FILE_ENV_VAR,
+    BrokerQueueService,
+    BrokerServer,
+    serve_with_workers,
+)
+from server.config import Settings
+from server.models import JobPriority, JobStatus
+from server.queue import QueueFullError, TranscriptionJob, TranscriptionQueue
+from server.queue_service import JobOutcome, JobStreamItem, JobSubmission, LocalQueueService
+
+
+def _submission(
+    token_fingerprint: str = "user1", content_key: str | None = None
+) -> JobSubmission:
+    return JobSubmission(
+        token_fingerprint=token_fingerprint,
+        audio_mime="audio/wav",
+        hotwords=None,
+        audio_duration_seconds=2.0,
+        priority=JobPriority.NORMAL,
+        content_key=content_key,
+    )
+
+
+@pytest.fixture
+async def broker(tmp_path: Path) -> AsyncIterator[tuple[TranscriptionQueue, BrokerQueueService]]:
+    queue = TranscriptionQueue(max_size=2)
+    server = BrokerServer(LocalQueueService(queue, ""), str(tmp_path / "broker.sock"))
+    await server.start()
+    queue.start_worker()
+    try:
+        yield queue, BrokerQueueService(str(tmp_path / "broker.sock"))
+    finally:
+        await server.close()
+        await queue.stop()
+
+
+async def _read_all(service: BrokerQueueService, job_id: str, after_id: int) -> list[JobStreamItem]:
+    return [item async for item in service.subscribe(job_id, after_id)]
+
+
+async def test_submitted_job_streams_through_broker(
+    broker: tuple[TranscriptionQueue, BrokerQueueService],
+) -> None:
+    queue, service = broker
+    received: list[bytes] = []
+
+    async def process(job: TranscriptionJob) -> None:
+        received.append(await job.audio.read())
+        for text in ("hello", " world"):
+            await job.chunk_stream.put(text)
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(process)
+    job_id = await service.submit(_submission(), AudioBuffer.in_memory(b"RIFF audio"))
+    view = await service.get_job(job_id)
+    assert view is not None and view.token_fingerprint == "user1"
+
+    items = await asyncio.wait_for(_read_all(service, job_id, 0), timeout=2.0)
+    assert items == [
+        (1, "hello"),
+        (2, " world"),
+        JobOutcome(status=JobStatus.COMPLETED, error_message=None, last_chunk_id=2),
+    ]
+    assert received == [b"RIFF audio"]
+    assert await _read_all(service, job_id, 1) == [(2, " world"), items[-1]]
+
+    info = await service.get_queue_info("user1")
+    assert [j.job_id for j in info.your_jobs] == [job_id]
+    assert (await service.describe_eta_model()).asr_backend == "vibevoice"
+    assert await service.get_job("missing") is None
+
+
+async def test_queue_full_crosses_the_broker(
+    broker: tuple[TranscriptionQueue, BrokerQueueService],
+) -> None:
+    queue, service = broker
+
+    async def blocking_process(_job: TranscriptionJob) -> None:
+        await asyncio.Event().wait()
+
+    queue.set_process_fn(blocking_process)
+    first = await service.submit(_submission(), AudioBuffer.in_memory(b"a"))
+    while queue.get_position_and_eta(first) != (None, None):
+        await asyncio.sleep(0.01)
+    queued = [
+        await service.submit(_submission(), AudioBuffer.in_memory(b"b")) for _ in range(2)
+    ]
+
+    with pytest.raises(QueueFullError, match="2 jobs queued") as exc_info:
+        await service.submit(_submission(), AudioBuffer.in_memory(b"c"))
+    assert exc_info.value.retry_after_seconds > 0
+    assert (await service.get_position_and_eta(queued[1]))[0] == 2
+
+
+async def test_closing_subscription_detaches_reader(
+    broker: tuple[TranscriptionQueue, BrokerQueueService],
+) -> None:
+    queue, service = broker
+
+    async def process(job: TranscriptionJob) -> None:
+        await job.chunk_stream.put("first")
+        await asyncio.Event().wait()
+
+    queue.set_process_fn(process)
+    job_id = await service.submit(_submission(), AudioBuffer.in_memory(b"a"))
+    items = service.subscribe(job_id, 0)
+    assert await asyncio.wait_for(anext(items), timeout=2.0) == (1, "first")
+    job = queue.get_job(job_id)
+    assert job is not None and job.chunk_stream.reader_count == 1
+
+    await items.aclose()
+    for _ in range(100):
+        if job.chunk_stream.reader_count == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert job.chunk_stream.reader_count == 0
+
+    await service.cancel_if_unattended(job_id, grace_seconds=0.0)
+    await asyncio.sleep(0.05)
+    assert job.status == JobStatus.CANCELLED
+
+
+async def test_identical_submissions_share_one_job(
+    broker: tuple[TranscriptionQueue, BrokerQueueService],
+) -> None:
+    queue, service = broker
+    release = asyncio.Event()
+    runs = 0
+
+    async def process(job: TranscriptionJob) -> None:
+        nonlocal runs
+        runs += 1
+        await job.chunk_stream.put("hello")
+        await release.wait()
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(process)
+    first = await service.submit(
+        _submission("user1", content_key="ab" * 32), AudioBuffer.in_memory(b"a")
+    )
+    second = await service.submit(
+        _submission("user2", content_key="ab" * 32), AudioBuffer.in_memory(b"a")
+    )
+    other = await service.submit(
+        _submission("user2", content_key="cd" * 32), AudioBuffer.in_memory(b"b")
+    )
+    assert second == first
+    assert other != first
+    view = await service.get_job(first)
+    assert view is not None and view.coalesced_subjects == ("user2",)
+
+    readers = [asyncio.create_task(_read_all(service, first, 0)) for _ in range(2)]
+    release.set()
+    results = await asyncio.wait_for(asyncio.gather(*readers), timeout=2.0)
+    assert results[0] == results[1]
+    assert results[0][0] == (1, "hello")
+    assert runs == 2
+
+
+async def test_other_submitters_keep_coalesced_job_alive(
+    broker: tuple[TranscriptionQueue, BrokerQueueService],
+) -> None:
+    queue, service = broker
+
+    async def blocking_process(_job: TranscriptionJob) -> None:
+        await asyncio.Event().wait()
+
+    queue.set_process_fn(blocking_process)
+    job_id = await service.submit(
+        _submission("user1", content_key="ab" * 32), AudioBuffer.in_memory(b"a")
+    )
+    readers = [service.subscribe(job_id, 0) for _ in range(2)]
+    pending = [asyncio.create_task(anext(items)) for items in readers]
+    job = queue.get_job(job_id)
+    assert job is not None
+    while job.chunk_stream.reader_count < 2:
+        await asyncio.sleep(0.01)
+
+    # The first submitter drops before its reader has detached.
+    await service.cancel_if_unattended(job_id, grace_seconds=0.0, own_reader_attached=True)
+    await asyncio.sleep(0.05)
+    assert job.status == JobStatus.PROCESSING
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for items in readers:
+        await items.aclose()
+
+
+class _InlineProcess:
+    def __init__(self, ready: threading.Event) -> None:
+        self._ready = ready
+
+    def start(self) -> None:
+        self._ready.set()
+
+    def terminate(self) -> None:
+        pass
+
+    def join(self) -> None:
+        pass
+
+
+def test_workers_read_settings_from_a_private_file(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings = settings.model_copy(update={"server_workers": 2, "groq_api_key": "gsk-secret"})
+    ready = threading.Event()
+    context = SimpleNamespace(
+        Event=lambda: ready, Process=lambda **_kwargs: _InlineProcess(ready)
+    )
+    monkeypatch.setattr(server.broker.multiprocessing, "get_context", lambda _method: context)
+    seen: list[tuple[str, int, Settings]] = []
+
+    def run(*_args: object, **_kwargs: object) -> None:
+        assert not any("gsk-secret" in value for value in os.environ.values())
+        path = os.environ[SETTINGS_FILE_ENV_VAR]
+        with open(path) as file:
+            received = Settings.model_validate_json(file.read())
+        seen.append((path, stat.S_IMODE(os.stat(path).st_mode), received))
+
+    monkeypatch.setattr(server.broker.uvicorn, "run", run)
+    monkeypatch.delenv(SETTINGS_FILE_ENV_VAR, raising=False)
+    serve_with_workers(settings)
+
+    [(path, mode, received)] = seen
+    assert mode == 0o600, f"Settings file mode {mode:o}"
+    assert received.groq_api_key == "gsk-secret"
+    assert not os.path.exists(path)
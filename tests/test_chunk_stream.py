@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from server.chunk_stream import ChunkReplayGapError, ChunkStream
+
+
+async def _read_all(stream: ChunkStream, after_id: int) -> list[tuple[int, str]]:
+    return [entry async for entry in stream.subscribe(after_id)]
+
+
+async def test_chunks_are_numbered_and_replayed_from_any_id() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    for text in ("a", "b", "c"):
+        await stream.put(text)
+    await stream.put(None)
+
+    assert stream.closed
+    assert await _read_all(stream, 0) == [(1, "a"), (2, "b"), (3, "c")]
+    assert await _read_all(stream, 2) == [(3, "c")]
+    assert await _read_all(stream, 3) == []
+
+
+async def test_live_reader_sees_chunks_as_they_arrive() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    reader = asyncio.create_task(_read_all(stream, 0))
+    await asyncio.sleep(0)
+    assert stream.reader_count == 1
+
+    await stream.put("a")
+    await stream.put("b")
+    await stream.put(None)
+
+    assert await asyncio.wait_for(reader, timeout=2.0) == [(1, "a"), (2, "b")]
+    assert stream.reader_count == 0
+
+
+async def test_put_yields_without_readers() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    ran = asyncio.Event()
+
+    async def producer() -> None:
+        while not ran.is_set():
+            await stream.put("x")
+
+    async def other() -> None:
+        ran.set()
+
+    task = asyncio.create_task(producer())
+    await asyncio.wait_for(asyncio.gather(task, other()), timeout=2.0)
+    assert stream.reader_count == 0
+
+
+async def test_slow_reader_applies_backpressure() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    reader = stream.subscribe(0)
+    assert stream.reader_count == 0
+    producer = asyncio.create_task(stream.put("first"))
+    assert await asyncio.wait_for(anext(reader), timeout=2.0) == (1, "first")
+    await producer
+
+    async def produce() -> None:
+        for i in range(10):
+            await stream.put(str(i))
+
+    producing = asyncio.create_task(produce())
+    await asyncio.sleep(0.05)
+    # The reader has not acknowledged chunk 1, so the producer stops max_lag ahead.
+    assert stream.last_id == 4
+    assert not producing.done()
+
+    await reader.aclose()
+    await asyncio.wait_for(producing, timeout=2.0)
+    assert stream.last_id == 11
+
+
+async def test_closed_reader_detaches() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    await stream.put("a")
+    reader = stream.subscribe(0)
+    await anext(reader)
+    assert stream.reader_count == 1
+    assert stream.subscriptions_opened == 1
+
+    await reader.aclose()
+    assert stream.reader_count == 0
+    assert stream.subscriptions_opened == 1
+
+
+async def test_evicted_chunks_raise_gap_error() -> None:
+    stream = ChunkStream(max_lag=2, replay_size=4)
+    for i in range(6):
+        await stream.put(str(i))
+    await stream.put(None)
+
+    assert stream.first_retained_id == 3
+    assert await _read_all(stream, 4) == [(5, "4"), (6, "5")]
+    reader = stream.subscribe(1)
+    with pytest.raises(ChunkReplayGapError):
+        await anext(reader)
+
+
+async def test_close_wakes_waiters() -> None:
+    stream = ChunkStream(max_lag=4, replay_size=16)
+    waiter = asyncio.create_task(stream.wait_closed())
+    reader = asyncio.create_task(_read_all(stream, 0))
+    await asyncio.sleep(0)
+
+    stream.close()
+    stream.close()
+
+    await asyncio.wait_for(waiter, timeout=2.0)
+    assert await asyncio.wait_for(reader, timeout=2.0) == []
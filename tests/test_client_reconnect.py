@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from functools import partial
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import client.client
+from client.client import VibevoiceClient
+from client.models import EventType
+
+
+async def _dropped_stream() -> AsyncIterator[bytes]:
+    yield b'event: queue\nid: 0\ndata: {"job_id": "job1", "position": 1, '
+    yield b'"estimated_wait_seconds": 3.0}\n\n'
+    yield b'id: 1\ndata: {"text": "hello"}\n\n'
+    raise httpx.ReadError("connection reset")
+
+
+async def test_transcribe_resumes_after_dropped_connection(tmp_path: Path) -> None:
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF")
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "POST":
+            return httpx.Response(200, headers={"X-Job-Id": "job1"}, content=_dropped_stream())
+        return httpx.Response(
+            200,
+            content=(
+                b'id: 2\ndata: {"text": " world"}\n\n'
+                b'event: segment\nid: 2\ndata: {"start": 0.0, "end": 1.0, "speaker": 0, '
+                b'"content": "hello world"}\n\n'
+                b'event: done\nid: 2\ndata: {"job_id": "job1"}\n\n'
+            ),
+        )
+
+    transport = httpx.MockTransport(handler)
+    with (
+        patch.object(httpx, "AsyncClient", partial(httpx.AsyncClient, transport=transport)),
+        patch.object(client.client, "RECONNECT_BACKOFF_SECONDS", 0.0),
+    ):
+        c = VibevoiceClient("http://test", "tok", verify=True)
+        events = [event async for event in c.transcribe(audio, hotwords=None)]
+
+    assert [e.event_type for e in events] == [
+        EventType.QUEUE,
+        EventType.DATA,
+        EventType.DATA,
+        EventType.SEGMENT,
+        EventType.DONE,
+    ]
+    assert "".join(e.text for e in events if e.text) == "hello world"
+    assert [(e.start, e.end, e.speaker, e.content) for e in events[3:4]] == [
+        (0.0, 1.0, 0, "hello world")
+    ]
+    assert requests[1].url.path == "/v1/jobs/job1/events"
+    assert requests[1].headers["Last-Event-ID"] == "1"
+
+
+async def test_transcribe_gives_up_after_repeated_failures(tmp_path: Path) -> None:
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF")
+    attempts: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.method)
+        if request.method == "POST":
+            return httpx.Response(200, headers={"X-Job-Id": "job1"}, content=_dropped_stream())
+        raise httpx.ConnectError("unreachable")
+
+    transport = httpx.MockTransport(handler)
+    with (
+        patch.object(httpx, "AsyncClient", partial(httpx.AsyncClient, transport=transport)),
+        patch.object(client.client, "RECONNECT_BACKOFF_SECONDS", 0.0),
+    ):
+        c = VibevoiceClient("http://test", "tok", verify=True)
+        with pytest.raises(httpx.ConnectError):
+            _ = [event async for event in c.transcribe(audio, hotwords=None)]
+
+    assert attempts == ["POST"] + ["GET"] * client.client.RECONNECT_ATTEMPTS
+
+
+async def _dropped_batch_stream() -> AsyncIterator[bytes]:
+    yield (
+        b'event: batch\ndata: {"files": [{"file": 0, "name": "a.wav", "job_id": "job1"}, '
+        b'{"file": 1, "name": "b.wav", "job_id": "job2"}]}\n\n'
+    )
+    yield b'data: {"file": 0, "chunk_id": 1, "text": "a1"}\n\n'
+    yield b'event: file-done\ndata: {"file": 0, "job_id": "job1"}\n\n'
+    yield b'event: progress\ndata: {"completed": 1, "failed": 0, "total": 2}\n\n'
+    yield b'data: {"file": 1, "chunk_id": 1, "text": "b1"}\n\n'
+    raise httpx.ReadError("connection reset")
+
+
+async def test_transcribe_batch_resumes_unfinished_files(tmp_path: Path) -> None:
+    paths = [tmp_path / "a.wav", tmp_path / "b.wav"]
+    for path in paths:
+        path.write_bytes(b"RIFF")
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "POST":
+            return httpx.Response(200, content=_dropped_batch_stream())
+        return httpx.Response(
+            200,
+            content=(
+                b'id: 2\ndata: {"text": "b2"}\n\n'
+                b'event: done\nid: 2\ndata: {"job_id": "job2"}\n\n'
+            ),
+        )
+
+    transport = httpx.MockTransport(handler)
+    with (
+        patch.object(httpx, "AsyncClient", partial(httpx.AsyncClient, transport=transport)),
+        patch.object(client.client, "RECONNECT_BACKOFF_SECONDS", 0.0),
+    ):
+        c = VibevoiceClient("http://test", "tok", verify=True)
+        events = [event async for event in c.transcribe_batch(paths, hotwords=None)]
+
+    assert events[0].event_type == EventType.BATCH
+    assert events[0].files == ["a.wav", "b.wav"]
+    assert [(e.file_index, e.text) for e in events if e.event_type == EventType.DATA] == [
+        (0, "a1"),
+        (1, "b1"),
+        (1, "b2"),
+    ]
+    assert [e.file_index for e in events if e.event_type == EventType.DONE] == [0, 1, None]
+    assert (events[-1].completed, events[-1].failed, events[-1].total) == (2, 0, 2)
+    assert [r.url.path for r in requests] == ["/v1/transcribe/batch", "/v1/jobs/job2/events"]
+    assert requests[1].headers["Last-Event-ID"] == "1"
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from server.eta import DEFAULT_JOB_SECONDS, EtaModel
+
+
+def test_cold_start_uses_default_guess() -> None:
+    model = EtaModel()
+    assert model.predict("vibevoice", 600.0) == DEFAULT_JOB_SECONDS
+    assert model.describe() == {}
+
+
+def test_learns_overhead_and_rate() -> None:
+    model = EtaModel()
+    for audio_seconds in (5.0, 60.0, 300.0, 1800.0) * 5:
+        model.observe("vibevoice", audio_seconds, 2.0 + 0.1 * audio_seconds)
+
+    fit = model.describe()["vibevoice"]
+    assert fit.overhead_seconds == pytest.approx(2.0)
+    assert fit.seconds_per_audio_second == pytest.approx(0.1)
+    assert fit.samples == 20
+    assert model.predict("vibevoice", 2700.0) == pytest.approx(272.0)
+    assert model.predict_total("vibevoice", 3, 100.0) == pytest.approx(16.0)
+
+
+def test_backends_are_fitted_separately() -> None:
+    model = EtaModel()
+    for audio_seconds in (10.0, 100.0):
+        model.observe("vibevoice", audio_seconds, 0.2 * audio_seconds)
+        model.observe("groq", audio_seconds, 1.0 + 0.01 * audio_seconds)
+
+    assert model.predict("vibevoice", 50.0) == pytest.approx(10.0)
+    assert model.predict("groq", 50.0) == pytest.approx(1.5)
+
+
+def test_equal_length_clips_predict_their_mean() -> None:
+    model = EtaModel()
+    model.observe("groq", 5.0, 1.0)
+    model.observe("groq", 5.0, 3.0)
+    fit = model.describe()["groq"]
+    assert fit.seconds_per_audio_second == 0.0
+    assert 1.0 < fit.overhead_seconds < 3.0
+
+
+def test_tracks_prediction_error() -> None:
+    model = EtaModel()
+    model.observe("vibevoice", 10.0, 40.0)
+    # First observation is scored against the 30s cold-start guess.
+    assert model.describe()["vibevoice"].mean_absolute_error_seconds == pytest.approx(10.0)
+
+
+def test_state_persists_across_restarts(tmp_path: Path) -> None:
+    state_file = tmp_path / "eta.json"
+    model = EtaModel(state_file=str(state_file))
+    for audio_seconds in (5.0, 600.0):
+        model.observe("vibevoice", audio_seconds, 1.0 + 0.05 * audio_seconds)
+
+    restored = EtaModel(state_file=str(state_file))
+    assert restored.describe() == model.describe()
+    assert restored.predict("vibevoice", 60.0) == pytest.approx(4.0)
+
+
+def test_corrupt_state_file_raises(tmp_path: Path) -> None:
+    state_file = tmp_path / "eta.json"
+    state_file.write_text(json.dumps({"version": 99}))
+    with pytest.raises(RuntimeError, match="unexpected format"):
+        EtaModel(state_file=str(state_file))
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from server.order_index import OrderIndex
+
+
+def test_rank_follows_key_order() -> None:
+    index: OrderIndex[int, str] = OrderIndex()
+    for key in (30, 10, 20):
+        index.insert(key, f"v{key}")
+
+    assert len(index) == 3
+    assert [index.rank(k) for k in (10, 20, 30)] == [0, 1, 2]
+    assert index.first() == (10, "v10")
+    assert list(index) == [(10, "v10"), (20, "v20"), (30, "v30")]
+
+
+def test_remove_updates_ranks() -> None:
+    index: OrderIndex[int, str] = OrderIndex()
+    for key in range(5):
+        index.insert(key, str(key))
+
+    assert index.remove(2) == "2"
+    assert index.rank(3) == 2
+    assert index.rank(4) == 3
+    assert len(index) == 4
+    with pytest.raises(KeyError):
+        index.rank(2)
+    with pytest.raises(KeyError):
+        index.remove(2)
+
+
+def test_empty_index() -> None:
+    index: OrderIndex[int, str] = OrderIndex()
+    assert index.first() is None
+    assert len(index) == 0
+    assert list(index) == []
+
+
+def test_matches_sorted_list_under_random_operations() -> None:
+    rng = random.Random(1234)
+    index: OrderIndex[tuple[float, int], int] = OrderIndex()
+    reference: list[tuple[float, int]] = []
+
+    for seq in range(2000):
+        if reference and rng.random() < 0.4:
+            key = reference.pop(rng.randrange(len(reference)))
+            assert index.remove(key) == key[1]
+        else:
+            key = (rng.random(), seq)
+            index.insert(key, seq, weight=float(seq % 7))
+            reference.append(key)
+            reference.sort()
+        if reference:
+            at = rng.randrange(len(reference))
+            count, weight = index.prefix(reference[at])
+            assert count == at
+            assert weight == pytest.approx(sum(float(k[1] % 7) for k in reference[:at]))
+            assert index.total_weight == pytest.approx(
+                sum(float(k[1] % 7) for k in reference)
+            )
+
+    assert [key for key, _ in index] == reference
@@ -2,8 +2,17 @@ import asyncio
 
 import pytest
 
-from server.models import JobStatus
-from server.queue import TranscriptionJob, TranscriptionQueue
+from server.audio_buffer import AudioBuffer
+from server.chunk_stream import ChunkStream
+from server.eta import EtaModel
+from server.models import JobPriority, JobStatus
+from server.queue import (
+    CHUNK_STREAM_MAX_LAG,
+    QueueFullError,
+    TranscriptionJob,
+    TranscriptionQueue,
+    estimate_kv_tokens,
+)
 
 
 @pytest.fixture
@@ -11,6 +20,10 @@ def queue() -> TranscriptionQueue:
     return TranscriptionQueue(max_size=5)
 
 
+async def _read_all(stream: ChunkStream) -> list[str]:
+    return [chunk async for _, chunk in stream.subscribe(0)]
+
+
 async def test_enqueue_and_position(queue: TranscriptionQueue) -> None:
     job1 = TranscriptionJob(token_fingerprint="user1111")
     job2 = TranscriptionJob(token_fingerprint="user2222")
@@ -38,25 +51,38 @@ async def test_queue_info_filters_by_fingerprint(queue: TranscriptionQueue) -> N
     assert info.total_queued == 2
 
 
+async def test_queue_info_of_trimmed_zero_length_audio(queue: TranscriptionQueue) -> None:
+    empty = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=0.0)
+    empty.trimmed_seconds = 0.0
+    trimmed = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=20.0)
+    trimmed.trimmed_seconds = 5.0
+    queue.enqueue(empty)
+    queue.enqueue(trimmed)
+
+    info = queue.get_queue_info("user1111")
+
+    assert [j.trimmed_seconds_ratio for j in info.your_jobs] == [None, 0.25]
+
+
 async def test_worker_processes_job(queue: TranscriptionQueue) -> None:
     processed: list[str] = []
 
     async def mock_process(job: TranscriptionJob) -> None:
         processed.append(job.job_id)
-        await job.chunk_queue.put("hello")
-        await job.chunk_queue.put(None)
+        await job.chunk_stream.put("hello")
+        await job.chunk_stream.put(None)
 
     queue.set_process_fn(mock_process)
     queue.start_worker()
 
-    job = TranscriptionJob(token_fingerprint="user1111", audio_base64="test_data")
+    job = TranscriptionJob(
+        token_fingerprint="user1111", audio=AudioBuffer.in_memory(b"test_data")
+    )
     queue.enqueue(job)
 
     # Wait for processing
-    chunk = await asyncio.wait_for(job.chunk_queue.get(), timeout=2.0)
-    assert chunk == "hello"
-    sentinel = await asyncio.wait_for(job.chunk_queue.get(), timeout=2.0)
-    assert sentinel is None
+    chunks = await asyncio.wait_for(_read_all(job.chunk_stream), timeout=2.0)
+    assert chunks == ["hello"]
     assert job.job_id in processed
 
     await queue.stop()
@@ -64,18 +90,20 @@ async def test_worker_processes_job(queue: TranscriptionQueue) -> None:
 
 async def test_worker_clears_audio_after_processing(queue: TranscriptionQueue) -> None:
     async def mock_process(job: TranscriptionJob) -> None:
-        await job.chunk_queue.put(None)
+        await job.chunk_stream.put(None)
 
     queue.set_process_fn(mock_process)
     queue.start_worker()
 
-    job = TranscriptionJob(token_fingerprint="user1111", audio_base64="big_audio_data")
+    job = TranscriptionJob(
+        token_fingerprint="user1111", audio=AudioBuffer.in_memory(b"big_audio_data")
+    )
     queue.enqueue(job)
 
-    await asyncio.wait_for(job.chunk_queue.get(), timeout=2.0)
+    await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
     # Give worker time to clean up
     await asyncio.sleep(0.1)
-    assert job.audio_base64 == ""
+    assert job.audio.wiped
 
     await queue.stop()
 
@@ -99,10 +127,519 @@ async def test_failed_job_sends_sentinel(queue: TranscriptionQueue) -> None:
     job = TranscriptionJob(token_fingerprint="user1111")
     queue.enqueue(job)
 
-    sentinel = await asyncio.wait_for(job.chunk_queue.get(), timeout=2.0)
-    assert sentinel is None
+    await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
     # Give worker time to update status
     await asyncio.sleep(0.1)
     assert job.status == JobStatus.FAILED
 
     await queue.stop()
+
+
+async def test_worker_pool_runs_jobs_concurrently() -> None:
+    queue = TranscriptionQueue(max_size=5, max_concurrent_jobs=2)
+    running: list[str] = []
+    release = asyncio.Event()
+
+    async def blocking_process(job: TranscriptionJob) -> None:
+        running.append(job.job_id)
+        await release.wait()
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(blocking_process)
+    queue.start_worker()
+
+    jobs = [TranscriptionJob(token_fingerprint="user1111") for _ in range(3)]
+    for job in jobs:
+        queue.enqueue(job)
+
+    await asyncio.sleep(0.1)
+    assert running == [jobs[0].job_id, jobs[1].job_id]
+    assert queue.get_position_and_eta(jobs[2].job_id)[0] == 1
+
+    release.set()
+    await asyncio.wait_for(jobs[2].chunk_stream.wait_closed(), timeout=2.0)
+    assert len(running) == 3
+
+    await queue.stop()
+
+
+async def test_kv_budget_holds_back_job_that_does_not_fit() -> None:
+    long_tokens = estimate_kv_tokens(600.0)
+    short_tokens = estimate_kv_tokens(5.0)
+    queue = TranscriptionQueue(
+        max_size=5,
+        max_concurrent_jobs=4,
+        kv_token_budget=long_tokens + short_tokens,
+    )
+    running: list[str] = []
+    release = asyncio.Event()
+
+    async def blocking_process(job: TranscriptionJob) -> None:
+        running.append(job.job_id)
+        await release.wait()
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(blocking_process)
+    queue.start_worker()
+
+    long_job = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=600.0)
+    short_job = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=5.0)
+    second_long = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=600.0)
+    for job in (long_job, short_job, second_long):
+        queue.enqueue(job)
+
+    await asyncio.sleep(0.1)
+    # The short clip packs in next to the long file; the second long file must wait.
+    assert running == [long_job.job_id, short_job.job_id]
+    assert second_long.status == JobStatus.QUEUED
+
+    release.set()
+    await asyncio.wait_for(second_long.chunk_stream.wait_closed(), timeout=2.0)
+    assert running[-1] == second_long.job_id
+
+    await queue.stop()
+
+
+async def test_job_larger_than_budget_runs_alone() -> None:
+    queue = TranscriptionQueue(max_size=5, max_concurrent_jobs=2, kv_token_budget=1000)
+    queue.start_worker()
+
+    job = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=3600.0)
+    queue.enqueue(job)
+
+    await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
+
+    await queue.stop()
+
+
+async def test_eta_accounts_for_concurrency() -> None:
+    queue = TranscriptionQueue(max_size=5, max_concurrent_jobs=2)
+    jobs = [TranscriptionJob(token_fingerprint="user1111") for _ in range(3)]
+    for job in jobs:
+        queue.enqueue(job)
+
+    etas = [queue.get_position_and_eta(job.job_id)[1] for job in jobs]
+    assert etas == [30.0, 30.0, 60.0]
+
+
+async def test_positions_shift_after_dispatch() -> None:
+    queue = TranscriptionQueue(max_size=5)
+    release = asyncio.Event()
+
+    async def blocking_process(job: TranscriptionJob) -> None:
+        await release.wait()
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(blocking_process)
+    jobs = [TranscriptionJob(token_fingerprint=f"user{i}") for i in range(3)]
+    for job in jobs:
+        queue.enqueue(job)
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in jobs] == [1, 2, 3]
+
+    queue.start_worker()
+    await asyncio.sleep(0.1)
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in jobs] == [None, 1, 2]
+
+    info = queue.get_queue_info("user0")
+    assert info.total_queued == 2
+    assert [(j.status, j.position) for j in info.your_jobs] == [(JobStatus.PROCESSING, None)]
+
+    release.set()
+    await queue.stop()
+
+
+async def test_fair_share_interleaves_heavy_user() -> None:
+    queue = TranscriptionQueue(max_size=10)
+    heavy = [
+        TranscriptionJob(token_fingerprint="heavy", audio_duration_seconds=3600.0)
+        for _ in range(4)
+    ]
+    for job in heavy:
+        queue.enqueue(job)
+    dictation = TranscriptionJob(token_fingerprint="light", audio_duration_seconds=5.0)
+    queue.enqueue(dictation)
+
+    assert queue.get_position_and_eta(dictation.job_id)[0] == 1
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in heavy] == [2, 3, 4, 5]
+
+
+async def test_fair_share_positions_match_dispatch_order() -> None:
+    queue = TranscriptionQueue(max_size=10)
+    dispatched: list[str] = []
+
+    async def record_process(job: TranscriptionJob) -> None:
+        dispatched.append(job.job_id)
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(record_process)
+    jobs = [
+        TranscriptionJob(token_fingerprint="a", audio_duration_seconds=100.0),
+        TranscriptionJob(token_fingerprint="a", audio_duration_seconds=100.0),
+        TranscriptionJob(token_fingerprint="b", audio_duration_seconds=150.0),
+        TranscriptionJob(token_fingerprint="c", audio_duration_seconds=10.0),
+    ]
+    for job in jobs:
+        queue.enqueue(job)
+    by_position = sorted(jobs, key=lambda j: queue.get_position_and_eta(j.job_id)[0] or 0)
+
+    queue.start_worker()
+    await asyncio.wait_for(by_position[-1].chunk_stream.wait_closed(), timeout=2.0)
+    assert dispatched == [j.job_id for j in by_position]
+    assert dispatched[0] == jobs[3].job_id
+
+    await queue.stop()
+
+
+async def test_subject_weights_scale_share() -> None:
+    queue = TranscriptionQueue(max_size=10, subject_weights={"vip": 4.0})
+    regular = [
+        TranscriptionJob(token_fingerprint="regular", audio_duration_seconds=60.0)
+        for _ in range(2)
+    ]
+    vip = [
+        TranscriptionJob(token_fingerprint="vip", audio_duration_seconds=60.0)
+        for _ in range(4)
+    ]
+    for job in [*regular, *vip]:
+        queue.enqueue(job)
+
+    # vip is charged 15s of virtual time per 60s job, regular the full 60s.
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in vip] == [1, 2, 3, 5]
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in regular] == [4, 6]
+
+
+async def test_eta_sums_predicted_time_of_jobs_ahead() -> None:
+    model = EtaModel()
+    for audio_seconds in (10.0, 100.0):
+        model.observe("vibevoice", audio_seconds, 1.0 + 0.5 * audio_seconds)
+    queue = TranscriptionQueue(max_size=5, eta_model=model)
+
+    long_job = TranscriptionJob(token_fingerprint="user1", audio_duration_seconds=600.0)
+    clip = TranscriptionJob(token_fingerprint="user1", audio_duration_seconds=4.0)
+    queue.enqueue(long_job)
+    queue.enqueue(clip)
+
+    _, long_eta = queue.get_position_and_eta(long_job.job_id)
+    _, clip_eta = queue.get_position_and_eta(clip.job_id)
+    assert long_eta == pytest.approx(301.0)
+    assert clip_eta == pytest.approx(301.0 + 3.0)
+
+    info = queue.describe_eta_model()
+    assert info.backends["vibevoice"].samples == 2
+
+
+async def test_completed_jobs_train_eta_model() -> None:
+    model = EtaModel()
+    queue = TranscriptionQueue(max_size=5, eta_model=model, asr_backend="groq")
+    queue.start_worker()
+
+    job = TranscriptionJob(token_fingerprint="user1", audio_duration_seconds=12.0)
+    queue.enqueue(job)
+    await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
+    await asyncio.sleep(0.05)
+
+    assert model.describe()["groq"].samples == 1
+    assert model.predict("groq", 12.0) < 1.0
+
+    await queue.stop()
+
+
+async def test_cancel_queued_job_removes_it(queue: TranscriptionQueue) -> None:
+    job1 = TranscriptionJob(token_fingerprint="user1111")
+    job2 = TranscriptionJob(token_fingerprint="user1111")
+    queue.enqueue(job1)
+    queue.enqueue(job2)
+
+    queue.cancel(job1.job_id)
+
+    assert job1.status == JobStatus.CANCELLED
+    assert queue.get_position_and_eta(job1.job_id) == (None, None)
+    assert queue.get_position_and_eta(job2.job_id)[0] == 1
+    await asyncio.wait_for(job1.chunk_stream.wait_closed(), timeout=2.0)
+
+
+async def test_cancel_running_job_cancels_process_fn(queue: TranscriptionQueue) -> None:
+    cancelled = asyncio.Event()
+
+    async def endless_process(job: TranscriptionJob) -> None:
+        try:
+            while True:
+                await job.chunk_stream.put("token")
+        finally:
+            cancelled.set()
+
+    queue.set_process_fn(endless_process)
+    queue.start_worker()
+
+    job = TranscriptionJob(token_fingerprint="user1111")
+    next_job = TranscriptionJob(token_fingerprint="user2222")
+    queue.enqueue(job)
+    queue.enqueue(next_job)
+    reader = job.chunk_stream.subscribe(0)
+    assert await asyncio.wait_for(anext(reader), timeout=2.0) == (1, "token")
+    await asyncio.sleep(0.05)
+    # The producer is blocked on the stalled reader.
+    assert job.chunk_stream.last_id == CHUNK_STREAM_MAX_LAG
+
+    queue.cancel(job.job_id)
+    await asyncio.wait_for(cancelled.wait(), timeout=2.0)
+    await asyncio.sleep(0.05)
+
+    assert job.status == JobStatus.CANCELLED
+    assert job.chunk_stream.closed
+    # The reader still gets what was produced, then the stream ends.
+    remaining = [chunk_id async for chunk_id, _ in reader]
+    assert remaining == list(range(2, CHUNK_STREAM_MAX_LAG + 1))
+    # The freed worker moves on to the next job.
+    assert next_job.status != JobStatus.QUEUED
+
+    await queue.stop()
+
+
+async def test_cancel_right_after_dispatch_frees_the_slot() -> None:
+    queue = TranscriptionQueue(max_size=5, max_concurrent_jobs=1)
+    processed: list[str] = []
+
+    async def process(job: TranscriptionJob) -> None:
+        processed.append(job.job_id)
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(process)
+    queue.start_worker()
+    job = TranscriptionJob(token_fingerprint="user1111")
+    next_job = TranscriptionJob(token_fingerprint="user2222")
+    queue.enqueue(job)
+    queue.enqueue(next_job)
+    while queue.get_position_and_eta(job.job_id)[0] is not None:
+        await asyncio.sleep(0)
+    # Dispatched, but its task has not taken its first step yet.
+    assert job.status == JobStatus.QUEUED, f"Job already {job.status}"
+
+    queue.cancel(job.job_id)
+    await asyncio.wait_for(next_job.chunk_stream.wait_closed(), timeout=2.0)
+
+    assert job.status == JobStatus.CANCELLED
+    assert job.chunk_stream.closed
+    assert processed == [next_job.job_id]
+    assert next_job.status == JobStatus.COMPLETED
+
+    await queue.stop()
+
+
+async def test_cancel_if_unattended_spares_reattached_job() -> None:
+    queue = TranscriptionQueue(max_size=5)
+    abandoned = TranscriptionJob(token_fingerprint="user1111")
+    resumed = TranscriptionJob(token_fingerprint="user1111")
+    queue.enqueue(abandoned)
+    queue.enqueue(resumed)
+
+    queue.cancel_if_unattended(abandoned.job_id, grace_seconds=0.05)
+    queue.cancel_if_unattended(resumed.job_id, grace_seconds=0.05)
+    reader = resumed.chunk_stream.subscribe(0)
+    pending_read = asyncio.ensure_future(anext(reader))
+    await asyncio.sleep(0.1)
+
+    assert abandoned.status == JobStatus.CANCELLED
+    assert resumed.status == JobStatus.QUEUED
+
+    pending_read.cancel()
+    await queue.stop()
+
+
+async def test_cancel_if_unattended_ignores_stale_reader() -> None:
+    # The server may not have noticed the dropped connection yet, leaving its
+    # reader attached; only a reader that subscribed after the drop counts.
+    queue = TranscriptionQueue(max_size=5)
+    job = TranscriptionJob(token_fingerprint="user1111")
+    queue.enqueue(job)
+    stale_reader = job.chunk_stream.subscribe(0)
+    pending_read = asyncio.ensure_future(anext(stale_reader))
+    await asyncio.sleep(0)
+
+    queue.cancel_if_unattended(job.job_id, grace_seconds=0.05, own_reader_attached=True)
+    await asyncio.sleep(0.1)
+
+    assert job.status == JobStatus.CANCELLED
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(pending_read, timeout=2.0)
+    await queue.stop()
+
+
+async def test_cancel_if_unattended_spares_job_with_other_readers() -> None:
+    queue = TranscriptionQueue(max_size=5)
+    job = TranscriptionJob(token_fingerprint="user1111")
+    queue.enqueue(job)
+    readers = [job.chunk_stream.subscribe(0) for _ in range(2)]
+    pending_reads = [asyncio.ensure_future(anext(reader)) for reader in readers]
+    await asyncio.sleep(0)
+
+    # One of two coalesced submitters drops; the other is still reading.
+    queue.cancel_if_unattended(job.job_id, grace_seconds=0.05, own_reader_attached=True)
+    await asyncio.sleep(0.1)
+
+    assert job.status == JobStatus.QUEUED
+    for pending_read in pending_reads:
+        pending_read.cancel()
+    await queue.stop()
+
+
+async def test_finished_jobs_expire_after_retention() -> None:
+    queue = TranscriptionQueue(max_size=5, job_retention_seconds=0.05)
+    queue.start_worker()
+
+    job = TranscriptionJob(token_fingerprint="user1111")
+    queue.enqueue(job)
+    await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
+    assert queue.get_job(job.job_id) is job
+
+    await asyncio.sleep(0.2)
+    assert queue.get_job(job.job_id) is None
+    assert queue.get_queue_info("user1111").your_jobs == []
+
+    await queue.stop()
+
+
+async def test_finished_jobs_share_one_expiry_task() -> None:
+    queue = TranscriptionQueue(max_size=50, max_concurrent_jobs=4, job_retention_seconds=0.05)
+    queue.start_worker()
+    jobs = [TranscriptionJob(token_fingerprint=f"user{i % 3}") for i in range(30)]
+    for job in jobs:
+        queue.enqueue(job)
+    for job in jobs:
+        await asyncio.wait_for(job.chunk_stream.wait_closed(), timeout=2.0)
+    tasks_while_retained = len(asyncio.all_tasks())
+    assert all(queue.get_job(job.job_id) is job for job in jobs)
+
+    await asyncio.sleep(0.2)
+    assert all(queue.get_job(job.job_id) is None for job in jobs)
+    # The test task, the dispatcher and the single expiry task.
+    assert tasks_while_retained == 3, f"Expected 3 live tasks, got: {tasks_while_retained}"
+    assert len(asyncio.all_tasks()) == 3
+
+    await queue.stop()
+
+
+async def test_eta_accounts_for_kv_budget() -> None:
+    # Room for one long file at a time, even though four workers are configured.
+    queue = TranscriptionQueue(
+        max_size=5, max_concurrent_jobs=4, kv_token_budget=estimate_kv_tokens(600.0)
+    )
+    jobs = [
+        TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=600.0)
+        for _ in range(3)
+    ]
+    for job in jobs:
+        queue.enqueue(job)
+
+    etas = [queue.get_position_and_eta(job.job_id)[1] for job in jobs]
+    assert etas == [30.0, 60.0, 90.0]
+
+
+async def test_cancel_and_resubmit_keeps_fair_share_position() -> None:
+    queue = TranscriptionQueue(max_size=10)
+    heavy = [
+        TranscriptionJob(token_fingerprint="heavy", audio_duration_seconds=3600.0)
+        for _ in range(5)
+    ]
+    for job in heavy:
+        queue.enqueue(job)
+
+    queue.cancel(heavy[-1].job_id)
+    resubmitted = TranscriptionJob(token_fingerprint="heavy", audio_duration_seconds=3600.0)
+    queue.enqueue(resubmitted)
+
+    assert [queue.get_position_and_eta(j.job_id)[0] for j in heavy[:-1]] == [1, 2, 3, 4]
+    assert queue.get_position_and_eta(resubmitted.job_id)[0] == 5
+
+
+async def test_unwritable_eta_state_file_does_not_stall_queue() -> None:
+    model = EtaModel(state_file="/nonexistent/dir/eta.json")
+    queue = TranscriptionQueue(max_size=5, eta_model=model)
+    queue.start_worker()
+
+    job1 = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=5.0)
+    job2 = TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=5.0)
+    queue.enqueue(job1)
+    queue.enqueue(job2)
+    await asyncio.wait_for(job2.chunk_stream.wait_closed(), timeout=2.0)
+    await asyncio.sleep(0.05)
+
+    assert job1.status == JobStatus.COMPLETED
+    assert job2.status == JobStatus.COMPLETED
+    assert model.describe()["vibevoice"].samples == 2
+
+    await queue.stop()
+
+
+async def test_interactive_job_gets_a_lane_head_start() -> None:
+    queue = TranscriptionQueue(max_size=10, priority_lane_seconds=600.0)
+    backlog = [
+        TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=300.0)
+        for _ in range(3)
+    ]
+    for job in backlog:
+        queue.enqueue(job)
+    clip = TranscriptionJob(
+        token_fingerprint="user1111",
+        audio_duration_seconds=5.0,
+        priority=JobPriority.INTERACTIVE,
+    )
+    queue.enqueue(clip)
+
+    # Stamped at 905 s of virtual time, sorted as 305 s: behind the first job only.
+    assert queue.get_position_and_eta(clip.job_id)[0] == 2
+
+
+async def test_batch_job_is_overtaken_by_at_most_one_lane() -> None:
+    queue = TranscriptionQueue(max_size=20, priority_lane_seconds=600.0)
+    batch = TranscriptionJob(
+        token_fingerprint="archive", audio_duration_seconds=10.0, priority=JobPriority.BATCH
+    )
+    queue.enqueue(batch)
+    later = [
+        TranscriptionJob(token_fingerprint="user1111", audio_duration_seconds=60.0)
+        for _ in range(15)
+    ]
+    for job in later:
+        queue.enqueue(job)
+
+    # Sorted at 10 + 600 s: newer work finishing by then goes first, the rest waits.
+    assert queue.get_position_and_eta(batch.job_id)[0] == 11
+
+
+async def test_queued_audio_seconds_cap_with_retry_after() -> None:
+    model = EtaModel()
+    for audio_seconds in (10.0, 100.0):
+        model.observe("vibevoice", audio_seconds, 1.0 + 0.5 * audio_seconds)
+    queue = TranscriptionQueue(max_size=10, eta_model=model, max_queued_audio_seconds=630.0)
+    queue.enqueue(TranscriptionJob(token_fingerprint="a", audio_duration_seconds=600.0))
+    queue.enqueue(TranscriptionJob(token_fingerprint="a", audio_duration_seconds=30.0))
+
+    with pytest.raises(QueueFullError) as exc_info:
+        queue.enqueue(TranscriptionJob(token_fingerprint="c", audio_duration_seconds=610.0))
+    # Both queued jobs must be dispatched first; the second starts after the 600 s one.
+    assert exc_info.value.retry_after_seconds == pytest.approx(301.0)
+    assert "630 s of audio queued" in exc_info.value.reason
+
+
+async def test_queued_audio_bytes_cap_frees_on_cancel() -> None:
+    queue = TranscriptionQueue(max_size=10, max_queued_audio_bytes=10)
+    first = TranscriptionJob(token_fingerprint="a", audio=AudioBuffer.in_memory(b"x" * 8))
+    queue.enqueue(first)
+
+    with pytest.raises(QueueFullError, match="8 bytes of audio queued"):
+        queue.enqueue(TranscriptionJob(audio=AudioBuffer.in_memory(b"x" * 4)))
+
+    queue.cancel(first.job_id)
+    queue.enqueue(TranscriptionJob(audio=AudioBuffer.in_memory(b"x" * 4)))
+
+
+async def test_oversized_job_is_admitted_into_empty_queue() -> None:
+    queue = TranscriptionQueue(
+        max_size=10, max_queued_audio_seconds=60.0, max_queued_audio_bytes=10
+    )
+    big = TranscriptionJob(audio=AudioBuffer.in_memory(b"x" * 20), audio_duration_seconds=90.0)
+    queue.enqueue(big)
+
+    with pytest.raises(QueueFullError):
+        queue.enqueue(TranscriptionJob(audio_duration_seconds=1.0))
@@ -0,0 +1,21 @@
+import json
+
+from server.repetition import ends_in_loop
+
+
+def test_loops_are_caught_at_any_cut() -> None:
+    start = '[{"Start": 0.0, "End": 4.2, "Speaker": 0, "Content": "'
+    for cut in range(12):
+        assert ends_in_loop(start + ("wop " * 40)[: 120 + cut])
+    assert ends_in_loop(start + "a" * 100)
+
+
+def test_ordinary_output_is_not_a_loop() -> None:
+    segments = [
+        {"Start": i * 2.5, "End": i * 2.5 + 2.5, "Speaker": i % 2, "Content": "Yes, yes, yes."}
+        for i in range(20)
+    ]
+    text = json.dumps(segments)
+    assert not ends_in_loop(text)
+    # Nine repeats of a short phrase is still speech.
+    assert not ends_in_loop(text[:-2] + ", " + "no, no, no " * 9)
@@ -0,0 +1,92 @@
+import asyncio
+
+from server.audio_buffer import AudioBuffer
+from server.models import JobPriority, JobStatus
+from server.queue import TranscriptionJob, TranscriptionQueue
+from server.queue_service import JobOutcome, JobSubmission, LocalQueueService
+from server.result_cache import ResultCache
+
+_KEY = "ab" * 32
+
+
+def test_get_returns_what_was_put() -> None:
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=60.0)
+    cache.put(_KEY, ["hello", " world"])
+    assert cache.get(_KEY) == ["hello", " world"]
+    assert cache.get("cd" * 32) is None
+
+
+def test_entries_are_encrypted() -> None:
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=60.0)
+    cache.put(_KEY, ["confidential board meeting"])
+    stored = b"".join(sealed for _, sealed in cache._entries.values())
+    assert b"confidential" not in stored
+    assert _KEY.encode() not in stored
+    assert bytes.fromhex(_KEY) not in b"".join(cache._entries)
+
+
+async def test_entries_expire() -> None:
+    cache = ResultCache(max_bytes=10_000, ttl_seconds=0.05)
+    cache.put(_KEY, ["hello"])
+    await asyncio.sleep(0.06)
+    assert cache.get(_KEY) is None
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def test_least_recently_used_entries_are_evicted() -> None:
+    keys = [f"{i:02x}" * 32 for i in range(3)]
+    cache = ResultCache(max_bytes=200, ttl_seconds=60.0)
+    cache.put(keys[0], ["x" * 50])
+    cache.put(keys[1], ["y" * 50])
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], ["z" * 50])
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ["x" * 50]
+    assert cache.size_bytes <= 200
+
+    cache.put(keys[1], ["too big" * 100])
+    assert cache.get(keys[1]) is None
+
+
+async def test_resubmission_is_answered_from_cache() -> None:
+    queue = TranscriptionQueue(max_size=5)
+    service = LocalQueueService(queue, "", result_cache=ResultCache(10_000, 60.0))
+    runs = 0
+
+    async def process(job: TranscriptionJob) -> None:
+        nonlocal runs
+        runs += 1
+        for text in ("hello", " world"):
+            await job.chunk_stream.put(text)
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(process)
+    submission = JobSubmission(
+        token_fingerprint="user1",
+        audio_mime="audio/wav",
+        hotwords=None,
+        audio_duration_seconds=2.0,
+        priority=JobPriority.NORMAL,
+        content_key=_KEY,
+    )
+    service.start()
+    try:
+        first = await service.submit(submission, AudioBuffer.in_memory(b"RIFF"))
+        first_items = await asyncio.wait_for(_read_all(service, first), timeout=2.0)
+        job = queue.get_job(first)
+        while job is not None and job.status != JobStatus.COMPLETED:
+            await asyncio.sleep(0.01)
+        second = await service.submit(submission, AudioBuffer.in_memory(b"RIFF"))
+        assert second != first
+        second_items = await _read_all(service, second)
+        assert second_items[:-1] == first_items[:-1] == [(1, "hello"), (2, " world")]
+        assert second_items[-1] == JobOutcome(
+            status=JobStatus.COMPLETED, error_message=None, last_chunk_id=2
+        )
+        assert runs == 1
+    finally:
+        await service.stop()
+
+
+async def _read_all(service: LocalQueueService, job_id: str) -> list[object]:
+    return [item async for item in service.subscribe(job_id, 0)]
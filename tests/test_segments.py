@@ -0,0 +1,114 @@
+from server.segments import (
+    Segment,
+    SegmentParser,
+    SegmentScanner,
+    WindowStitcher,
+    parse_segments,
+)
+
+
+def _segment(start: float, end: float, speaker: int, content: str) -> Segment:
+    return {"Start": start, "End": end, "Speaker": speaker, "Content": content}
+
+
+def test_parse_segments() -> None:
+    assert parse_segments('[{"Start": 0, "End": 1, "Content": "hi"}]') == [
+        {"Start": 0, "End": 1, "Content": "hi"}
+    ]
+    assert parse_segments('[{"Start": 0') is None
+    assert parse_segments('{"Start": 0}') is None
+    assert parse_segments("[1, 2]") is None
+
+
+def test_windows_are_shifted_and_overlap_dropped() -> None:
+    stitcher = WindowStitcher()
+    first = [_segment(0.0, 50.0, 0, "a"), _segment(50.0, 60.0, 1, "b")]
+    assert stitcher.add(first, 0.0, 0.0) == first
+
+    # The second window starts 10 s before the boundary at 60 s and repeats "b".
+    second = [_segment(0.0, 10.0, 0, "b"), _segment(10.0, 20.0, 1, "c")]
+    added = stitcher.add(second, 50.0, 10.0)
+
+    # The second window calls "b"'s speaker 0, who is speaker 1 overall. Its own speaker 1
+    # is then taken to be the speaker the overlap did not hear.
+    assert added == [_segment(60.0, 70.0, 0, "c")]
+
+
+def test_unmatched_speakers_keep_their_ids() -> None:
+    stitcher = WindowStitcher()
+    stitcher.add([_segment(0.0, 30.0, 0, "a"), _segment(30.0, 60.0, 1, "b")], 0.0, 0.0)
+
+    added = stitcher.add(
+        [_segment(0.0, 10.0, 1, "b"), _segment(10.0, 15.0, 0, "c"), _segment(15.0, 20.0, 1, "d")],
+        50.0,
+        10.0,
+    )
+
+    assert added == [_segment(60.0, 65.0, 0, "c"), _segment(65.0, 70.0, 1, "d")]
+
+
+def test_speakers_new_in_a_window_get_new_ids() -> None:
+    stitcher = WindowStitcher()
+    stitcher.add([_segment(0.0, 60.0, 0, "a")], 0.0, 0.0)
+
+    added = stitcher.add([_segment(0.0, 10.0, 1, "a"), _segment(10.0, 20.0, 0, "b")], 50.0, 10.0)
+
+    assert added == [_segment(60.0, 70.0, 1, "b")]
+
+
+def test_scanner_finds_the_end_of_each_complete_segment() -> None:
+    scanner = SegmentScanner()
+    first = '[{"Start": 0, "End": 1, "Content": "a } \\" ]"}'
+    scanner.feed(first[:10])
+    assert scanner.complete == 0
+    scanner.feed(first[10:] + ', {"Start": 1, "End"')
+    assert scanner.complete == len(first)
+    scanner.feed(': 2, "Content": "b"}]')
+    assert scanner.complete == len(first) + len(', {"Start": 1, "End": 2, "Content": "b"}]')
+
+
+def test_parser_returns_segments_as_they_complete() -> None:
+    output = '[{"Start": 0, "End": 1, "Content": "a }"}, {"Start": 1, "End": 2, "Content": "b"}]'
+    parser = SegmentParser()
+    completed = [
+        [segment["Content"] for segment in parser.feed(output[i : i + 7])]
+        for i in range(0, len(output), 7)
+    ]
+    parser.finish()
+
+    assert parser.error is None
+    assert [c for c in completed if c] == [["a }"], ["b"]]
+    assert completed[5] == ["a }"]  # The chunk holding the first closing brace
+
+    resumed = SegmentParser(resumed=True)
+    assert resumed.feed(', {"Content": "c"}, {"Content": "d"}') == [
+        {"Content": "c"},
+        {"Content": "d"},
+    ]
+    assert resumed.feed("]") == []
+    resumed.finish()
+    assert resumed.error is None
+
+
+def test_parser_reports_the_first_problem() -> None:
+    def error(*chunks: str) -> str | None:
+        parser = SegmentParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.finish()
+        return parser.error
+
+    assert error("[]") is None
+    assert error('{"Content": "a"}') == "is not a JSON list"
+    assert error("Hello there") == "is not a JSON list"
+    assert error('[{"Content": "a"}') == "ends inside the segment list"
+    assert error('[{"Content": "a"}, ', "]") == (
+        "is not valid JSON: stray comma after 1 segments"
+    )
+    assert error('[{"Content": "a"}', ' {"Content": "b"}]') == (
+        "is not valid JSON: no comma before segment[1]"
+    )
+    assert error('[{"Content": "a"}, "b"]') == "has segment[1] of type str, expected object"
+    assert error('[{"Start": 0}]') == "has segment[0] without Content, keys=['Start']"
+    assert error('[{"Content": "a"}]', " trailing") == "goes on after the end of the segment list"
+    assert (error('[{"Content": nope}]') or "").startswith("is not valid JSON")
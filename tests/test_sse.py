@@ -0,0 +1,47 @@
+import json
+from collections.abc import AsyncIterator
+
+import pytest
+
+from server.sse import JsonDecoder, available_decoders, delta_content, sse_data
+
+
+async def _data(*chunks: bytes) -> list[bytes]:
+    async def stream() -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+
+    return [data async for data in sse_data(stream())]
+
+
+async def test_events_are_split_across_chunks() -> None:
+    body = b'data: {"a": 1}\n\n: keep-alive\n\ndata: {"b": 2}\r\n\r\ndata:[DONE]\n\n'
+    expected = [b'{"a": 1}', b'{"b": 2}', b"[DONE]"]
+    assert await _data(body) == expected
+    # Every possible cut, including between a CR and its LF.
+    for cut in range(1, len(body)):
+        assert await _data(body[:cut], body[cut:]) == expected
+
+
+async def test_multi_line_and_unterminated_events() -> None:
+    body = b"event: message\nid: 3\ndata: one\ndata: two\n\nretry: 10\n\ndata: last"
+    assert await _data(body) == [b"one\ntwo", b"last"]
+
+
+@pytest.mark.parametrize("decoder", available_decoders(), ids=lambda d: d.name)
+def test_delta_content(decoder: JsonDecoder) -> None:
+    def chunk(delta: object, separators: tuple[str, str] = (", ", ": ")) -> bytes:
+        frame = {"id": "x", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        return json.dumps(frame, separators=separators, ensure_ascii=False).encode()
+
+    # vLLM's compact form, read without decoding unless there are escapes.
+    for content in ("wop", " é", "", 'Say "hi"', "a\\b\n"):
+        compact = chunk({"content": content}, separators=(",", ":"))
+        assert delta_content(compact, decoder) == content
+    assert delta_content(chunk({"content": 'Say "\\u00e9" \\n'}), decoder) == 'Say "\\u00e9" \\n'
+    assert delta_content(chunk({"content": "é"}), decoder) == "é"
+    assert delta_content(chunk({"role": "assistant"}), decoder) is None
+    assert delta_content(chunk({"content": None}), decoder) is None
+    assert delta_content(b'{"choices": []}', decoder) is None
+    assert delta_content(b'{"choices": [{"delta": {"content": "x"', decoder) is None
+    assert delta_content(b'["content"]', decoder) is None
@@ -1,21 +1,35 @@
+import asyncio
+import io
+import json
 import struct
 import uuid
+import zipfile
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
 import httpx
 import jwt as pyjwt
 import pytest
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import FastAPI
 from httpx import ASGITransport
+from starlette.types import Message, Scope
 
 import server.auth
+import server.queue
+import server.routes.transcribe
 from server.app import create_app
+from server.audio import FfmpegPool
+from server.audio_buffer import AudioBuffer
 from server.auth import _load_public_key
+from server.broker import BrokerQueueService, BrokerServer
 from server.config import Settings
-from server.queue import TranscriptionQueue
+from server.models import JobStatus
+from server.queue import CHUNK_STREAM_MAX_LAG, TranscriptionJob, TranscriptionQueue
+from server.queue_service import LocalQueueService
 
 _PRIVATE_KEY = ec.generate_private_key(ec.SECP256R1())
 _PUBLIC_PEM = _PRIVATE_KEY.public_key().public_bytes(
@@ -28,6 +42,11 @@ TEST_TOKEN = pyjwt.encode(
     _PRIVATE_KEY,
     algorithm="ES256",
 )
+OTHER_TOKEN = pyjwt.encode(
+    {"sub": "other-user", "jti": uuid.uuid4().hex},
+    _PRIVATE_KEY,
+    algorithm="ES256",
+)
 
 
 def _make_wav(sample_rate: int, num_samples: int) -> bytes:
@@ -67,17 +86,40 @@ def _make_all_settings(tmp_path: Path, **overrides: object) -> Settings:
     revoked_file.write_text("")
     values: dict[str, object] = {
         "asr_backend": "vibevoice",
-        "vllm_base_url": "http://127.0.0.1:37845",
+        "vllm_base_urls": ["http://127.0.0.1:37845"],
         "server_host": "127.0.0.1",
         "server_port": 54912,
+        "server_workers": 1,
+        "broker_socket_path": "",
         "max_audio_bytes": 500 * 1024 * 1024,
+        "audio_spool_dir": "",
         "max_queue_size": 5,
+        "max_queued_audio_seconds": 0.0,
+        "max_queued_audio_bytes": 0,
+        "max_concurrent_jobs": 1,
+        "max_media_processes": 2,
+        "media_process_timeout_seconds": 600.0,
+        "trim_silence": False,
+        "subject_weights": {},
+        "priority_lane_seconds": 600.0,
+        "eta_model_file": "",
+        "job_retention_seconds": 30.0,
+        "result_cache_bytes": 0,
+        "result_cache_ttl_seconds": 3600.0,
+        "stream_resume_grace_seconds": 15.0,
         "jwt_public_key_file": str(key_file),
         "revoked_tokens_file": str(revoked_file),
         "require_https": False,
         "vllm_model_name": "vibevoice",
         "vllm_temperature": 0.0,
         "vllm_top_p": 1.0,
+        "vllm_stall_timeout_seconds": 60.0,
+        "vllm_max_model_len": 48000,
+        "vllm_kv_token_budget": 48000,
+        "vllm_priority_scheduling": False,
+        "vllm_media_dir": "",
+        "vllm_window_seconds": 0.0,
+        "normalize_audio": False,
         "groq_api_key": "",
         "groq_model_name": "whisper-large-v3",
     }
@@ -90,28 +132,99 @@ def settings(tmp_path: Path) -> Settings:
     return _make_all_settings(tmp_path)
 
 
+@asynccontextmanager
+async def _lifespan_app(settings: Settings) -> AsyncIterator[FastAPI]:
+    """Create an app with the state that lifespan would create."""
+    app = create_app(settings=settings)
+    app.state.http_client = httpx.AsyncClient()
+    app.state.ffmpeg = FfmpegPool(
+        settings.max_media_processes, settings.media_process_timeout_seconds
+    )
+    app.state.queue = TranscriptionQueue(max_size=settings.max_queue_size)
+    app.state.queue_service = LocalQueueService(app.state.queue, settings.audio_spool_dir)
+    app.state.queue.start_worker()
+    try:
+        yield app
+    finally:
+        await app.state.queue.stop()
+        await app.state.http_client.aclose()
+
+
 @asynccontextmanager
 async def _lifespan_client(
     settings: Settings,
 ) -> AsyncIterator[httpx.AsyncClient]:
     """Create an app with lifespan and return an httpx client."""
-    app = create_app(settings=settings)
-    transport = ASGITransport(app=app, raise_app_exceptions=False)
-    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
-        # Manually set up app state that lifespan would create
-        app.state.http_client = httpx.AsyncClient()
-        app.state.queue = TranscriptionQueue(max_size=settings.max_queue_size)
-        app.state.queue.start_worker()
-        try:
+    async with _lifespan_app(settings) as app:
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
             yield client
-        finally:
-            await app.state.queue.stop()
-            await app.state.http_client.aclose()
+
+
+async def _fake_probe_duration(_audio: AudioBuffer, _ffmpeg: FfmpegPool) -> float:
+    return 0.1
+
+
+class _DisconnectingClient:
+    """Raw ASGI client that streams one transcribe response and can hang up mid-stream.
+
+    httpx's ASGITransport buffers the whole response, so it cannot observe a
+    stream in progress or disconnect from one.
+    """
+
+    def __init__(self, app: FastAPI) -> None:
+        self._app = app
+        self._disconnected = asyncio.Event()
+        self._body_sent = False
+        self.body = b""
+        self.received = asyncio.Event()
+
+    async def _receive(self) -> Message:
+        if not self._body_sent:
+            self._body_sent = True
+            return {"type": "http.request", "body": self._request.read(), "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message: Message) -> None:
+        if message["type"] == "http.response.body":
+            self.body += message.get("body", b"")
+            self.received.set()
+
+    def start(self) -> asyncio.Task[None]:
+        self._request = httpx.Request(
+            "POST",
+            "http://test/v1/transcribe",
+            headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+            files={"audio": ("test.wav", _make_wav(16000, 1600), "audio/wav")},
+        )
+        scope: Scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/v1/transcribe",
+            "raw_path": b"/v1/transcribe",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(k.lower(), v) for k, v in self._request.headers.raw],
+            "client": ("127.0.0.1", 12345),
+            "server": ("test", 80),
+        }
+        return asyncio.create_task(self._app(scope, self._receive, self._send))
+
+    async def wait_for(self, marker: bytes) -> None:
+        while marker not in self.body:
+            self.received.clear()
+            await asyncio.wait_for(self.received.wait(), timeout=2.0)
+
+    def disconnect(self) -> None:
+        self._disconnected.set()
 
 
 async def test_health_endpoint(tmp_path: Path) -> None:
     # Use an unreachable port so vLLM health check fails
-    s = _make_all_settings(tmp_path, vllm_base_url="http://127.0.0.1:1")
+    s = _make_all_settings(tmp_path, vllm_base_urls=["http://127.0.0.1:1"])
     async with _lifespan_client(s) as client:
         resp = await client.get("/health")
         assert resp.status_code == 200
@@ -185,3 +298,511 @@ async def test_https_required_passes_with_header(tmp_path: Path) -> None:
             },
         )
         assert resp.status_code == 200
+
+
+async def test_eta_model_endpoint(settings: Settings) -> None:
+    async with _lifespan_client(settings) as client:
+        resp = await client.get(
+            "/v1/queue/eta-model",
+            headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["asr_backend"] == "vibevoice"
+        assert data["backends"] == {}
+
+
+async def test_disconnect_cancels_queued_job(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    settings = _make_all_settings(tmp_path, stream_resume_grace_seconds=0.0)
+    async with _lifespan_app(settings) as app:
+        queue: TranscriptionQueue = app.state.queue
+        blocker_started = asyncio.Event()
+
+        async def blocking_process(_job: TranscriptionJob) -> None:
+            blocker_started.set()
+            await asyncio.Event().wait()
+
+        queue.set_process_fn(blocking_process)
+        queue.enqueue(TranscriptionJob(token_fingerprint="other"))
+        await asyncio.wait_for(blocker_started.wait(), timeout=2.0)
+
+        client = _DisconnectingClient(app)
+        response = client.start()
+        await client.wait_for(b"event: queue")
+        data_line = client.body.split(b"data: ", 1)[1].split(b"\n", 1)[0]
+        job = queue.get_job(json.loads(data_line)["job_id"])
+        assert job is not None and job.status == JobStatus.QUEUED
+
+        client.disconnect()
+        await asyncio.wait_for(response, timeout=2.0)
+        await asyncio.sleep(0.05)
+
+        assert job.status == JobStatus.CANCELLED
+        assert queue.get_position_and_eta(job.job_id) == (None, None)
+
+
+async def test_disconnect_cancels_running_job(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    settings = _make_all_settings(tmp_path, stream_resume_grace_seconds=0.0)
+    async with _lifespan_app(settings) as app:
+        queue: TranscriptionQueue = app.state.queue
+        running: list[TranscriptionJob] = []
+
+        async def streaming_process(job: TranscriptionJob) -> None:
+            running.append(job)
+            await job.chunk_stream.put("hello")
+            await asyncio.Event().wait()
+
+        queue.set_process_fn(streaming_process)
+
+        client = _DisconnectingClient(app)
+        response = client.start()
+        await client.wait_for(b"hello")
+        assert b"id: 1\n" in client.body
+        assert [job.status for job in running] == [JobStatus.PROCESSING]
+
+        client.disconnect()
+        await asyncio.wait_for(response, timeout=2.0)
+        await asyncio.sleep(0.05)
+
+        assert running[0].status == JobStatus.CANCELLED
+
+
+async def _post_transcribe(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post(
+        "/v1/transcribe",
+        headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+        files={"audio": ("test.wav", _make_wav(16000, 1600), "audio/wav")},
+    )
+
+
+async def test_resume_replays_chunks_after_last_event_id(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            for text in ("one", "two", "three"):
+                await job.chunk_stream.put(text)
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await _post_transcribe(client)
+            assert first.status_code == 200
+            assert "id: 3\ndata: " in first.text
+            job_id = first.headers["X-Job-Id"]
+
+            resumed = await client.get(
+                f"/v1/jobs/{job_id}/events",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "1"},
+            )
+            assert resumed.status_code == 200
+            assert "id: 1\n" not in resumed.text
+            assert "id: 2\ndata: " in resumed.text
+            assert "id: 3\ndata: " in resumed.text
+            assert "event: done\nid: 3\n" in resumed.text
+
+            bad = await client.get(
+                f"/v1/jobs/{job_id}/events",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "7"},
+            )
+            assert bad.status_code == 400
+
+            other = await client.get(
+                f"/v1/jobs/{job_id}/events",
+                headers={"Authorization": f"Bearer {OTHER_TOKEN}"},
+            )
+            assert other.status_code == 404
+
+
+async def test_segments_are_sent_once_complete(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            chunks = (
+                '[{"Start": 0, "End": 1.5, "Speaker": 0, "Content": "one"}',
+                ', {"Start": 1.5, "End": 3, "Speaker": 1, "Content": "two"}',
+                ', {"Start": 3, "End": 4, "Content": ',
+                '"three"}]',
+            )
+            for text in chunks:
+                await job.chunk_stream.put(text)
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await _post_transcribe(client)
+            events = _sse_events(first.text)
+            assert [kind for kind, _ in events] == [
+                "data", "segment", "data", "segment", "data", "data", "segment", "done"
+            ]
+            assert [e for kind, e in events if kind == "segment"] == [
+                {"start": 0.0, "end": 1.5, "speaker": 0, "content": "one"},
+                {"start": 1.5, "end": 3.0, "speaker": 1, "content": "two"},
+                {"start": 3.0, "end": 4.0, "speaker": None, "content": "three"},
+            ]
+            assert "event: segment\nid: 2\n" in first.text
+
+            resumed = await client.get(
+                f"/v1/jobs/{first.headers['X-Job-Id']}/events",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "2"},
+            )
+            segments = [e for kind, e in _sse_events(resumed.text) if kind == "segment"]
+            assert [s["content"] for s in segments] == ["three"]
+
+
+async def test_resume_past_replay_log_is_gone(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    monkeypatch.setattr(server.queue, "CHUNK_REPLAY_SIZE", CHUNK_STREAM_MAX_LAG + 1)
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            for i in range(CHUNK_STREAM_MAX_LAG + 10):
+                await job.chunk_stream.put(str(i))
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await _post_transcribe(client)
+            resumed = await client.get(
+                f"/v1/jobs/{first.headers['X-Job-Id']}/events",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "1"},
+            )
+            assert resumed.status_code == 410
+
+
+async def test_client_can_resume_within_grace_period(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    settings = _make_all_settings(tmp_path, stream_resume_grace_seconds=0.2)
+    async with _lifespan_app(settings) as app:
+        queue: TranscriptionQueue = app.state.queue
+        running: list[TranscriptionJob] = []
+        release = asyncio.Event()
+
+        async def process(job: TranscriptionJob) -> None:
+            running.append(job)
+            await job.chunk_stream.put("hello")
+            await release.wait()
+            await job.chunk_stream.put("world")
+            await job.chunk_stream.put(None)
+
+        queue.set_process_fn(process)
+        dropped = _DisconnectingClient(app)
+        response = dropped.start()
+        await dropped.wait_for(b"hello")
+        dropped.disconnect()
+        await asyncio.wait_for(response, timeout=2.0)
+
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resuming = asyncio.create_task(
+                client.get(
+                    f"/v1/jobs/{running[0].job_id}/events",
+                    headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "1"},
+                )
+            )
+            # Outlive the grace period: the resumed reader keeps the job alive.
+            await asyncio.sleep(0.3)
+            assert running[0].status == JobStatus.PROCESSING
+            release.set()
+            resumed = await asyncio.wait_for(resuming, timeout=2.0)
+
+        assert resumed.status_code == 200
+        assert "hello" not in resumed.text
+        assert "world" in resumed.text
+        assert "event: done" in resumed.text
+        assert running[0].status == JobStatus.COMPLETED
+
+
+async def test_transcribe_rejects_priority_above_token_ceiling(settings: Settings) -> None:
+    async with _lifespan_client(settings) as client:
+        resp = await client.post(
+            "/v1/transcribe",
+            params={"priority": "interactive"},
+            headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+            files={"audio": ("test.wav", _make_wav(16000, 1600), "audio/wav")},
+        )
+        assert resp.status_code == 403
+
+
+async def test_full_queue_returns_retry_after(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    settings = _make_all_settings(tmp_path, max_queue_size=1)
+    async with _lifespan_app(settings) as app:
+        queue: TranscriptionQueue = app.state.queue
+        blocker_started = asyncio.Event()
+
+        async def blocking_process(_job: TranscriptionJob) -> None:
+            blocker_started.set()
+            await asyncio.Event().wait()
+
+        queue.set_process_fn(blocking_process)
+        queue.enqueue(TranscriptionJob(token_fingerprint="other"))
+        await asyncio.wait_for(blocker_started.wait(), timeout=2.0)
+        queue.enqueue(TranscriptionJob(token_fingerprint="other"))
+
+        transport = ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/v1/transcribe",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                files={"audio": ("test.wav", _make_wav(16000, 1600), "audio/wav")},
+            )
+        assert resp.status_code == 503
+        assert "1 jobs queued" in resp.json()["detail"]
+        assert int(resp.headers["Retry-After"]) >= 1
+
+
+async def test_workers_share_one_queue_through_broker(
+    settings: Settings, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    queue = TranscriptionQueue(max_size=5)
+
+    async def process(job: TranscriptionJob) -> None:
+        for text in ("one", "two"):
+            await job.chunk_stream.put(text)
+        await job.chunk_stream.put(None)
+
+    queue.set_process_fn(process)
+    queue.start_worker()
+    socket_path = str(tmp_path / "broker.sock")
+    broker = BrokerServer(LocalQueueService(queue, ""), socket_path)
+    await broker.start()
+    workers = [create_app(settings=settings) for _ in range(2)]
+    for app in workers:
+        app.state.queue_service = BrokerQueueService(socket_path)
+        app.state.ffmpeg = FfmpegPool(1, 30.0)
+    try:
+        clients = [
+            httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+            for app in workers
+        ]
+        first = await _post_transcribe(clients[0])
+        assert first.status_code == 200
+        assert "id: 2\ndata: " in first.text
+        job_id = first.headers["X-Job-Id"]
+
+        resumed = await clients[1].get(
+            f"/v1/jobs/{job_id}/events",
+            headers={"Authorization": f"Bearer {TEST_TOKEN}", "Last-Event-ID": "1"},
+        )
+        assert resumed.status_code == 200
+        assert "id: 1\n" not in resumed.text
+        assert "event: done\nid: 2\n" in resumed.text
+
+        status = await clients[1].get(
+            "/v1/queue/status", headers={"Authorization": f"Bearer {TEST_TOKEN}"}
+        )
+        assert [j["job_id"] for j in status.json()["your_jobs"]] == [job_id]
+        for client in clients:
+            await client.aclose()
+    finally:
+        await broker.close()
+        await queue.stop()
+
+
+def _sse_events(body: str) -> list[tuple[str, Any]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "data"), json.loads(fields["data"])))
+    return events
+
+
+async def test_batch_streams_every_file_over_one_connection(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            audio = await job.audio.read()
+            if audio == b"broken":
+                raise RuntimeError("decoder exploded")
+            await job.chunk_stream.put(audio.decode())
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/v1/transcribe/batch",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                files=[
+                    ("audio", ("a.wav", b"first", "audio/wav")),
+                    ("audio", ("b.wav", b"broken", "audio/wav")),
+                    ("audio", ("c.mp3", b"third", "audio/mpeg")),
+                ],
+            )
+    assert resp.status_code == 200
+    events = _sse_events(resp.text)
+    kind, batch = events[0]
+    assert kind == "batch"
+    assert [f["name"] for f in batch["files"]] == ["a.wav", "b.wav", "c.mp3"]
+
+    texts = {e["file"]: e["text"] for kind, e in events if kind == "data"}
+    assert texts == {0: "first", 2: "third"}
+    assert sorted(e["file"] for kind, e in events if kind == "file-done") == [0, 2]
+    errors = [e for kind, e in events if kind == "file-error"]
+    assert [(e["file"], e["error"]) for e in errors] == [(1, "decoder exploded")]
+    progress = [e for kind, e in events if kind == "progress"]
+    assert [p["completed"] + p["failed"] for p in progress] == [1, 2, 3]
+    assert events[-1] == ("done", {"completed": 2, "failed": 1, "total": 3})
+
+
+async def test_batch_accepts_an_archive(
+    settings: Settings, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("clips/one.wav", b"one")
+        zf.writestr("clips/notes.txt", b"not audio")
+        zf.writestr("__MACOSX/clips/._one.wav", b"resource fork")
+        zf.writestr("clips/two.flac", b"two")
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            await job.chunk_stream.put((await job.audio.read()).decode())
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/v1/transcribe/batch",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                files={"audio": ("clips.zip", archive.getvalue(), "application/zip")},
+            )
+            bomb = await client.post(
+                "/v1/transcribe/batch",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                files={"audio": ("empty.zip", _empty_zip(), "application/zip")},
+            )
+    assert resp.status_code == 200
+    events = _sse_events(resp.text)
+    assert [f["name"] for f in events[0][1]["files"]] == [
+        "clips/one.wav",
+        "clips/two.flac",
+    ]
+    assert {e["file"]: e["text"] for kind, e in events if kind == "data"} == {0: "one", 1: "two"}
+    assert bomb.status_code == 400
+
+
+def _empty_zip() -> bytes:
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("readme.txt", b"no audio here")
+    return archive.getvalue()
+
+
+async def test_batch_that_does_not_fit_is_not_queued(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    settings = _make_all_settings(tmp_path, max_queue_size=2)
+    async with _lifespan_app(settings) as app:
+        queue: TranscriptionQueue = app.state.queue
+        blocker_started = asyncio.Event()
+
+        async def blocking_process(_job: TranscriptionJob) -> None:
+            blocker_started.set()
+            await asyncio.Event().wait()
+
+        queue.set_process_fn(blocking_process)
+        queue.enqueue(TranscriptionJob(token_fingerprint="other"))
+        await asyncio.wait_for(blocker_started.wait(), timeout=2.0)
+
+        transport = ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/v1/transcribe/batch",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                files=[("audio", (f"{i}.wav", b"x%d" % i, "audio/wav")) for i in range(3)],
+            )
+        assert resp.status_code == 503
+        await asyncio.sleep(0.05)
+        assert queue.get_queue_info("test-user").total_queued == 0
+
+
+async def test_upload_is_spooled_with_form_field_hotwords(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(server.routes.transcribe, "probe_duration", _fake_probe_duration)
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    settings = _make_all_settings(tmp_path, audio_spool_dir=str(spool_dir))
+    wav = _make_wav(16000, 16000 * 3)
+    seen: list[tuple[bool, bytes, str | None]] = []
+    async with _lifespan_app(settings) as app:
+
+        async def process(job: TranscriptionJob) -> None:
+            seen.append((job.audio.spooled, await job.audio.read(), job.hotwords))
+            await job.chunk_stream.put(None)
+
+        app.state.queue.set_process_fn(process)
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/v1/transcribe",
+                headers={"Authorization": f"Bearer {TEST_TOKEN}"},
+                data={"hotwords": "Vibevoice,vLLM"},
+                files={"audio": ("test.wav", wav, "audio/wav")},
+            )
+    assert resp.status_code == 200
+    assert seen == [(True, wav, "Vibevoice,vLLM")]
+    assert list(spool_dir.iterdir()) == []
+
+
+async def test_oversized_upload_is_refused_while_streaming(tmp_path: Path) -> None:
+    settings = _make_all_settings(tmp_path, max_audio_bytes=64 * 1024)
+    request = httpx.Request(
+        "POST",
+        "http://test/v1/transcribe",
+        files={"audio": ("test.wav", _make_wav(16000, 16000 * 10), "audio/wav")},
+    )
+    body = request.read()
+    sent: list[int] = []
+
+    async def chunked() -> AsyncIterator[bytes]:
+        for start in range(0, len(body), 4096):
+            sent.append(start)
+            yield body[start : start + 4096]
+
+    async with _lifespan_client(settings) as client:
+        headers = {
+            "Authorization": f"Bearer {TEST_TOKEN}",
+            "Content-Type": request.headers["Content-Type"],
+        }
+        # Without Content-Length the limit is enforced on the bytes as they arrive.
+        resp = await client.post("/v1/transcribe", headers=headers, content=chunked())
+        assert resp.status_code == 413
+        assert len(sent) * 4096 < len(body)
+
+        # A declared length far over the limit is refused before reading the body.
+        resp = await client.post(
+            "/v1/transcribe",
+            headers={**headers, "Content-Length": str(len(body) * 100)},
+            content=body,
+        )
+        assert resp.status_code == 413
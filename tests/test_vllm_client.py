@@ -0,0 +1,136 @@
+import asyncio
+import base64
+import json
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+
+from server.audio_buffer import AudioBuffer
+from server.vllm_client import stream_transcription
+
+
+async def test_audio_is_streamed_into_request_body() -> None:
+    raw = bytes(range(256)) * 5000
+    bodies: list[bytes] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(await request.aread())
+        assert int(request.headers["Content-Length"]) == len(bodies[-1])
+        return httpx.Response(
+            200,
+            content=b'data: {"choices": [{"delta": {"content": "hi"}}]}\n\ndata: [DONE]\n\n',
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        chunks = [
+            chunk
+            async for chunk in stream_transcription(
+                http_client=client,
+                vllm_base_url="http://vllm",
+                model_name="vibevoice",
+                audio=AudioBuffer.in_memory(raw),
+                audio_mime="audio/wav",
+                audio_duration=1.0,
+                hotwords=None,
+                temperature=0.0,
+                top_p=1.0,
+                max_tokens=100,
+                stall_timeout=60.0,
+            )
+        ]
+        prioritised = [
+            chunk
+            async for chunk in stream_transcription(
+                http_client=client,
+                vllm_base_url="http://vllm",
+                model_name="vibevoice",
+                audio=AudioBuffer.in_memory(b"abc"),
+                audio_mime="audio/wav",
+                audio_duration=1.0,
+                hotwords=None,
+                temperature=0.0,
+                top_p=1.0,
+                max_tokens=100,
+                stall_timeout=60.0,
+                priority=-1,
+            )
+        ]
+
+    assert chunks == prioritised == ["hi"]
+    assert json.loads(bodies[1])["priority"] == -1
+    payload = json.loads(bodies[0])
+    url = payload["messages"][1]["content"][0]["audio_url"]["url"]
+    assert url == "data:audio/wav;base64," + base64.b64encode(raw).decode()
+    assert payload["stream"] is True
+    assert payload["max_tokens"] == 100
+    assert "priority" not in payload
+    assert len(payload["messages"]) == 2
+
+
+async def test_continuation_is_sent_as_the_answer_so_far() -> None:
+    bodies: list[bytes] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(await request.aread())
+        return httpx.Response(
+            200,
+            content=b'data: {"choices": [{"delta": {"content": "]"}}]}\n\ndata: [DONE]\n\n',
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        chunks = [
+            chunk
+            async for chunk in stream_transcription(
+                http_client=client,
+                vllm_base_url="http://vllm",
+                model_name="vibevoice",
+                audio=AudioBuffer.in_memory(b"abc"),
+                audio_mime="audio/wav",
+                audio_duration=1.0,
+                hotwords=None,
+                temperature=0.2,
+                top_p=0.95,
+                max_tokens=100,
+                stall_timeout=60.0,
+                continuation='[{"Start": 0, "End": 1, "Content": "hi"}',
+            )
+        ]
+
+    assert chunks == ["]"]
+    payload = json.loads(bodies[0])
+    assert payload["messages"][2] == {
+        "role": "assistant",
+        "content": '[{"Start": 0, "End": 1, "Content": "hi"}',
+    }
+    assert payload["continue_final_message"] is True
+    assert payload["add_generation_prompt"] is False
+
+
+async def test_stall_after_first_token_raises() -> None:
+    async def stalling() -> AsyncIterator[bytes]:
+        yield b'data: {"choices": [{"delta": {"content": "["}}]}\n\n'
+        await asyncio.sleep(1)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=stalling())
+
+    received: list[str] = []
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(RuntimeError, match="stalled"):
+            async for chunk in stream_transcription(
+                http_client=client,
+                vllm_base_url="http://vllm",
+                model_name="vibevoice",
+                audio=AudioBuffer.in_memory(b"abc"),
+                audio_mime="audio/wav",
+                audio_duration=1.0,
+                hotwords=None,
+                temperature=0.0,
+                top_p=1.0,
+                max_tokens=100,
+                stall_timeout=0.05,
+            ):
+                received.append(chunk)
+
+    assert received == ["["]